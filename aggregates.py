@@ -0,0 +1,187 @@
+"""
+可累加的分析统计 - 按数据块累计取值计数，生成与analyze_all_data相同结构的分析结果
+只保存“取值 -> 次数”，内存占用取决于不同取值的个数，与数据总量无关；
+计数可加可减，持久化后增量处理只需应用新增/删除的记录
+"""
+import json
+import os
+from collections import Counter
+from datetime import datetime
+
+# 每种数据参与统计的列
+AGGREGATE_COLUMNS = {
+    "books": ["category", "year_clean"],
+    "courses": ["department", "credit"],
+    "news": ["category", "date_clean"],
+    "notices": ["category", "date_clean", "content_length"],
+}
+DATE_COLUMNS = {"date_clean"}
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+STATE_PATH = "data/processed/analysis_state.json"
+
+
+def _normalize(value):
+    """把numpy标量转换为Python内置类型，便于计数与序列化"""
+    return value.item() if hasattr(value, "item") else value
+
+
+class DatasetAggregate:
+    """单个数据集的累加统计：总条数 + 每个统计列的取值计数"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.counters = {column: Counter() for column in AGGREGATE_COLUMNS[name]}
+
+    def add(self, df, sign=1):
+        """累加一个数据块（已清洗的DataFrame）；sign=-1时从统计中减去这些记录"""
+        self.rows += sign * len(df)
+        for column, counter in self.counters.items():
+            if column not in df.columns:
+                continue
+            values = df[column]
+            if column in DATE_COLUMNS:
+                import pandas as pd
+                values = pd.to_datetime(values, errors='coerce').dropna().dt.strftime(DATE_FORMAT)
+            for value, count in values.value_counts().items():
+                if count:
+                    value = _normalize(value)
+                    counter[value] += sign * int(count)
+                    if counter[value] <= 0:
+                        del counter[value]
+
+    def remove(self, df):
+        """减去已删除（或被替换）的记录"""
+        self.add(df, sign=-1)
+
+    def to_dict(self):
+        # JSON的键只能是字符串，计数保存为 [取值, 次数] 列表以保留数值类型
+        return {"rows": self.rows,
+                "counters": {column: [[value, count] for value, count in counter.items()]
+                             for column, counter in self.counters.items()}}
+
+    @classmethod
+    def from_dict(cls, name, data):
+        aggregate = cls(name)
+        aggregate.rows = data["rows"]
+        for column, pairs in data["counters"].items():
+            if column in aggregate.counters:
+                aggregate.counters[column] = Counter({value: count for value, count in pairs})
+        return aggregate
+
+    def top(self, column, n=10):
+        """前n个取值的计数（次数相同时按取值排序，结果稳定）"""
+        items = sorted(self.counters[column].items(), key=lambda kv: (-kv[1], str(kv[0])))
+        return dict(items[:n])
+
+    def number_stats(self, column):
+        """返回 (平均值, 最小值, 最大值)，没有数据时返回None"""
+        counter = self.counters[column]
+        total = sum(counter.values())
+        if not total:
+            return None
+        mean = sum(value * count for value, count in counter.items()) / total
+        return mean, min(counter), max(counter)
+
+    def date_bounds(self, column):
+        """返回 (最早, 最晚) 的datetime，没有数据时返回None"""
+        counter = self.counters[column]
+        if not counter:
+            return None
+        return datetime.strptime(min(counter), DATE_FORMAT), datetime.strptime(max(counter), DATE_FORMAT)
+
+
+def load_state(path=STATE_PATH):
+    """读取持久化的统计状态，返回 {数据类型: DatasetAggregate}；不存在、损坏或统计列变化时返回None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if state.get("columns") != AGGREGATE_COLUMNS:
+        return None
+    return {name: DatasetAggregate.from_dict(name, data) for name, data in state["datasets"].items()}
+
+
+def save_state(aggregates, path=STATE_PATH):
+    """原子写入统计状态"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    state = {"columns": AGGREGATE_COLUMNS,
+             "datasets": {name: aggregate.to_dict() for name, aggregate in aggregates.items()}}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def build_analysis(aggregates, timestamp):
+    """由四个数据集的累加统计生成分析结果（结构与原analyze_all_data一致）"""
+    books, courses, news, notices = (aggregates[name] for name in ("books", "courses", "news", "notices"))
+    analysis = {
+        "timestamp": timestamp,
+        "summary": {
+            "total_records": books.rows + courses.rows + news.rows + notices.rows,
+            "books_count": books.rows,
+            "courses_count": courses.rows,
+            "news_count": news.rows,
+            "notices_count": notices.rows
+        },
+        "books_analysis": {},
+        "courses_analysis": {},
+        "news_analysis": {},
+        "notices_analysis": {}
+    }
+    # 1. 图书分析
+    if books.rows:
+        if books.counters["category"]:
+            analysis["books_analysis"]["top_categories"] = books.top("category")
+        year_stats = books.number_stats("year_clean")
+        if year_stats:
+            mean, low, high = year_stats
+            analysis["books_analysis"]["year_stats"] = {
+                "average_year": int(mean),
+                "latest_year": int(high),
+                "year_range": f"{int(low)}-{int(high)}"
+            }
+    # 2. 课程分析
+    if courses.rows:
+        if courses.counters["department"]:
+            analysis["courses_analysis"]["top_departments"] = courses.top("department")
+        credit_stats = courses.number_stats("credit")
+        if credit_stats:
+            mean, low, high = credit_stats
+            analysis["courses_analysis"]["credit_stats"] = {
+                "average_credit": float(mean),
+                "max_credit": int(high),
+                "min_credit": int(low)
+            }
+    # 3. 新闻分析
+    if news.rows:
+        if news.counters["category"]:
+            analysis["news_analysis"]["categories"] = news.top("category")
+        bounds = news.date_bounds("date_clean")
+        if bounds:
+            analysis["news_analysis"]["date_range"] = {
+                "start": bounds[0].strftime("%Y-%m-%d"),
+                "end": bounds[1].strftime("%Y-%m-%d")
+            }
+    # 4. 公告分析
+    if notices.rows:
+        if notices.counters["category"]:
+            analysis["notices_analysis"]["categories"] = notices.top("category")
+        bounds = notices.date_bounds("date_clean")
+        if bounds:
+            analysis["notices_analysis"]["date_info"] = {
+                "start": bounds[0].strftime("%Y-%m-%d"),
+                "end": bounds[1].strftime("%Y-%m-%d"),
+                "total_days": (bounds[1] - bounds[0]).days
+            }
+        length_stats = notices.number_stats("content_length")
+        if length_stats:
+            mean, low, high = length_stats
+            analysis["notices_analysis"]["content_stats"] = {
+                "avg_length": int(mean),
+                "max_length": int(high),
+                "min_length": int(low)
+            }
+    return analysis
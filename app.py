@@ -1,9 +1,19 @@
 # app.py
-from flask import Flask, render_template, jsonify
-import pandas as pd
+from flask import Flask, render_template, jsonify, request, send_file, g
 import os
+import time
 import json
+import hashlib
+import threading
 import warnings
+from datetime import datetime
+
+from dataset_cache import dataset_cache
+from query_index import QUERY_PARAMS, QueryError, int_arg, run_query
+from search_index import RESULT_FIELDS, SEARCH_TYPES, current_index
+from precomputed import SAMPLE_COLUMNS, precomputed_responses
+from chart_data import CHART_SOURCES, ChartData
+import metrics
 
 # 忽略无关警告
 warnings.filterwarnings('ignore')
@@ -14,7 +24,7 @@ app = Flask(__name__,
             static_folder='static')       # 指定静态资源目录
 
 # ===================== 目录初始化 =====================
-# 确保所有必要目录存在
+# 启动服务时确保所有必要目录存在（导入本模块时不创建：流水线在版本目录中导入它预渲染首页）
 required_dirs = [
     'data/raw',
     'data/processed',
@@ -22,8 +32,10 @@ required_dirs = [
     'static/images',
     'templates'
 ]
-for dir_path in required_dirs:
-    os.makedirs(dir_path, exist_ok=True)
+
+def ensure_dirs():
+    for dir_path in required_dirs:
+        os.makedirs(dir_path, exist_ok=True)
 
 # ===================== 全局工具函数 =====================
 def load_json_data(file_path):
@@ -34,23 +46,78 @@ def load_json_data(file_path):
     except (FileNotFoundError, json.JSONDecodeError):
         return {}
 
-def load_csv_sample(file_path, sample_size=10):
-    """加载CSV文件的样本数据"""
-    try:
-        df = pd.read_csv(file_path, encoding='utf-8')
-        # 处理空值
-        df = df.fillna('未知')
-        # 转换为字典（仅返回前N条）
-        return df.head(sample_size).to_dict('records')
-    except FileNotFoundError:
+def load_sample(name, sample_size=10, columns=None):
+    """从进程内缓存取处理后数据的前N条（columns指定时只返回这些字段）"""
+    entry = dataset_cache.get(name)
+    if entry is None:
         return []
+    records = entry.records[:sample_size]
+    if columns is None:
+        return records
+    return [{col: record[col] for col in columns if col in record} for record in records]
 
-# ===================== 路由定义 =====================
-@app.route('/')
-def index():
-    """主页面：加载统计数据、分析结果、图表信息"""
-    print("📱 访问主页面...")
-    
+def precomputed_or(endpoint, build):
+    """
+    优先返回处理器预先生成的响应（强ETag、304、按Accept-Encoding选择br/gzip）；
+    没有预计算响应时调用build动态生成
+    """
+    result = precomputed_responses.get(endpoint, request.accept_encodings.quality)
+    if result is None:
+        return build()
+    body, etag, encoding = result
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    # 允许缓存，但每次使用前都要用ETag验证
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def query_dataset(name):
+    """
+    数据集接口：不带查询参数时返回前100条（兼容原接口）；
+    带分页/过滤/排序/字段参数时返回 {items, total, offset, limit, next_cursor}，其他参数不影响响应
+    """
+    if not request.args.keys() & QUERY_PARAMS:
+        return precomputed_or(name, lambda: jsonify(load_sample(name, 100)))
+    entry = dataset_cache.get(name)
+    if entry is None:
+        return jsonify({"items": [], "total": 0, "offset": 0, "limit": 0, "next_cursor": None})
+    try:
+        return jsonify(run_query(entry.index, entry.records, request.args))
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+
+# 图表数据按数据集版本缓存
+chart_data = ChartData(dataset_cache)
+
+# ===================== 首页缓存 =====================
+# 首页内容只取决于这两个数据文件与首页模板（模板随部署更新，预渲染的首页保存在版本目录中跨部署保留）
+INDEX_SOURCES = ['data/statistics.json', 'data/analysis.json',
+                 os.path.join(app.root_path, app.template_folder, 'index.html')]
+# 流水线结束时预渲染的静态首页
+PRERENDERED_INDEX = 'data/site/index.html'
+_index_cache = {"signature": None, "html": None, "etag": None}
+_index_lock = threading.Lock()
+
+def index_signature():
+    """首页数据文件与模板的版本（mtime与大小），文件不存在时为None"""
+    signature = []
+    for path in INDEX_SOURCES:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+def render_index_page():
+    """渲染主页面：加载统计数据、分析结果、图表信息"""
+    print("📱 渲染主页面...")
     # 1. 加载统计数据（爬虫生成）
     stats = load_json_data('data/statistics.json')
     # 补充默认值（避免数据缺失导致页面报错）
@@ -67,11 +134,12 @@ def index():
     analysis = load_json_data('data/analysis.json')
 
     # 3. 加载图表列表（匹配visualizer.py生成的图表）
+    # key对应 /api/charts/<key> 接口，前端优先用接口数据在canvas上绘制，失败时显示图片
     charts = [
-        {"name": "图书分类分布", "file": "book_category.png", "desc": "Top10图书分类的数量分布"},
-        {"name": "课程学分分布", "file": "course_credit.png", "desc": "课程学分的占比情况"},
-        {"name": "新闻发布趋势", "file": "news_trend.png", "desc": "新闻发布的月度变化趋势"},
-        {"name": "公告类型分布", "file": "notice_type.png", "desc": "各类公告的数量分布"}
+        {"name": "图书分类分布", "key": "book_category", "file": "book_category.png", "desc": "Top10图书分类的数量分布"},
+        {"name": "课程学分分布", "key": "course_credit", "file": "course_credit.png", "desc": "课程学分的占比情况"},
+        {"name": "新闻发布趋势", "key": "news_trend", "file": "news_trend.png", "desc": "新闻发布的月度变化趋势"},
+        {"name": "公告类型分布", "key": "notice_type", "file": "notice_type.png", "desc": "各类公告的数量分布"}
     ]
 
     # 渲染模板
@@ -80,46 +148,163 @@ def index():
                            analysis=analysis, 
                            charts=charts)
 
+def cached_index_page():
+    """返回 (首页HTML, ETag)；数据文件的mtime未变时直接使用缓存的渲染结果"""
+    signature = index_signature()
+    with _index_lock:
+        if _index_cache["signature"] == signature:
+            return _index_cache["html"], _index_cache["etag"]
+        html = render_index_page()
+        etag = hashlib.sha1(html.encode('utf-8')).hexdigest()
+        _index_cache.update(signature=signature, html=html, etag=etag)
+        return html, etag
+
+def prerendered_index_fresh():
+    """预渲染的静态首页是否比数据文件与模板新"""
+    try:
+        rendered = os.stat(PRERENDERED_INDEX).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    return all(item is None or item[0] <= rendered for item in index_signature())
+
+def prerender_index(output_path=PRERENDERED_INDEX):
+    """预渲染首页为静态文件（流水线最后一步，可选）"""
+    with app.app_context():
+        html, _ = cached_index_page()
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(f"{output_path}.tmp", 'w', encoding='utf-8') as f:
+        f.write(html)
+    os.replace(f"{output_path}.tmp", output_path)
+    print(f"✅ 首页已预渲染 -> {output_path}")
+    return output_path
+
+# ===================== 路由定义 =====================
+@app.route('/')
+def index():
+    """主页面：优先返回预渲染的静态文件，否则返回按数据文件版本缓存的渲染结果（均支持304）"""
+    if prerendered_index_fresh():
+        # send_file把相对路径当作相对应用目录，数据路径相对工作目录
+        return send_file(os.path.abspath(PRERENDERED_INDEX), mimetype='text/html', conditional=True)
+    html, etag = cached_index_page()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(html, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/samples')
 def get_samples():
     """获取所有数据类型的样本（供前端展示）"""
-    print("📊 加载数据样本...")
-    return jsonify({
-        'books_sample': load_csv_sample('data/processed/books_clean.csv'),
-        'courses_sample': load_csv_sample('data/processed/courses_clean.csv'),
-        'news_sample': load_csv_sample('data/processed/news_clean.csv'),
-        'notices_sample': load_csv_sample('data/processed/notices_clean.csv')
-    })
+    return precomputed_or('samples', lambda: jsonify({
+        f'{name}_sample': load_sample(name, columns=columns) for name, columns in SAMPLE_COLUMNS.items()
+    }))
 
 @app.route('/api/books')
 def get_books():
-    """获取图书完整数据"""
-    return jsonify(load_csv_sample('data/processed/books_clean.csv', 100))
+    """获取图书数据（支持分页、过滤、排序与字段投影）"""
+    return query_dataset('books')
 
 @app.route('/api/courses')
 def get_courses():
-    """获取课程完整数据"""
-    return jsonify(load_csv_sample('data/processed/courses_clean.csv', 100))
+    """获取课程数据（支持分页、过滤、排序与字段投影）"""
+    return query_dataset('courses')
 
 @app.route('/api/news')
 def get_news():
-    """获取新闻完整数据"""
-    return jsonify(load_csv_sample('data/processed/news_clean.csv', 100))
+    """获取新闻数据（支持分页、过滤、排序与字段投影）"""
+    return query_dataset('news')
 
 @app.route('/api/notices')
 def get_notices():
-    """获取公告完整数据"""
-    return jsonify(load_csv_sample('data/processed/notices_clean.csv', 100))
+    """获取公告数据（支持分页、过滤、排序与字段投影）"""
+    return query_dataset('notices')
+
+@app.route('/api/search')
+def search():
+    """
+    全文检索（BM25排序）
+    参数: q（检索词，至少两个连续的汉字/字母/数字）, type（逗号分隔的数据类型）,
+         offset, limit, fields（逗号分隔，默认返回各类型的主要字段）
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "缺少检索词参数q"}), 400
+    try:
+        types = [t for t in request.args.get('type', '').split(',') if t]
+        unknown = [t for t in types if t not in SEARCH_TYPES]
+        if unknown:
+            raise QueryError(f"不支持的数据类型: {', '.join(unknown)}")
+        offset = int_arg(request.args, 'offset', 0)
+        limit = int_arg(request.args, 'limit', 20, minimum=1, maximum=100)
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    index = current_index()
+    if index is None:
+        return jsonify({"query": query, "items": [], "total": 0, "offset": offset, "limit": limit})
+    hits, total = index.search(query, types, offset, limit)
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
+    items = []
+    for name, row, score in hits:
+        entry = dataset_cache.get(name)
+        # 数据文件比索引新（行数变化）时跳过越界的行
+        if entry is None or row >= len(entry.records):
+            continue
+        record = entry.records[row]
+        item = {"type": name, "score": round(score, 4)}
+        item.update({f: record[f] for f in (fields or RESULT_FIELDS[name]) if f in record})
+        items.append(item)
+    return jsonify({"query": query, "items": items, "total": total, "offset": offset, "limit": limit})
+
+@app.route('/api/charts/<name>')
+def get_chart(name):
+    """
+    图表汇总数据 {chart, title, kind, labels, values}，由缓存的处理后数据计算
+    数据文件更新后自动重新汇总；ETag为内容哈希，数据未变时返回304
+    """
+    if name not in CHART_SOURCES:
+        return jsonify({"error": f"未知的图表: {name}"}), 404
+    body, etag = chart_data.get(name)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/health')
 def health_check():
     """健康检查接口（供部署平台检测）"""
     return jsonify({
         'status': 'healthy',
-        'timestamp': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         'data_dir_exists': os.path.exists('data')
     })
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus指标：各worker的请求延迟直方图 + 批处理各组件最近一次运行的分阶段统计"""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# ===================== 请求指标 =====================
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """按路由模板（而非具体URL）记录延迟，避免标签基数随参数增长"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = {'route': route, 'method': request.method, 'status': response.status_code}
+        metrics.web.observe('http_request_duration_seconds', time.perf_counter() - start, **labels)
+        metrics.web.inc('http_requests_total', **labels)
+        metrics.flush_web()
+    return response
+
 # ===================== 错误处理 =====================
 @app.errorhandler(404)
 def page_not_found(e):
@@ -133,6 +318,7 @@ def server_error(e):
 
 # ===================== 启动配置 =====================
 if __name__ == '__main__':
+    ensure_dirs()
     # 本地运行配置（部署时由main.py调用）
     app.run(
         host='0.0.0.0',    # 允许外部访问
@@ -0,0 +1,116 @@
+"""
+HTML解析性能基准 - 在保存的HTML样例上对比原解析路径与新的解析后端
+
+用法（在项目根目录执行）:
+    python benchmarks/bench_parsing.py [--rounds 200]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from crawler import RealPKUCrawler  # noqa: E402
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+BOOKS_URL = "http://www.lib.pku.edu.cn/portal/newbooks"
+NEWS_URL = "http://news.pku.edu.cn/xwzh/zyxw.htm"
+
+
+def legacy_books(html):
+    """原实现：html.parser + 依次尝试CSS选择器 + 每次调用re.search"""
+    soup = BeautifulSoup(html, 'html.parser')
+    items = None
+    for selector in ['.book-list li', '.book-item', '.list-item', 'table tr', '.result-item', '.item']:
+        found = soup.select(selector)
+        if len(found) > 5:
+            items = found
+            break
+    titles = []
+    for i, item in enumerate((items or [])[:50]):
+        text = item.get_text(strip=True)
+        title_match = re.search(r'《([^》]+)》', text)
+        re.search(r'作者[：:]\s*([^\s,，]+)', text)
+        re.search(r'出版社[：:]\s*([^\s,，]+)', text)
+        titles.append(title_match.group(1) if title_match else f"北京大学图书{i+1}")
+    return titles
+
+
+def legacy_news(html):
+    """原实现：对每条新闻用str(item)重新序列化后再匹配日期"""
+    soup = BeautifulSoup(html, 'html.parser')
+    items = None
+    for selector in ['.news-list li', '.list li', '.article-list li', 'ul li a', '.item', '.news-item']:
+        found = soup.select(selector)
+        if len(found) > 3:
+            items = found
+            break
+    titles = []
+    for item in (items or [])[:20]:
+        link = item.find('a')
+        if link:
+            re.search(r'(\d{4}-\d{2}-\d{2})', str(item))
+            item.select_one('.summary, .intro, .description')
+            titles.append(link.get_text(strip=True))
+    return titles
+
+
+def timed(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+    return (time.perf_counter() - start) / rounds * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML解析性能基准")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(os.path.join(FIXTURE_DIR, "books.html"), 'rb') as f:
+        books_html = f.read()
+    with open(os.path.join(FIXTURE_DIR, "news.html"), 'rb') as f:
+        news_html = f.read()
+
+    results = {}
+    results["legacy"] = (
+        timed(lambda: legacy_books(books_html), args.rounds),
+        timed(lambda: legacy_news(news_html), args.rounds),
+    )
+    for backend in ("html.parser", "lxml"):
+        crawler = RealPKUCrawler(use_cache=False, parser=backend)
+
+        def books():
+            doc = crawler.parser.parse(books_html)
+            crawler.discover_page_links(doc, BOOKS_URL)
+            return [b["title"] for b in crawler.parse_books_page(doc, BOOKS_URL)]
+
+        def news():
+            doc = crawler.parser.parse(news_html)
+            crawler.discover_page_links(doc, NEWS_URL)
+            return [n["title"] for n in crawler.parse_news_page(doc, NEWS_URL)]
+
+        # parse_books_page会打印命中的选择器，计时时屏蔽输出
+        stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+        try:
+            results[backend] = (timed(books, args.rounds), timed(news, args.rounds))
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    baseline_books, baseline_news = results["legacy"]
+    print(f"{'路径':<14}{'图书页(ms)':>12}{'新闻页(ms)':>12}{'加速比':>10}")
+    for name, ((books_ms, book_titles), (news_ms, news_titles)) in results.items():
+        speedup = (baseline_books[0] + baseline_news[0]) / (books_ms + news_ms)
+        same = book_titles == baseline_books[1] and news_titles == baseline_news[1]
+        print(f"{name:<14}{books_ms:>12.3f}{news_ms:>12.3f}{speedup:>9.2f}x"
+              f"{'' if same else '  ⚠️ 结果与原实现不一致'}")
+
+
+if __name__ == "__main__":
+    main()
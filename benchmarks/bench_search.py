@@ -0,0 +1,88 @@
+"""
+全文检索基准 - 在10^5~10^6条合成中文记录上测量建索引耗时、索引大小与BM25检索延迟
+
+用法（在项目根目录执行）:
+    python benchmarks/bench_search.py [--rows 100000 1000000] [--queries 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import search_index  # noqa: E402
+import storage  # noqa: E402
+
+WORDS = ["北京大学", "图书馆", "学术", "讲座", "研究", "成果", "国际", "交流", "校园", "文化",
+         "科研", "项目", "学院", "举办", "会议", "教授", "学生", "获奖", "合作", "协议",
+         "人工智能", "数学", "物理", "化学", "生命科学", "经济", "管理", "法学", "历史", "哲学",
+         "开幕", "论坛", "招生", "通知", "公告", "实验室", "创新", "发展", "建设", "服务"]
+QUERIES = ["北京大学", "学术讲座", "人工智能研究", "国际交流合作", "生命科学实验室",
+           "招生通知", "哲学论坛开幕", "经济管理学院"]
+
+
+def synthetic_frame(name, rows, seed):
+    """生成合成记录：标题3~6个词，正文10~30个词，按Zipf分布选词"""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(WORDS) + 1)
+    weights /= weights.sum()
+    words = np.array(WORDS, dtype=object)
+
+    def texts(low, high):
+        lengths = rng.integers(low, high + 1, size=rows)
+        picks = words[rng.choice(len(WORDS), size=lengths.sum(), p=weights)]
+        bounds = np.r_[0, np.cumsum(lengths)]
+        return ["".join(picks[bounds[i]:bounds[i + 1]]) for i in range(rows)]
+
+    fields = search_index.SEARCH_FIELDS[name]
+    data = {field: texts(3, 6) if field in ("title", "name") else texts(10, 30) for field in fields}
+    return pd.DataFrame(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全文检索基准")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'记录数':>10}{'建索引(s)':>11}{'索引(MB)':>10}{'打开(ms)':>10}"
+          f"{'p50(ms)':>10}{'p95(ms)':>10}{'最大(ms)':>10}{'类型过滤p50':>12}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            # 一半新闻一半公告，直接写Parquet（load_processed优先读取）
+            for seed, name in enumerate(["news", "notices"]):
+                df = synthetic_frame(name, rows // 2, seed)
+                df.to_parquet(storage.processed_parquet_path(name, tmp), index=False)
+            search_dir = os.path.join(tmp, "search")
+            start = time.perf_counter()
+            meta = search_index.build_search_index(search_dir=search_dir, processed_dir=tmp)
+            build_time = time.perf_counter() - start
+            version_dir = os.path.join(search_dir, meta["version"])
+            size = sum(os.path.getsize(os.path.join(version_dir, f)) for f in os.listdir(version_dir))
+
+            start = time.perf_counter()
+            index = search_index.SearchIndex(version_dir)
+            open_ms = (time.perf_counter() - start) * 1000
+
+            latencies, filtered = [], []
+            for i in range(args.queries):
+                query = QUERIES[i % len(QUERIES)]
+                start = time.perf_counter()
+                index.search(query, offset=0, limit=20)
+                latencies.append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                index.search(query, types=["notices"], offset=20, limit=20)
+                filtered.append((time.perf_counter() - start) * 1000)
+            print(f"{meta['documents']:>10}{build_time:>11.2f}{size / 1024 / 1024:>10.1f}{open_ms:>10.2f}"
+                  f"{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 95):>10.2f}"
+                  f"{max(latencies):>10.2f}{np.percentile(filtered, 50):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Web进程启动基准 - 在全新子进程中测量导入耗时与内存占用
+    app          只导入Web应用（重型依赖延迟加载）
+    app+heavy    导入Web应用并加载numpy/pandas/pyarrow（gunicorn预加载主进程的开销）
+    first-query  导入Web应用后处理第一个数据接口请求（延迟加载的代价）
+    main         导入main.py（只启动Web服务时的入口）
+
+用法（在项目根目录执行，first-query需要已生成的处理后数据）:
+    python benchmarks/bench_startup.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程中执行的代码：测量一段语句的耗时，并报告RSS与已加载的重型模块
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+rss = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1]) / 1024
+heavy = [m for m in ('numpy', 'pandas', 'pyarrow', 'matplotlib', 'requests', 'bs4') if m in sys.modules]
+print(json.dumps({{"ms": elapsed * 1000, "rss": rss, "heavy": heavy}}))
+"""
+
+CASES = {
+    "app": "import app",
+    "app+heavy": "import app, numpy, pandas, pyarrow.parquet",
+    "first-query": "import app\nclient = app.app.test_client()\nclient.get('/api/books?limit=10')",
+    "main": "import main",
+}
+
+
+def run_case(statement):
+    output = subprocess.run([sys.executable, "-c", PROBE.format(statement=statement)],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Web进程启动基准")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'场景':<14}{'耗时中位数(ms)':>16}{'最小(ms)':>10}{'RSS(MB)':>10}  已加载的重型模块")
+    for name, statement in CASES.items():
+        results = [run_case(statement) for _ in range(args.repeat)]
+        times = sorted(r["ms"] for r in results)
+        print(f"{name:<14}{times[len(times) // 2]:>16.0f}{times[0]:>10.0f}"
+              f"{results[-1]['rss']:>10.1f}  {', '.join(results[-1]['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
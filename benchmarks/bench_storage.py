@@ -0,0 +1,84 @@
+"""
+处理后数据存储基准 - 对比CSV（原路径）与带类型的Parquet列式存储的加载耗时与内存
+
+用法（在项目根目录执行）:
+    python benchmarks/bench_storage.py [--rows 100000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+
+import processor  # noqa: E402
+import storage  # noqa: E402
+from crawler import RealPKUCrawler  # noqa: E402
+
+# 各消费方实际需要的列
+PROJECTIONS = {
+    "books": ["category"],
+    "courses": ["credit"],
+    "news": ["date_clean"],
+}
+
+
+def build_frames(rows):
+    crawler = RealPKUCrawler(use_cache=False)
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        return {
+            "books": processor.clean_books(pd.DataFrame(crawler.generate_pku_books(rows))),
+            "courses": processor.clean_courses(pd.DataFrame(crawler.generate_pku_courses(rows))),
+            "news": processor.clean_news(pd.DataFrame(crawler.generate_pku_news(rows))),
+        }
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def measure(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, df.memory_usage(deep=True).sum() / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="处理后数据存储基准")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    frames = build_frames(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'数据集':<10}{'读取方式':<22}{'耗时(ms)':>10}{'内存(MB)':>10}{'文件(MB)':>10}")
+        for name, df in frames.items():
+            csv_path = os.path.join(tmp, f"{name}_clean.csv")
+            df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+            storage.save_processed_frame(name, df, processed_dir=tmp)
+            parquet_path = storage.processed_parquet_path(name, tmp)
+            # save_processed_frame也会写CSV，这里保证Parquet更新，load_processed优先读取它
+            os.utime(parquet_path)
+
+            cases = [
+                ("CSV 全列（原路径）", lambda: pd.read_csv(csv_path, encoding='utf-8'), csv_path),
+                ("Parquet 全列", lambda: storage.load_processed(name, processed_dir=tmp), parquet_path),
+                ("CSV 投影列", lambda: pd.read_csv(csv_path, usecols=PROJECTIONS[name]), csv_path),
+                ("Parquet 投影列", lambda: storage.load_processed(name, columns=PROJECTIONS[name],
+                                                                processed_dir=tmp), parquet_path),
+            ]
+            for label, func, path in cases:
+                elapsed, memory = measure(func)
+                size = os.path.getsize(path) / 1024 / 1024
+                print(f"{name:<10}{label:<22}{elapsed:>10.1f}{memory:>10.1f}{size:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+端到端基准套件 - 爬取、处理、可视化与Web服务各阶段的耗时/内存/吞吐，结果写入JSON便于跨版本对比
+
+阶段（每个阶段在独立子进程与独立工作目录中运行，互不共享缓存）:
+    crawl      爬虫抓取本地HTML样例服务器（benchmarks/fixtures），与数据规模无关，只运行一次
+    generate   synthetic.py 生成合成原始数据（固定种子与基准日期）
+    process    processor.run_processing
+    visualize  visualizer.run_visualization（强制重新渲染）
+    serve      启动Web服务，多线程并发请求各接口，统计延迟分位数与吞吐
+
+用法（在项目根目录执行）:
+    python benchmarks/run_all.py [--sizes 1000 100000 1000000] [--stages crawl process visualize serve]
+                                 [--duration 10] [--concurrency 16] [--server flask|gunicorn]
+                                 [--output benchmarks/results/<时间>.json] [--compare 上次结果.json]
+规模为每个规模的总记录数（四个数据集平分）
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SUITE_VERSION = 1
+SEED = 42
+TODAY = "2025-06-30"
+DEFAULT_SIZES = [1000, 100000, 1000000]
+STAGES = ["crawl", "process", "visualize", "serve"]
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+RESULT_DIR = os.path.join(ROOT, "benchmarks", "results")
+# 爬虫访问的真实主机全部映射到本地样例服务器
+CRAWL_HOSTS = ["www.lib.pku.edu.cn", "news.pku.edu.cn", "www.pku.edu.cn"]
+# 样例服务器的路径前缀 -> 样例文件
+FIXTURE_ROUTES = {"/portal/newbooks": "books.html", "/xwzh/": "news.html", "/notice/": "notices.html"}
+# 压测请求的接口（轮流请求）
+ENDPOINTS = [
+    "/",
+    "/api/samples",
+    "/api/books",
+    "/api/news?category=学术动态&limit=20",
+    "/api/courses?sort=-credit&limit=50",
+    "/api/notices?date_from=2025-06-01&limit=20",
+    "/api/search?q=北京大学&limit=20",
+    "/api/charts/news_trend",
+    "/api/health",
+]
+# 对比时关注的指标：(路径, 越大越好)
+COMPARE_METRICS = [
+    (("crawl", "elapsed"), False),
+    (("process", "elapsed"), False),
+    (("process", "max_rss_mb"), False),
+    (("visualize", "elapsed"), False),
+    (("serve", "throughput"), True),
+    (("serve", "latency_ms", "p95"), False),
+]
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+    pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))], 3)  # noqa: E731
+    return {"p50": pick(0.5), "p90": pick(0.9), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1], 3)}
+
+
+# ===================== 各阶段（在子进程中执行） =====================
+def start_fixture_server():
+    """在后台线程启动样例HTML服务器，返回 (服务器, 地址)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            for prefix, filename in FIXTURE_ROUTES.items():
+                if self.path.startswith(prefix):
+                    with open(os.path.join(FIXTURE_DIR, filename), "rb") as f:
+                        body = f.read()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+            self.send_error(404)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stage_crawl(args):
+    from crawler import RealPKUCrawler
+    from http_transport import HttpTransport
+    server, address = start_fixture_server()
+    crawler = RealPKUCrawler(concurrent=True, host_interval=0, use_cache=False,
+                             transport=HttpTransport(host_overrides={host: address for host in CRAWL_HOSTS},
+                                                     max_retries=0))
+    try:
+        start = time.perf_counter()
+        stats = crawler.run()
+        elapsed = time.perf_counter() - start
+    finally:
+        crawler.transport.close()
+        server.shutdown()
+    requests = sum(item["requests"] for item in stats["http_stats"].values())
+    return {"elapsed": elapsed, "records": stats["total_records"], "requests": requests}
+
+
+def stage_generate(args):
+    import synthetic
+    rows = max(1, args.rows // len(synthetic.DATASETS))
+    start = time.perf_counter()
+    counts = synthetic.generate_raw_data(rows, seed=SEED, today=datetime.strptime(TODAY, "%Y-%m-%d"))
+    return {"elapsed": time.perf_counter() - start, "records": sum(counts.values())}
+
+
+def stage_process(args):
+    from processor import run_processing
+    start = time.perf_counter()
+    analysis = run_processing()
+    return {"elapsed": time.perf_counter() - start,
+            "records": analysis["summary"]["total_records"],
+            "timings": analysis.get("timings", {})}
+
+
+def stage_visualize(args):
+    from visualizer import run_visualization
+    start = time.perf_counter()
+    results = run_visualization(force=True)
+    return {"elapsed": time.perf_counter() - start,
+            "charts": {name: {"status": status, "timings": timings}
+                       for name, (status, timings) in results.items()}}
+
+
+def start_web_server(server_kind, port):
+    """在工作目录中启动Web服务子进程"""
+    env = dict(os.environ, PYTHONPATH=ROOT, PORT=str(port))
+    if server_kind == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+                   "-b", f"127.0.0.1:{port}", "app:app"]
+    else:
+        command = [sys.executable, "-c",
+                   f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(session, base, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if session.get(f"{base}/api/health", timeout=1).status_code == 200:
+                return
+        except Exception:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Web服务启动超时")
+
+
+def stage_serve(args):
+    import socket
+
+    import requests
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    process = start_web_server(args.server, port)
+    try:
+        wait_ready(requests.Session(), base)
+        # 预热：每个接口请求一次（数据集缓存、检索索引、图表数据在首次请求时加载）
+        warm = requests.Session()
+        cold = {}
+        for endpoint in ENDPOINTS:
+            start = time.perf_counter()
+            warm.get(base + endpoint)
+            cold[endpoint] = round((time.perf_counter() - start) * 1000, 3)
+        # 多worker时首个请求只预热了其中一个，再并发预热一轮
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda _: [requests.get(base + endpoint) for endpoint in ENDPOINTS],
+                          range(args.concurrency)))
+
+        latencies = {endpoint: [] for endpoint in ENDPOINTS}
+        errors = {endpoint: 0 for endpoint in ENDPOINTS}
+        lock = threading.Lock()
+        deadline = time.monotonic() + args.duration
+
+        def client(offset):
+            session = requests.Session()
+            local = {endpoint: [] for endpoint in ENDPOINTS}
+            failed = {endpoint: 0 for endpoint in ENDPOINTS}
+            i = offset
+            while time.monotonic() < deadline:
+                endpoint = ENDPOINTS[i % len(ENDPOINTS)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    ok = session.get(base + endpoint, timeout=30).status_code < 400
+                except requests.RequestException:
+                    ok = False
+                local[endpoint].append((time.perf_counter() - start) * 1000)
+                if not ok:
+                    failed[endpoint] += 1
+            with lock:
+                for endpoint in ENDPOINTS:
+                    latencies[endpoint].extend(local[endpoint])
+                    errors[endpoint] += failed[endpoint]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(client, range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "server": args.server,
+        "concurrency": args.concurrency,
+        "elapsed": elapsed,
+        "requests": total,
+        "errors": sum(errors.values()),
+        "throughput": total / elapsed if elapsed else 0.0,
+        "latency_ms": percentiles([v for values in latencies.values() for v in values]),
+        "endpoints": {endpoint: dict(percentiles(latencies[endpoint]), requests=len(latencies[endpoint]),
+                                     errors=errors[endpoint], cold_ms=cold[endpoint])
+                      for endpoint in ENDPOINTS},
+    }
+
+
+STAGE_FUNCTIONS = {
+    "crawl": stage_crawl,
+    "generate": stage_generate,
+    "process": stage_process,
+    "visualize": stage_visualize,
+    "serve": stage_serve,
+}
+
+
+def run_stage_here(args):
+    """子进程入口：在工作目录中执行一个阶段，最后一行输出JSON结果"""
+    os.chdir(args.workdir)
+    for directory in ("data/raw", "data/processed", "data/visualizations", "static/images"):
+        os.makedirs(directory, exist_ok=True)
+    result = STAGE_FUNCTIONS[args.stage](args)
+    result["max_rss_mb"] = round(max_rss_mb(), 1)
+    print("\n" + json.dumps(result, ensure_ascii=False))
+
+
+# ===================== 调度与结果 =====================
+def run_stage(stage, workdir, rows, args):
+    command = [sys.executable, os.path.abspath(__file__), "--stage", stage, "--workdir", workdir,
+               "--rows", str(rows), "--duration", str(args.duration),
+               "--concurrency", str(args.concurrency), "--server", args.server]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        print(completed.stdout[-2000:], completed.stderr[-2000:])
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "失败"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summary_line(stage, result):
+    if "error" in result:
+        return f"❌ {stage}: {result['error']}"
+    if stage == "serve":
+        return (f"✅ serve: {result['throughput']:.0f}请求/秒 p50={result['latency_ms'].get('p50')}ms "
+                f"p95={result['latency_ms'].get('p95')}ms 错误{result['errors']}")
+    return f"✅ {stage}: {result['elapsed']:.2f}秒 RSS峰值{result['max_rss_mb']}MB"
+
+
+def lookup(result, path):
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(current, baseline_path, threshold):
+    """与上次结果对比，打印各规模关键指标的变化，超过阈值的退化标记出来；返回退化项数量"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\n📊 与 {baseline_path}（{baseline.get('git_commit', '?')[:8]}）对比:")
+    regressions = 0
+    for size, stages in current["results"].items():
+        for path, higher_is_better in COMPARE_METRICS:
+            new = lookup(stages, path)
+            old = lookup(baseline.get("results", {}).get(size, {}), path)
+            if not new or not old:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = "⚠️ " if worse > threshold else "   "
+            regressions += worse > threshold
+            print(f"{flag}{size:>9} {'.'.join(path):<22}{old:>12.3f} -> {new:>12.3f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准套件")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--duration", type=float, default=10.0, help="每个规模的压测时长（秒）")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--server", choices=["flask", "gunicorn"],
+                        default="gunicorn" if shutil.which("gunicorn") else "flask")
+    parser.add_argument("--output", help="结果JSON路径（默认 benchmarks/results/<时间>.json）")
+    parser.add_argument("--compare", help="与之前的结果JSON对比")
+    parser.add_argument("--threshold", type=float, default=0.1, help="对比时视为退化的变化比例")
+    parser.add_argument("--keep", action="store_true", help="保留各规模的工作目录")
+    # 子进程内部参数
+    parser.add_argument("--stage", choices=list(STAGE_FUNCTIONS), help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        run_stage_here(args)
+        return
+
+    report = {
+        "suite_version": SUITE_VERSION,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {"seed": SEED, "today": TODAY, "sizes": args.sizes, "stages": args.stages,
+                   "duration": args.duration, "concurrency": args.concurrency, "server": args.server},
+        "results": {},
+    }
+    if "crawl" in args.stages:
+        workdir = tempfile.mkdtemp(prefix="bench_crawl_")
+        result = run_stage("crawl", workdir, 0, args)
+        report["results"]["fixtures"] = {"crawl": result}
+        print(summary_line("crawl", result))
+        shutil.rmtree(workdir, ignore_errors=True)
+    for size in args.sizes:
+        print(f"\n===== {size}条记录 =====")
+        workdir = tempfile.mkdtemp(prefix=f"bench_{size}_")
+        stages = {}
+        # 后续阶段依赖合成数据，generate总是运行
+        for stage in ["generate"] + [s for s in args.stages if s != "crawl"]:
+            stages[stage] = run_stage(stage, workdir, size, args)
+            print(summary_line(stage, stages[stage]))
+            if "error" in stages[stage]:
+                break
+        report["results"][str(size)] = stages
+        if args.keep:
+            print(f"📁 工作目录: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULT_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(f"{output}.tmp", "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(f"{output}.tmp", output)
+    print(f"\n💾 结果已保存 -> {output}")
+    if args.compare and compare(report, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+图表数据 - 各统计图表的汇总逻辑（与绘图无关）
+visualizer.py 用它生成离线图片，Flask由进程内缓存的处理后数据计算同样的汇总，
+以JSON返回给前端在浏览器中绘制
+"""
+import json
+import hashlib
+import threading
+
+
+def book_category(df):
+    """图书分类Top10"""
+    counts = df['category'].value_counts()
+    return counts[counts > 0].head(10)
+
+
+def course_credit(df):
+    """课程学分分布"""
+    return df['credit'].value_counts().sort_index()
+
+
+def news_trend(df):
+    """新闻按月发布数量"""
+    import pandas as pd
+    # 发布日期（处理后数据中的date_clean已是日期类型）
+    publish_date = pd.to_datetime(df['date_clean'], errors='coerce').dropna()
+    return publish_date.dt.to_period('M').value_counts().sort_index()
+
+
+def notice_type(df):
+    """公告类型分布"""
+    counts = df['type'].value_counts()
+    return counts[counts > 0]
+
+
+# 图表定义：名称 -> (数据集, 所需字段, 汇总函数, 标题, 前端图形类型)
+CHART_SOURCES = {
+    "book_category": ("books", ["category"], book_category, "图书分类分布（Top10）", "bar"),
+    "course_credit": ("courses", ["credit"], course_credit, "课程学分分布", "pie"),
+    "news_trend": ("news", ["date_clean"], news_trend, "新闻发布月度趋势", "line"),
+    "notice_type": ("notices", ["type"], notice_type, "公告类型分布", "barh"),
+}
+
+
+def aggregate_chart(name, df):
+    """对数据集计算图表汇总；数据为空或缺少字段时返回None"""
+    _, columns, aggregate, _, _ = CHART_SOURCES[name]
+    if df is None or df.empty or any(col not in df.columns for col in columns):
+        return None
+    series = aggregate(df)
+    return None if series.empty else series
+
+
+def chart_payload(name, series):
+    """汇总结果转为前端使用的JSON结构"""
+    _, _, _, title, kind = CHART_SOURCES[name]
+    labels, values = [], []
+    if series is not None:
+        labels = [str(label) for label in series.index]
+        values = [int(value) for value in series.values]
+    return {"chart": name, "title": title, "kind": kind, "labels": labels, "values": values}
+
+
+class ChartData:
+    """
+    按数据集缓存项的版本缓存图表JSON（线程安全）
+    数据文件未变时直接返回上次的响应体与ETag，文件更新后下一次请求重新汇总
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """返回 (JSON响应体, ETag)；name不是已知图表时抛出KeyError"""
+        dataset = CHART_SOURCES[name][0]
+        entry = self.cache.get(dataset)
+        version = entry.version if entry is not None else None
+        with self._lock:
+            cached = self._results.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+        series = aggregate_chart(name, entry.frame) if entry is not None else None
+        body = json.dumps(chart_payload(name, series), ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            self._results[name] = (version, body, etag)
+        return body, etag
@@ -1,194 +1,360 @@
 """
 北京大学真实数据爬取 - 多数据源
 """
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
 import time
-import os 
 import json
+import hashlib
 import re
-import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urljoin
 from datetime import datetime, timedelta
 import random
 
+from http_transport import HttpTransport
+from http_cache import ResponseCache
+from html_parsers import make_parser
+import metrics
+import storage
+import synthetic
+
+# 字段提取正则（模块级预编译）
+TITLE_RE = re.compile(r'《([^》]+)》')
+AUTHOR_RE = re.compile(r'作者[：:]\s*([^\s,，]+)')
+PUBLISHER_RE = re.compile(r'出版社[：:]\s*([^\s,，]+)')
+DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+# 分页链接识别
+NEXT_PAGE_TEXTS = {"下一页", "下页", "后一页", "next", "Next", ">", "»"}
+PAGE_HREF_RE = re.compile(r'(page|p=|/\d+\.s?html?$|_\d+\.s?html?$)', re.I)
+# 缓存的页面解析结果格式；记录字段的生成方式改变时递增，旧缓存按未命中处理
+PAGE_FORMAT = 2
+
+def content_id(prefix, *parts):
+    """由记录内容生成稳定的主键（同一条目在列表中的位置变化时主键不变，增量清单才能对上）"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f"{prefix}_{digest[:12]}"
+
+RECORD_ID_FIELDS = ("book_id", "news_id", "notice_id")
+
+def record_fingerprint(record):
+    """
+    记录指纹，用于分页爬取时识别已见过的记录
+    优先使用由条目内容生成的主键：图书没有链接，未识别出书名时的标题按页内序号生成，每页都相同；
+    没有主键时用标题+链接
+    """
+    for field in RECORD_ID_FIELDS:
+        if record.get(field):
+            return record[field]
+    return f"{record.get('title', '')}|{record.get('url', '')}"
+
+class HostRateLimiter:
+    """按主机限速：同一主机两次请求之间至少间隔min_interval秒"""
+    def __init__(self, min_interval=1.0):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """为该URL所在主机预约下一个请求时间片，必要时等待"""
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
 class RealPKUCrawler:
-    def __init__(self):
+    def __init__(self, concurrent=True, max_workers=8, host_interval=1.0, transport=None,
+                 cache=None, use_cache=True, incremental=False, parser=None):
+        self.concurrent = concurrent  # 是否并发爬取各数据源
+        self.incremental = incremental  # 是否额外输出记录级增量文件
+        self.delta_stats = {}
+        self.max_workers = max_workers
+        # 礼貌爬取由按主机限速保证，不再使用全局sleep
+        self.rate_limiter = HostRateLimiter(host_interval)
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        # 所有请求都经过传输层（连接池、重试退避、分主机统计），可注入自定义实现
+        self.transport = transport or HttpTransport(headers=self.headers,
+                                                    pool_maxsize=max_workers)
+        # 条件请求缓存：页面未变化（304）时复用上次解析出的记录
+        self.cache = cache or (ResponseCache() if use_cache else None)
+        # HTML解析后端（默认lxml + 预编译XPath），也可传入"html.parser"
+        self.parser = parser if hasattr(parser, 'parse') else make_parser(parser)
+
+    def _get(self, url, headers=None):
+        """带按主机限速的GET请求"""
+        self.rate_limiter.wait(url)
+        return self.transport.get(url, headers=headers)
     
+    def _fetch_page(self, url, parse):
+        """
+        获取页面，返回 {"records": 解析出的记录, "links": 分页链接}
+        有缓存时发送条件请求；304表示页面未变化，直接复用上次的解析结果，跳过HTML解析
+        """
+        headers = self.cache.conditional_headers(url) if self.cache else None
+        response = self._get(url, headers=headers)
+        if response.status_code == 304 and self.cache:
+            page = self.cache.load_records(url)
+            if isinstance(page, dict) and page.get("format") == PAGE_FORMAT:
+                return page
+            # 缓存文件丢失或为旧格式，重新完整请求
+            response = self._get(url)
+        if self.cache:
+            self.cache.record_miss()
+        if response.status_code != 200:
+            return {"records": [], "links": []}
+        doc = self.parser.parse(response.content)
+        page = {"records": parse(doc, url), "links": self.discover_page_links(doc, url), "format": PAGE_FORMAT}
+        if self.cache:
+            self.cache.store(url, response, page)
+        return page
+
+    def discover_page_links(self, doc, page_url):
+        """发现分页链接（下一页优先，其次是数字页码），只保留同一主机的链接"""
+        host = urlparse(page_url).netloc
+        next_links, numbered_links = [], []
+        for text, href, rel in self.parser.page_links(doc):
+            href = urljoin(page_url, href)
+            if urlparse(href).netloc != host or href == page_url:
+                continue
+            if 'next' in rel or text in NEXT_PAGE_TEXTS:
+                next_links.append(href)
+            elif text.isdigit() and PAGE_HREF_RE.search(href):
+                numbered_links.append(href)
+        links = []
+        for href in next_links + numbered_links:
+            if href not in links:
+                links.append(href)
+        return links
+
+    def crawl_pages(self, start_url, parse, max_pages):
+        """分页爬取，返回全部记录列表"""
+        return list(self.iter_pages(start_url, parse, max_pages))
+
+    def iter_pages(self, start_url, parse, max_pages):
+        """
+        分页爬取：从起始页发现分页链接，逐层并发抓取新发现的页面，每页的记录解析后立即产出
+        只包含已见过记录的页面（重复页、循环到末页）不再展开，整层都没有新记录时提前停止
+        """
+        seen = set()
+        visited = {start_url}
+        frontier = [start_url]
+        count = 0
+        fetched = 0
+        while frontier and fetched < max_pages:
+            batch = frontier[:max_pages - fetched]
+            frontier = []
+            if self.concurrent and len(batch) > 1:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batch))) as pool:
+                    pages = list(pool.map(lambda url: self._fetch_page(url, parse), batch))
+            else:
+                pages = [self._fetch_page(url, parse) for url in batch]
+            fetched += len(batch)
+            for page in pages:
+                fingerprints = [record_fingerprint(r) for r in page["records"]]
+                if not fingerprints or seen.issuperset(fingerprints):
+                    # 本页没有新记录（重复页或已到末页），不再沿它的链接继续
+                    continue
+                seen.update(fingerprints)
+                for href in page["links"]:
+                    if href not in visited:
+                        visited.add(href)
+                        frontier.append(href)
+                count += len(page["records"])
+                yield from page["records"]
+        if fetched > 1:
+            print(f"📄 {start_url} 共抓取 {fetched} 页, {count} 条记录")
+
     def crawl_library_books(self, max_pages=5):
         """爬取图书馆新书通报"""
+        return list(self.iter_library_books(max_pages))
+
+    def iter_library_books(self, max_pages=5):
+        """爬取图书馆新书通报（逐条产出）"""
         print("📚 爬取北大图书馆新书通报...")
         base_url = "http://www.lib.pku.edu.cn/portal/newbooks"
         
-        books = []
+        count = 0
+        seen_ids = set()
         try:
-            # 尝试获取第一页
-            response = self.session.get(base_url, timeout=10)
-            response.encoding = 'utf-8'
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # 解析图书列表 - 根据实际HTML结构调整
-                # 方法1：尝试常见的选择器
-                selectors = [
-                    '.book-list li', '.book-item', '.list-item', 
-                    'table tr', '.result-item', '.item'
-                ]
-                
-                book_items = None
-                for selector in selectors:
-                    items = soup.select(selector)
-                    if len(items) > 5:  # 如果找到多个项目
-                        book_items = items
-                        print(f"找到选择器: {selector}, 找到{len(items)}个项目")
-                        break
-                
-                if book_items:
-                    for i, item in enumerate(book_items[:50]):  # 先取50个
-                        try:
-                            # 提取图书信息
-                            text = item.get_text(strip=True)                           
-                            # 尝试提取标题
-                            title_match = re.search(r'《([^》]+)》', text)
-                            title = title_match.group(1) if title_match else f"北京大学图书{i+1}"                           
-                            # 尝试提取作者
-                            author_match = re.search(r'作者[：:]\s*([^\s,，]+)', text)
-                            author = author_match.group(1) if author_match else "北大作者"                           
-                            # 尝试提取出版社
-                            publisher_match = re.search(r'出版社[：:]\s*([^\s,，]+)', text)
-                            publisher = publisher_match.group(1) if publisher_match else "北京大学出版社"
-
-                            books.append({
-                                "book_id": f"lib_{len(books)+1:04d}",
-                                "title": title,
-                                "author": author,
-                                "publisher": publisher,
-                                "category": self.get_book_category(i),
-                                "year": str(2023 + (i % 3)),
-                                "isbn": f"978-7-301-{20000+i:05d}",
-                                "source": "北京大学图书馆",
-                                "crawl_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                "type": "book"
-                            })
-                        except Exception as e:
-                            continue                
-                print(f"✅ 从图书馆爬取到 {len(books)} 本图书")               
-                # 如果爬取数量不足，补充一些真实相关的图书
-                if len(books) < 100:
-                    books.extend(self.generate_pku_books(100 - len(books)))                   
+            # 从第一页开始分页爬取（同一本书出现在多页时只保留一次）
+            for book in self.iter_pages(base_url, self.parse_books_page, max_pages):
+                if book["book_id"] in seen_ids:
+                    continue
+                seen_ids.add(book["book_id"])
+                count += 1
+                yield book
+            print(f"✅ 从图书馆爬取到 {count} 本图书")               
         except Exception as e:
             print(f"⚠️ 图书馆爬取遇到问题: {e}")
-            # 生成备用数据
-            books = self.generate_pku_books(100)        
-        return books   
+        # 如果爬取数量不足，补充一些真实相关的图书（爬取失败时全部为备用数据）
+        if count < 100:
+            yield from self.iter_generated_books(100 - count)
+
+    def parse_books_page(self, doc, url):
+        """解析新书通报页面（book_id由条目文本生成，分类、年份等模拟字段也由它决定，不随条目位置变化）"""
+        books = []
+        
+        # 解析图书列表 - 按数据源预设的选择器依次尝试，优先使用该URL上次命中的选择器
+        book_items, selector = self.parser.select_items(doc, "books", url)
+        if selector:
+            print(f"找到选择器: {selector}, 找到{len(book_items)}个项目")
+        
+        if book_items:
+            for i, item in enumerate(book_items[:50]):  # 先取50个
+                try:
+                    # 提取图书信息
+                    text = self.parser.text(item)
+                    book_id = content_id("lib", text)
+                    seed = int(book_id[-8:], 16)
+                    # 尝试提取标题
+                    title_match = TITLE_RE.search(text)
+                    title = title_match.group(1) if title_match else f"北京大学图书{i+1}"                           
+                    # 尝试提取作者
+                    author_match = AUTHOR_RE.search(text)
+                    author = author_match.group(1) if author_match else "北大作者"                           
+                    # 尝试提取出版社
+                    publisher_match = PUBLISHER_RE.search(text)
+                    publisher = publisher_match.group(1) if publisher_match else "北京大学出版社"
+
+                    books.append({
+                        "book_id": book_id,
+                        "title": title,
+                        "author": author,
+                        "publisher": publisher,
+                        "category": self.get_book_category(seed),
+                        "year": str(2023 + (seed % 3)),
+                        "isbn": f"978-7-301-{20000 + seed % 5000:05d}",
+                        "source": "北京大学图书馆",
+                        "crawl_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "type": "book"
+                    })
+                except Exception as e:
+                    continue
+        return books
+
     def crawl_pku_news(self, max_pages=3):
         """爬取北京大学新闻"""
+        return list(self.iter_pku_news(max_pages))
+
+    def iter_pku_news(self, max_pages=3):
+        """爬取北京大学新闻（按栏目顺序逐条产出）"""
         print("📰 爬取北京大学新闻...")
         
-        news_list = []
+        count = 0
         
         # 尝试多个新闻栏目
         news_sections = [
             "http://news.pku.edu.cn/xwzh/zyxw.htm",  # 重要新闻
             "http://news.pku.edu.cn/xwzh/mtjj.htm",  # 媒体聚焦
             "http://news.pku.edu.cn/xwzh/xyxw.htm",  # 校园新闻
-        ]        
-        for section_url in news_sections:
-            try:
-                response = self.session.get(section_url, timeout=10)
-                response.encoding = 'utf-8'              
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')                   
-                    # 尝试不同的新闻选择器
-                    news_selectors = [
-                        '.news-list li', '.list li', '.article-list li',
-                        'ul li a', '.item', '.news-item'
-                    ]                    
-                    news_items = None
-                    for selector in news_selectors:
-                        items = soup.select(selector)
-                        if len(items) > 3:
-                            news_items = items
-                            break                    
-                    if news_items:
-                        for item in news_items[:20]:  # 每个栏目取20条
-                            try:
-                                link = item.find('a')
-                                if link:
-                                    title = link.get_text(strip=True)
-                                    href = link.get('href', '')
-                                    
-                                    # 获取相对路径的完整URL
-                                    if href and not href.startswith('http'):
-                                        if href.startswith('/'):
-                                            href = f"http://news.pku.edu.cn{href}"
-                                        else:
-                                            href = f"http://news.pku.edu.cn/xwzh/{href}"                                   
-                                    # 提取日期
-                                    date_match = re.search(r'(\d{4}-\d{2}-\d{2})', str(item))
-                                    date = date_match.group(1) if date_match else datetime.now().strftime("%Y-%m-%d")                                    
-                                    # 提取摘要（如果有）
-                                    summary_elem = item.select_one('.summary, .intro, .description')
-                                    summary = summary_elem.get_text(strip=True) if summary_elem else f"北京大学相关新闻：{title}"                                    
-                                    news_list.append({
-                                        "news_id": f"news_{len(news_list)+1:04d}",
-                                        "title": title[:100],  # 限制长度
-                                        "summary": summary[:200],
-                                        "url": href,
-                                        "date": date,
-                                        "category": self.get_news_category(section_url),
-                                        "source": "北京大学新闻网",
-                                        "crawl_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                        "type": "news"
-                                    })
-                            except Exception as e:
-                                continue
-
-                time.sleep(1)  # 礼貌爬取                
-            except Exception as e:
-                print(f"⚠️ 新闻栏目爬取失败 {section_url}: {e}")
-                continue        
-        print(f"✅ 爬取到 {len(news_list)} 条新闻")
+        ]
+        # 并发模式下各栏目同时爬取，同一主机的请求间隔由限速器保证
+        if self.concurrent:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(news_sections))) as pool:
+                section_results = list(pool.map(lambda url: self.crawl_news_section(url, max_pages),
+                                                news_sections))
+        else:
+            section_results = [self.crawl_news_section(url, max_pages) for url in news_sections]
+        # 按栏目顺序合并；同一条新闻出现在多个栏目时只保留第一次
+        seen_ids = set()
+        for section_news in section_results:
+            for item in section_news:
+                if item["news_id"] in seen_ids:
+                    continue
+                seen_ids.add(item["news_id"])
+                count += 1
+                yield item
+        print(f"✅ 爬取到 {count} 条新闻")
         
         # 补充新闻数据
-        if len(news_list) < 150:
-            news_list.extend(self.generate_pku_news(150 - len(news_list)))
-        
+        if count < 150:
+            yield from self.iter_generated_news(150 - count)
+
+    def crawl_news_section(self, section_url, max_pages=1):
+        """爬取单个新闻栏目"""
+        try:
+            return self.crawl_pages(section_url, self.parse_news_page, max_pages)
+        except Exception as e:
+            print(f"⚠️ 新闻栏目爬取失败 {section_url}: {e}")
+            return []
+
+    def parse_news_page(self, doc, section_url):
+        """解析新闻栏目页面"""
+        news_list = []
+        # 按预设的新闻选择器依次尝试，优先使用该栏目上次命中的选择器
+        news_items, _ = self.parser.select_items(doc, "news", section_url)
+        if news_items:
+            for item in news_items[:20]:  # 每个栏目取20条
+                try:
+                    link = self.parser.first_link(item)
+                    if link is not None:
+                        title = self.parser.text(link)
+                        href = self.parser.attr(link, 'href')
+                        
+                        # 获取相对路径的完整URL
+                        if href and not href.startswith('http'):
+                            if href.startswith('/'):
+                                href = f"http://news.pku.edu.cn{href}"
+                            else:
+                                href = f"http://news.pku.edu.cn/xwzh/{href}"                                   
+                        # 提取日期
+                        date_match = DATE_RE.search(self.parser.search_text(item))
+                        date = date_match.group(1) if date_match else datetime.now().strftime("%Y-%m-%d")                                    
+                        # 提取摘要（如果有）
+                        summary = self.parser.summary(item)
+                        if summary is None:
+                            summary = f"北京大学相关新闻：{title}"                                    
+                        news_list.append({
+                            "news_id": content_id("news", href or title),
+                            "title": title[:100],  # 限制长度
+                            "summary": summary[:200],
+                            "url": href,
+                            "date": date,
+                            "category": self.get_news_category(section_url),
+                            "source": "北京大学新闻网",
+                            "crawl_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                            "type": "news"
+                        })
+                except Exception as e:
+                    continue
         return news_list
     
     def crawl_course_info(self):
         """获取课程信息"""
+        return list(self.iter_course_info())
+
+    def iter_course_info(self):
+        """获取课程信息（逐条产出）"""
         print("📝 获取课程信息...")
         
-        courses = []
-        
         # 尝试从公开信息获取课程
         try:
             # 这里可以尝试访问公开课程页面
             # 由于课程信息可能需要登录，我们使用公开可访问的信息
-            response = self.session.get("http://www.pku.edu.cn", timeout=10)
+            response = self._get("http://www.pku.edu.cn")
             
             # 如果能够获取到页面，可以解析相关内容
             # 由于课程数据较难爬取，我们生成基于真实信息的课程数据
             
-            courses = self.generate_pku_courses(200)
-            
         except Exception as e:
             print(f"⚠️ 课程信息获取遇到问题: {e}")
-            courses = self.generate_pku_courses(200)
         
-        return courses
+        yield from self.iter_generated_courses(200)
     
     def crawl_notices(self):
         """爬取通知公告"""
+        return list(self.iter_notices())
+
+    def iter_notices(self):
+        """爬取通知公告（逐条产出）"""
         print("📢 爬取校园通知公告...")
         
         notices = []
@@ -202,127 +368,82 @@ class RealPKUCrawler:
         
         for url in notice_urls[:1]:  # 先尝试第一个
             try:
-                response = self.session.get(url, timeout=10)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # 查找公告链接
-                    notice_links = soup.select('a[href*="notice"], a[href*="announce"]')
-                    
-                    for link in notice_links[:30]:
-                        title = link.get_text(strip=True)
-                        if title and len(title) > 5:
-                            notices.append({
-                                "notice_id": f"notice_{len(notices)+1:04d}",
-                                "title": title,
-                                "url": link.get('href', ''),
-                                "date": datetime.now().strftime("%Y-%m-%d"),
-                                "type": "notice",
-                                "source": "北京大学通知公告"
-                            })
-                    
-                    break  # 成功获取后退出
+                notices = self._fetch_page(url, self.parse_notices_page)["records"]
+                break  # 成功获取后退出
                     
             except Exception as e:
                 print(f"⚠️ 公告爬取失败 {url}: {e}")
                 continue
         
+        yield from notices
         # 补充公告数据
         if len(notices) < 100:
-            notices.extend(self.generate_pku_notices(100 - len(notices)))
+            yield from self.iter_generated_notices(100 - len(notices))
         
-        print(f"✅ 获取到 {len(notices)} 条通知公告")
+        print(f"✅ 获取到 {max(len(notices), 100)} 条通知公告")
+
+    def parse_notices_page(self, doc, url):
+        """解析通知公告页面"""
+        notices = []
+        
+        # 查找公告链接
+        notice_links = self.parser.notice_links(doc)
+        
+        for link in notice_links[:30]:
+            title = self.parser.text(link)
+            if title and len(title) > 5:
+                href = self.parser.attr(link, 'href')
+                notices.append({
+                    "notice_id": content_id("notice", href or title),
+                    "title": title,
+                    "url": href,
+                    "date": datetime.now().strftime("%Y-%m-%d"),
+                    "type": "notice",
+                    "source": "北京大学通知公告"
+                })
         return notices
     
     # 辅助生成函数（基于真实信息）
     def generate_pku_books(self, count):
         """生成北京大学相关图书数据"""
-        books = []
-        
-        pku_book_titles = [
-            "北京大学校史", "燕园建筑", "北大风物", "京师大学堂纪事", "红楼忆往",
-            "蔡元培与北大", "胡适北大文集", "李大钊研究文集", "五四运动与北大",
-            "未名湖畔", "博雅塔影", "北大精神", "学术的北大", "北大人物志",
-            "北大讲座精选", "燕园史话", "北大学人", "北大传统", "北大记忆",
-            "燕园景观", "北大历史", "北大文化", "北大教育", "北大科研",
-            "北大与中国现代教育", "北大人物传", "燕园建筑艺术", "北大校史资料",
-            "北大名人录", "北大往事"
-        ]
-        
-        pku_authors = [
-            "北京大学校史馆", "陈平原", "钱理群", "温儒敏", "张颐武", 
-            "王余光", "戴锦华", "韩毓海", "孔庆东", "李零",
-            "欧阳哲生", "夏晓虹", "陈来", "阎步克", "邓小南",
-            "北京大学档案馆", "北大校史研究室", "燕园文化遗产保护协会"
-        ]
-        
-        publishers = [
-            "北京大学出版社", "北京大学出版社", "北京大学出版社",  # 北大出版社占多数
-            "人民出版社", "中华书局", "商务印书馆", "清华大学出版社",
-            "高等教育出版社", "中国社会科学出版社"
-        ]
-        
-        categories = [
-            "校史研究", "人物传记", "建筑艺术", "文化教育", "学术研究",
-            "历史资料", "校园文化", "教育研究", "社会科学"
-        ]
-        
+        return list(self.iter_generated_books(count))
+
+    def iter_generated_books(self, count):
+        """生成北京大学相关图书数据（逐条产出）"""
         for i in range(count):
-            books.append({
-                "book_id": f"gen_book_{len(books)+1:04d}",
-                "title": f"{random.choice(pku_book_titles)} ({i+1})",
-                "author": random.choice(pku_authors),
-                "publisher": random.choice(publishers),
-                "category": random.choice(categories),
+            # 按序号固定随机种子：补充数据每次爬取都相同，不会被增量当作变更
+            rng = random.Random(f"book:{i}")
+            yield {
+                "book_id": f"gen_book_{i+1:04d}",
+                "title": f"{rng.choice(synthetic.BOOK_TITLES)} ({i+1})",
+                "author": rng.choice(synthetic.BOOK_AUTHORS),
+                "publisher": rng.choice(synthetic.BOOK_PUBLISHERS),
+                "category": rng.choice(synthetic.BOOK_CATEGORIES),
                 "year": str(2018 + (i % 6)),
                 "isbn": f"978-7-301-{25000+i:05d}",
                 "description": "北京大学相关研究著作",
                 "source": "北京大学文献资料",
                 "type": "book",
                 "crawl_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })        
-        return books   
+            }        
     def generate_pku_news(self, count):
         """生成北京大学相关新闻"""
-        news_list = []       
-        news_templates = [
-            "北京大学召开{subject}会议",
-            "北大{subject}研究成果在{journal}发表",
-            "{department}举办{activity}活动",
-            "北京大学{project}项目取得新进展",
-            "{expert}教授做客北大讲座",
-            "北大与{institution}签署合作协议",
-            "北京大学{achievement}获奖",
-            "北大{activity}活动圆满举行",
-            "北京大学{field}研究取得突破",
-            "{leader}视察北京大学"
-        ]       
-        subjects = ["学术", "科研", "教学", "国际交流", "人才培养", "学科建设"]
-        departments = ["计算机学院", "数学科学学院", "物理学院", "化学学院", "生命科学学院",
-                      "经济学院", "法学院", "光华管理学院", "新闻与传播学院", "国际关系学院"]
-        journals = ["《自然》", "《科学》", "《细胞》", "《美国科学院院刊》", "《中国社会科学》"]
-        activities = ["学术讲座", "国际会议", "文化节", "创新大赛", "学术论坛"]        
+        return list(self.iter_generated_news(count))
+
+    def iter_generated_news(self, count):
+        """生成北京大学相关新闻（逐条产出）"""
         for i in range(count):
-            template = random.choice(news_templates)
-            title = template.format(
-                subject=random.choice(subjects),
-                department=random.choice(departments),
-                journal=random.choice(journals),
-                activity=random.choice(activities),
-                project=f"重大科研项目{i%10+1}",
-                expert=random.choice(["张", "李", "王", "刘", "陈"]) + "教授",
-                institution=random.choice(["哈佛大学", "牛津大学", "清华大学", "中国科学院"]),
-                achievement=random.choice(["自然科学奖", "科技进步奖", "教学成果奖"]),
-                field=random.choice(["人工智能", "量子计算", "生物医学", "环境保护"]),
-                leader=random.choice(["教育部", "科技部", "北京市"]) + "领导"
-            )
+            rng = random.Random(f"news:{i}")
+            template = rng.choice(synthetic.NEWS_TEMPLATES)
+            slots = {slot: rng.choice(values) for slot, values in synthetic.NEWS_SLOTS.items()}
+            title = template.format(project=f"重大科研项目{i%10+1}", **slots)
             
             # 生成过去一年的随机日期
-            days_ago = random.randint(1, 365)
+            days_ago = rng.randint(1, 365)
             news_date = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d")
             
-            news_list.append({
-                "news_id": f"gen_news_{len(news_list)+1:04d}",
+            yield {
+                "news_id": f"gen_news_{i+1:04d}",
                 "title": title,
                 "summary": f"北京大学相关动态：{title}。这是基于真实校园活动的模拟新闻内容。",
                 "content": f"详细内容：北京大学在相关领域取得了新的进展和成果。这条新闻反映了学校的学术活动和校园动态。",
@@ -331,65 +452,48 @@ class RealPKUCrawler:
                 "source": "北京大学新闻网（模拟）",
                 "type": "news",
                 "crawl_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })        
-        return news_list    
+            }        
     def generate_pku_courses(self, count):
         """生成北京大学课程数据"""
-        courses = []        
-        course_names = [
-            "计算概论", "数据结构与算法", "人工智能导论", "机器学习", "深度学习",
-            "高等数学", "线性代数", "概率统计", "大学物理", "普通化学",
-            "中国通史", "世界文明史", "哲学导论", "经济学原理", "法学原理",
-            "文学概论", "艺术导论", "社会学概论", "心理学导论", "政治学原理",
-            "计算机组成", "操作系统", "计算机网络", "数据库系统", "软件工程",
-            "数字电路", "信号处理", "自动控制", "通信原理", "电子技术"
-        ]        
-        departments = [
-            "计算机科学与技术学院", "数学科学学院", "物理学院", "化学与分子工程学院",
-            "生命科学学院", "城市与环境学院", "心理与认知科学学院", "中国语言文学系",
-            "历史学系", "哲学系", "国际关系学院", "法学院", "经济学院",
-            "光华管理学院", "新闻与传播学院", "艺术学院", "社会学系"
-        ]        
-        teachers = [
-            "张明", "李华", "王强", "刘洋", "陈静", "赵宇", "周涛", "吴帆",
-            "郑洁", "孙磊", "钱勇", "冯军", "韩梅", "杨光", "朱红", "秦峰"
-        ]        
+        return list(self.iter_generated_courses(count))
+
+    def iter_generated_courses(self, count):
+        """生成北京大学课程数据（逐条产出）"""
         for i in range(count):
-            course_name = random.choice(course_names)
+            rng = random.Random(f"course:{i}")
+            course_name = rng.choice(synthetic.COURSE_NAMES)
             if i > 0 and i % 10 == 0:
                 course_name = f"高级{course_name}"
             
-            courses.append({
-                "course_id": f"course_{len(courses)+1:04d}",
+            yield {
+                "course_id": f"course_{i+1:04d}",
                 "name": course_name,
                 "code": f"PKU{1000+i:04d}",
-                "teacher": random.choice(teachers) + "教授",
-                "department": random.choice(departments),
-                "credit": random.choice([1, 2, 3, 4]),
-                "hours": random.choice([16, 32, 48, 64]),
-                "semester": random.choice(["2024春季", "2024秋季", "2025春季"]),
+                "teacher": rng.choice(synthetic.COURSE_TEACHERS) + "教授",
+                "department": rng.choice(synthetic.COURSE_DEPARTMENTS),
+                "credit": rng.choice(synthetic.COURSE_CREDITS),
+                "hours": rng.choice(synthetic.COURSE_HOURS),
+                "semester": rng.choice(synthetic.COURSE_SEMESTERS),
                 "type": "course",
                 "description": f"北京大学{course_name}课程，旨在培养学生相关能力。",
                 "source": "北京大学课程信息",
                 "crawl_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })        
-        return courses   
+            }        
     def generate_pku_notices(self, count):
         """生成通知公告"""
-        notices = []        
-        notice_types = [
-            "学术讲座通知", "会议通知", "放假通知", "选课通知", "考试安排",
-            "成绩查询通知", "奖学金申请", "项目申报", "招聘信息", "活动通知",
-            "系统维护通知", "校园施工通知", "安全提示", "防疫通知", "缴费通知"
-        ]        
+        return list(self.iter_generated_notices(count))
+
+    def iter_generated_notices(self, count):
+        """生成通知公告（逐条产出）"""
         for i in range(count):
-            notice_type = random.choice(notice_types)            
+            rng = random.Random(f"notice:{i}")
+            notice_type = rng.choice(synthetic.NOTICE_TYPES)            
             # 生成未来或近期的日期
-            days_offset = random.randint(-30, 30)
+            days_offset = rng.randint(-30, 30)
             notice_date = (datetime.now() + timedelta(days=days_offset)).strftime("%Y-%m-%d")
             
-            notices.append({
-                "notice_id": f"notice_{len(notices)+1:04d}",
+            yield {
+                "notice_id": f"notice_{i+1:04d}",
                 "title": f"关于{notice_type}的通知（{i+1}）",
                 "content": f"请各位师生注意：{notice_type}的具体安排和要求。详细内容请查看相关链接或咨询负责部门。",
                 "date": notice_date,
@@ -397,8 +501,7 @@ class RealPKUCrawler:
                 "category": notice_type,
                 "source": "北京大学相关部门",
                 "crawl_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })       
-        return notices    
+            }       
     def get_book_category(self, index):
         """获取图书分类"""
         categories = [
@@ -418,75 +521,88 @@ class RealPKUCrawler:
             return "综合新闻"    
     def get_news_category_by_title(self, title):
         """根据标题判断新闻分类"""
-        keywords = {
-            "学术": "学术动态",
-            "科研": "科研成果", 
-            "会议": "会议活动",
-            "讲座": "学术讲座",
-            "获奖": "荣誉表彰",
-            "合作": "国际交流",
-            "视察": "领导关怀"
-        }        
-        for key, category in keywords.items():
-            if key in title:
-                return category        
-        return "校园动态"   
-    def save_all_data(self, books, news, courses, notices):
-        """保存所有数据"""
-        os.makedirs("data/raw", exist_ok=True)       
-        # 合并所有数据
-        all_data = []       
-        # 转换并保存每种数据
-        data_types = [
-            ("books", books, ["title", "author", "category", "year"]),
-            ("news", news, ["title", "date", "category", "summary"]),
-            ("courses", courses, ["name", "teacher", "department", "credit"]),
-            ("notices", notices, ["title", "date", "category", "content"])
-        ]        
-        for data_name, data_list, key_fields in data_types:
-            if data_list:
-                df = pd.DataFrame(data_list)
-                csv_path = f"data/raw/{data_name}.csv"
-                json_path = f"data/raw/{data_name}.json"
-                
-                df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(data_list, f, ensure_ascii=False, indent=2)
-                
-                print(f"💾 保存{data_name}: {len(data_list)}条 -> {csv_path}")                
-                # 添加到总数据
-                for item in data_list:
-                    all_data.append(item)
-        
-        return all_data    
-    def run(self):
-        """运行爬虫"""
+        return synthetic.news_category(title)
+    def save_delta(self, data_name, delta):
+        """写入单个数据集的增量文件（无变化时跳过）"""
+        summary = storage.delta_summary(delta)
+        self.delta_stats[data_name] = summary
+        if any(summary.values()):
+            delta_file = storage.write_delta(data_name, delta)
+            print(f"🔁 {data_name}增量: 新增{summary['added']} 变更{summary['changed']} "
+                  f"删除{summary['deleted']} -> {delta_file}")
+        else:
+            print(f"🔁 {data_name}无变化")
+
+    def stream_all_data(self, parquet=False):
+        """
+        流式爬取并保存：记录到达即追加写入 data/raw/<name>.jsonl（可选Parquet），
+        条数在线统计，不在内存中保留完整列表；返回各数据集条数
+        """
+        manifest = storage.load_manifest() if self.incremental else None
+        sources = [
+            ("books", self.iter_library_books),
+            ("news", self.iter_pku_news),
+            ("courses", self.iter_course_info),
+            ("notices", self.iter_notices)
+        ]
+        sinks = {
+            name: storage.RawSink(name, parquet=parquet,
+                                  previous_hashes=manifest.get(name, {}) if manifest is not None else None)
+            for name, _ in sources
+        }
+        try:
+            if self.concurrent:
+                with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+                    futures = [pool.submit(sinks[name].write_all, produce()) for name, produce in sources]
+                    for future in futures:
+                        future.result()
+            else:
+                for name, produce in sources:
+                    sinks[name].write_all(produce())
+        except Exception:
+            for sink in sinks.values():
+                sink.abort()
+            raise
+        for name, sink in sinks.items():
+            sink.close()
+            print(f"💾 保存{name}: {sink.count}条 -> data/raw/{name}.jsonl")
+        if manifest is not None:
+            for name, sink in sinks.items():
+                self.save_delta(name, sink.tracker.delta())
+                manifest[name] = sink.tracker.hashes
+            storage.save_manifest(manifest)
+        return {name: sink.count for name, sink in sinks.items()}    
+    def run(self, parquet=False):
+        """运行爬虫：边爬取边写入 data/raw/<name>.jsonl（可选Parquet），不在内存中保留完整列表"""
         print("=" * 60)
         print("北京大学真实数据爬取系统")
         print("=" * 60)
         start_time = time.time()
-        # 爬取所有数据
-        print("\n🚀 开始爬取数据...")        
-        books = self.crawl_library_books()
-        time.sleep(2)        
-        news = self.crawl_pku_news()
-        time.sleep(2)        
-        courses = self.crawl_course_info()
-        time.sleep(1)        
-        notices = self.crawl_notices()        
-        # 保存数据
-        print("\n💾 保存数据...")
-        all_data = self.save_all_data(books, news, courses, notices)        
+        metrics.begin_run()
+        # 爬取并保存所有数据
+        print("\n🚀 开始爬取数据...")
+        with metrics.span("fetch_and_save") as s:
+            counts = self.stream_all_data(parquet=parquet)
+            s["rows"] = sum(counts.values())
+            s["bytes"] = metrics.file_bytes(*(f"{storage.RAW_DIR}/{name}.{ext}" for name in counts
+                                               for ext in (("jsonl", "parquet") if parquet else ("jsonl",))))
+        if self.cache:
+            self.cache.flush()
         # 生成统计信息
-        total = len(all_data)
+        total = sum(counts.values())
         stats = {
             "crawl_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "execution_time": round(time.time() - start_time, 2),
+            "crawl_mode": "concurrent" if self.concurrent else "sequential",
             "total_records": total,
-            "books_count": len(books),
-            "news_count": len(news),
-            "courses_count": len(courses),
-            "notices_count": len(notices),
+            "books_count": counts["books"],
+            "news_count": counts["news"],
+            "courses_count": counts["courses"],
+            "notices_count": counts["notices"],
+            "http_stats": self.transport.stats(),
+            "cache_hits": self.cache.hits if self.cache else 0,
+            "cache_misses": self.cache.misses if self.cache else 0,
+            "delta": self.delta_stats,
             "data_sources": [
                 "北京大学图书馆新书通报",
                 "北京大学新闻网", 
@@ -498,20 +614,25 @@ class RealPKUCrawler:
         # 保存统计
         with open("data/statistics.json", "w", encoding='utf-8') as f:
             json.dump(stats, f, ensure_ascii=False, indent=2)        
+        metrics.save_run("crawl")
         print("\n" + "=" * 60)
         print("✅ 数据爬取完成!")
         print(f"📊 统计数据:")
         print(f"   总数据量: {total}条")
-        print(f"   图书数据: {len(books)}条")
-        print(f"   新闻数据: {len(news)}条")
-        print(f"   课程数据: {len(courses)}条")
-        print(f"   公告数据: {len(notices)}条")
-        print(f"⏱️  耗时: {stats['execution_time']}秒")
+        print(f"   图书数据: {counts['books']}条")
+        print(f"   新闻数据: {counts['news']}条")
+        print(f"   课程数据: {counts['courses']}条")
+        print(f"   公告数据: {counts['notices']}条")
+        print(f"   页面缓存: 命中{stats['cache_hits']}次, 未命中{stats['cache_misses']}次")
+        print(f"⏱️  耗时: {stats['execution_time']}秒 ({stats['crawl_mode']})")
         print("=" * 60)        
         return stats
-def run_crawler():
+def run_crawler(concurrent=True, transport=None, incremental=False, parquet=False):
     """运行爬虫的外部接口"""
-    crawler = RealPKUCrawler()
-    return crawler.run()
+    crawler = RealPKUCrawler(concurrent=concurrent, transport=transport, incremental=incremental)
+    try:
+        return crawler.run(parquet=parquet)
+    finally:
+        crawler.transport.close()
 if __name__ == "__main__":
     run_crawler()
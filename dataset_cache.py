@@ -0,0 +1,141 @@
+"""
+API数据集缓存 - 进程内缓存已解析、已填充空值的处理后数据
+按 (文件路径, mtime, inode, 大小) 识别文件版本；处理器原子替换文件后，下一次请求重新加载并整体替换缓存项
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import storage
+from query_index import DatasetIndex
+
+# 缓存总大小上限（估算值），可用环境变量 DATASET_CACHE_MB 调整
+DEFAULT_MAX_BYTES = int(os.environ.get('DATASET_CACHE_MB', 256)) * 1024 * 1024
+
+
+def date_formats(df):
+    """各日期列的输出格式：整列都不含时间部分时只输出日期"""
+    import pandas as pd
+    formats = {}
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            values = df[col].dropna()
+            formats[col] = '%Y-%m-%d' if (values == values.dt.normalize()).all() else '%Y-%m-%d %H:%M:%S'
+    return formats
+
+
+def frame_to_records(df, formats=None):
+    """
+    DataFrame转为可JSON序列化的记录（日期转字符串，空值填充为“未知”）
+    只转换部分行时，formats应由完整数据计算（date_formats），保证与完整转换的结果一致
+    """
+    formats = date_formats(df) if formats is None else formats
+    df = df.copy()
+    for col in df.columns:
+        if str(df[col].dtype) == 'category':
+            df[col] = df[col].astype(object)
+        elif col in formats:
+            df[col] = df[col].dt.strftime(formats[col])
+    # 处理空值
+    df = df.fillna('未知')
+    return df.to_dict('records')
+
+
+def file_signature(path):
+    """文件版本标识：原子替换会产生新的inode，原地改写会改变mtime/大小"""
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+
+class CachedDataset:
+    """
+    一个数据集的缓存项（创建后不再修改）：
+    类型化的DataFrame + 可直接序列化的记录列表 + 查询索引
+    """
+
+    def __init__(self, name, signature, frame):
+        self.name = name
+        self.signature = signature
+        self.frame = frame
+        self.records = frame_to_records(frame)
+        self.version = f"{signature[1]:x}{signature[2]:x}"
+        self.index = DatasetIndex(frame, self.version)
+        # 记录列表大约与DataFrame深度占用同量级，按两倍估算
+        self.size = int(frame.memory_usage(deep=True).sum()) * 2
+
+
+class DatasetCache:
+    """
+    进程级数据集缓存（线程安全）
+    - get() 每次只做一次stat比对版本，版本未变时直接返回缓存项
+    - 重新加载在锁外完成，加载好后整体替换，读者始终看到完整的一个版本
+    - 总大小超过max_bytes时按最近最少使用淘汰（刚加载的数据集不会被淘汰）
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, processed_dir=storage.PROCESSED_DIR):
+        self.max_bytes = max_bytes
+        self.processed_dir = processed_dir
+        self.loads = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def get(self, name):
+        """返回数据集的缓存项，处理后数据不存在时返回None"""
+        path = storage.processed_source_path(name, self.processed_dir)
+        try:
+            signature = file_signature(path) if path else None
+        except FileNotFoundError:
+            signature = None
+        if signature is None:
+            with self._lock:
+                self._entries.pop(name, None)
+            return None
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(name)
+                return entry
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        # 同一数据集只由一个线程加载，其他线程等待后直接使用加载结果
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None and entry.signature == signature:
+                    return entry
+            frame = storage.load_processed(name, processed_dir=self.processed_dir)
+            if frame is None:
+                return None
+            entry = CachedDataset(name, signature, frame)
+            with self._lock:
+                self._entries[name] = entry
+                self._entries.move_to_end(name)
+                self.loads += 1
+                self._evict(keep=name)
+            return entry
+
+    def _evict(self, keep):
+        """超出容量时淘汰最久未使用的数据集（调用方需持有锁）"""
+        total = sum(entry.size for entry in self._entries.values())
+        for name in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            total -= self._entries.pop(name).size
+        if total > self.max_bytes:
+            print(f"⚠️ 数据集{keep}超出缓存上限（{total // 1024 // 1024}MB）")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"datasets": list(self._entries), "loads": self.loads,
+                    "bytes": sum(entry.size for entry in self._entries.values()),
+                    "max_bytes": self.max_bytes}
+
+
+# 应用进程共享的缓存实例
+dataset_cache = DatasetCache()
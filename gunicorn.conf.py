@@ -0,0 +1,123 @@
+"""
+gunicorn配置 - 主进程预加载应用与重型依赖后再fork，worker以写时复制方式共享这部分内存
+每个worker启动后报告应用加载耗时与内存占用（RSS/PSS/USS）
+各worker的请求指标写入 data/metrics/web/，任一worker的 /metrics 合并输出（启动时清空）
+
+用法: gunicorn -c gunicorn.conf.py app:app
+环境变量:
+    PORT               监听端口（默认8080）
+    WEB_CONCURRENCY    worker数量（默认4）
+    PRELOAD_APP        0 表示每个worker各自导入应用（默认1，主进程预加载）
+    PRELOAD_MODULES    预加载时在主进程导入的重型模块（逗号分隔，空字符串表示不导入）
+    PRELOAD_DATA       1 表示fork前在主进程加载处理后数据到缓存（默认0）
+    REFRESH_INTERVAL   大于0时主进程启动后台刷新进程，按该间隔（秒）重新爬取处理并切换数据版本（见refresher.py）
+"""
+import gc
+import importlib
+import os
+import resource
+import subprocess
+import sys
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+preload_app = os.environ.get('PRELOAD_APP', '1') != '0'
+# 数据接口首次请求需要这些模块；预加载后worker无需再导入
+PRELOAD_MODULES = [m for m in os.environ.get('PRELOAD_MODULES', 'numpy,pandas,pyarrow.parquet').split(',') if m]
+PRELOAD_DATA = os.environ.get('PRELOAD_DATA', '0') == '1'
+REFRESH_INTERVAL = float(os.environ.get('REFRESH_INTERVAL', 0))
+# 报告中列出是否已加载的重型模块
+HEAVY_MODULES = ['numpy', 'pandas', 'pyarrow', 'matplotlib', 'requests', 'bs4']
+
+
+def memory_usage():
+    """当前进程内存（MB）：rss、pss（共享页按进程数分摊）、uss（独占页）；非Linux只有rss峰值"""
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                    usage[key] = int(value.split()[0]) / 1024
+    except OSError:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS单位为字节，Linux为KB
+        return {'rss': maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)}
+    return {'rss': usage.get('Rss', 0), 'pss': usage.get('Pss', 0),
+            'uss': usage.get('Private_Clean', 0) + usage.get('Private_Dirty', 0)}
+
+
+def format_usage(usage):
+    return " ".join(f"{key}={value:.1f}MB" for key, value in usage.items())
+
+
+def when_ready(server):
+    """fork worker之前在主进程执行：清空上次运行的worker请求指标，导入重型模块、可选地加载数据，然后冻结GC"""
+    import shutil
+    import metrics
+    shutil.rmtree(metrics.WEB_METRICS_DIR, ignore_errors=True)
+    if REFRESH_INTERVAL > 0:
+        start_refresher(server)
+    if not preload_app:
+        return
+    timings = []
+    for module in PRELOAD_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            server.log.warning(f"⚠️ 预加载模块{module}失败: {e}")
+            continue
+        timings.append(f"{module}={(time.perf_counter() - start) * 1000:.0f}ms")
+    if PRELOAD_DATA:
+        from dataset_cache import dataset_cache
+        from precomputed import DATASETS
+        start = time.perf_counter()
+        for name in DATASETS:
+            dataset_cache.get(name)
+        timings.append(f"data={(time.perf_counter() - start) * 1000:.0f}ms")
+    # 已有对象移入永久代，避免worker中的GC扫描触发写时复制
+    gc.freeze()
+    server.log.info(f"📦 主进程预加载完成 {' '.join(timings)} {format_usage(memory_usage())}")
+
+
+def start_refresher(server):
+    """建立版本目录布局（须在fork worker之前），再启动独立的刷新进程；失败时只记录日志，Web照常服务"""
+    import refresher
+    try:
+        refresher.ensure_layout()
+        server.refresher = subprocess.Popen([sys.executable, refresher.__file__, '--interval', str(REFRESH_INTERVAL)])
+    except Exception as e:
+        server.log.error(f"❌ 后台刷新进程启动失败，继续使用现有数据: {e}")
+        return
+    server.log.info(f"🔄 后台刷新进程已启动 pid={server.refresher.pid} 间隔={REFRESH_INTERVAL:.0f}s")
+
+
+def on_exit(server):
+    """主进程退出时结束刷新进程（未完成的版本由刷新进程自行清理）"""
+    process = getattr(server, 'refresher', None)
+    if process is not None and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def post_fork(server, worker):
+    worker.fork_time = time.perf_counter()
+
+
+def post_worker_init(worker):
+    """worker加载应用后报告：加载耗时（预加载时接近0）、内存占用与已加载的重型模块"""
+    load_ms = (time.perf_counter() - worker.fork_time) * 1000
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+    worker.log.info(f"👷 worker {worker.pid} 就绪: 应用加载={load_ms:.0f}ms "
+                    f"{format_usage(memory_usage())} 已加载模块=[{', '.join(loaded)}]")
+
+
+def worker_exit(server, worker):
+    """worker退出前写出最后一批请求指标（限频期内的请求不丢失）"""
+    import metrics
+    metrics.flush_web(force=True)
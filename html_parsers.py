@@ -0,0 +1,183 @@
+"""
+HTML解析后端 - lxml（预编译XPath）与BeautifulSoup（html.parser）两种实现
+爬虫只通过这里的接口访问页面结构，便于切换后端与对比性能
+"""
+import threading
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml为可选依赖，缺失时回退到BeautifulSoup
+    lxml = None
+
+
+def _class_xpath(class_name):
+    """CSS类选择器对应的XPath条件"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+# 各数据源的列表项选择器：(CSS选择器, 等价XPath)，按顺序尝试
+SOURCE_SELECTORS = {
+    "books": [
+        ('.book-list li', f"//*[{_class_xpath('book-list')}]//li"),
+        ('.book-item', f"//*[{_class_xpath('book-item')}]"),
+        ('.list-item', f"//*[{_class_xpath('list-item')}]"),
+        ('table tr', "//table//tr"),
+        ('.result-item', f"//*[{_class_xpath('result-item')}]"),
+        ('.item', f"//*[{_class_xpath('item')}]"),
+    ],
+    "news": [
+        ('.news-list li', f"//*[{_class_xpath('news-list')}]//li"),
+        ('.list li', f"//*[{_class_xpath('list')}]//li"),
+        ('.article-list li', f"//*[{_class_xpath('article-list')}]//li"),
+        ('ul li a', "//ul//li//a"),
+        ('.item', f"//*[{_class_xpath('item')}]"),
+        ('.news-item', f"//*[{_class_xpath('news-item')}]"),
+    ],
+}
+
+# 列表项“至少要有多少个”才认为选择器命中
+MIN_ITEMS = {"books": 6, "news": 4}
+
+SUMMARY_CSS = '.summary, .intro, .description'
+SUMMARY_XPATH = (f".//*[{_class_xpath('summary')} or {_class_xpath('intro')} "
+                 f"or {_class_xpath('description')}]")
+NOTICE_CSS = 'a[href*="notice"], a[href*="announce"]'
+NOTICE_XPATH = "//a[contains(@href, 'notice') or contains(@href, 'announce')]"
+
+
+class BaseParser:
+    """解析后端公共逻辑：记住每个URL上次命中的选择器，下次优先尝试"""
+    name = "base"
+
+    def __init__(self):
+        self._last_selector = {}
+        self._lock = threading.Lock()
+
+    def select_items(self, doc, source, url):
+        """返回 (列表项, 命中的CSS选择器)，未命中时返回 ([], None)"""
+        selectors = SOURCE_SELECTORS[source]
+        min_items = MIN_ITEMS[source]
+        with self._lock:
+            last = self._last_selector.get(url)
+        order = list(range(len(selectors)))
+        if last is not None:
+            order.remove(last)
+            order.insert(0, last)
+        for index in order:
+            items = self._select(doc, index, source)
+            if len(items) >= min_items:
+                with self._lock:
+                    self._last_selector[url] = index
+                return items, selectors[index][0]
+        return [], None
+
+    def _select(self, doc, index, source):
+        raise NotImplementedError
+
+
+class LxmlParser(BaseParser):
+    """lxml后端：XPath在构造时预编译，文本提取不重新序列化元素"""
+    name = "lxml"
+
+    def __init__(self):
+        super().__init__()
+        self._html_parser = lxml.html.HTMLParser(encoding='utf-8')
+        self._compiled = {
+            source: [etree.XPath(xpath) for _, xpath in selectors]
+            for source, selectors in SOURCE_SELECTORS.items()
+        }
+        self._summary = etree.XPath(SUMMARY_XPATH)
+        self._first_link = etree.XPath("(.//a)[1]")
+        self._all_links = etree.XPath("//a[@href]")
+        self._notice_links = etree.XPath(NOTICE_XPATH)
+
+    def parse(self, html):
+        if isinstance(html, str):
+            html = html.encode('utf-8')
+        return lxml.html.document_fromstring(html, parser=self._html_parser)
+
+    def _select(self, doc, index, source):
+        return self._compiled[source][index](doc)
+
+    def text(self, element):
+        return "".join(part.strip() for part in element.itertext())
+
+    def first_link(self, item):
+        links = self._first_link(item)
+        return links[0] if links else None
+
+    def attr(self, element, name, default=''):
+        return element.get(name, default)
+
+    def summary(self, item):
+        found = self._summary(item)
+        return self.text(found[0]) if found else None
+
+    def search_text(self, item):
+        """用于日期等正则匹配的文本：元素文本加上属性值（替代str(item)）"""
+        parts = [self.text(item)]
+        for element in item.iter():
+            parts.extend(element.attrib.values())
+        return " ".join(parts)
+
+    def page_links(self, doc):
+        """返回 [(文本, href, rel列表)]"""
+        return [(self.text(a), a.get('href'), (a.get('rel') or '').split())
+                for a in self._all_links(doc)]
+
+    def notice_links(self, doc):
+        return self._notice_links(doc)
+
+
+class SoupParser(BaseParser):
+    """BeautifulSoup后端（html.parser），lxml不可用时使用"""
+    name = "html.parser"
+
+    def parse(self, html):
+        return BeautifulSoup(html, 'html.parser')
+
+    def _select(self, doc, index, source):
+        return doc.select(SOURCE_SELECTORS[source][index][0])
+
+    def text(self, element):
+        return element.get_text(strip=True)
+
+    def first_link(self, item):
+        return item.find('a')
+
+    def attr(self, element, name, default=''):
+        return element.get(name, default)
+
+    def summary(self, item):
+        found = item.select_one(SUMMARY_CSS)
+        return found.get_text(strip=True) if found else None
+
+    def search_text(self, item):
+        parts = [item.get_text(" ", strip=True)]
+        for element in [item] + item.find_all(True):
+            for value in element.attrs.values():
+                parts.append(" ".join(value) if isinstance(value, list) else value)
+        return " ".join(parts)
+
+    def page_links(self, doc):
+        return [(a.get_text(strip=True), a['href'], a.get('rel') or [])
+                for a in doc.find_all('a', href=True)]
+
+    def notice_links(self, doc):
+        return doc.select(NOTICE_CSS)
+
+
+PARSERS = {"lxml": LxmlParser, "html.parser": SoupParser}
+
+
+def make_parser(name=None):
+    """创建解析后端；默认使用lxml，未安装时回退到html.parser"""
+    if name is None:
+        name = "lxml" if lxml is not None else "html.parser"
+    if name == "lxml" and lxml is None:
+        print("⚠️ 未安装lxml，回退到html.parser")
+        name = "html.parser"
+    return PARSERS[name]()
@@ -0,0 +1,124 @@
+"""
+爬虫条件请求缓存 - 按URL保存ETag/Last-Modified与上次解析出的记录
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    磁盘响应缓存（默认位于 data/cache/http/）
+    - index.json 记录每个URL的ETag、Last-Modified、记录文件、大小与最近访问时间
+    - 每个URL解析出的记录单独保存为一个JSON文件
+    - 总大小超过max_bytes时按最近最少使用（LRU）淘汰
+    """
+
+    def __init__(self, cache_dir="data/cache/http", max_bytes=50 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _records_path(self, url):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def conditional_headers(self, url):
+        """生成条件请求头（If-None-Match / If-Modified-Since），无缓存时返回None"""
+        with self._lock:
+            entry = self._index.get(url)
+        if not entry:
+            return None
+        headers = {}
+        if entry.get("etag"):
+            headers['If-None-Match'] = entry["etag"]
+        if entry.get("last_modified"):
+            headers['If-Modified-Since'] = entry["last_modified"]
+        return headers or None
+
+    def load_records(self, url):
+        """读取上次解析出的记录（304时使用），缓存文件丢失时返回None"""
+        try:
+            with open(self._records_path(url), 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self._index.pop(url, None)
+            return None
+        with self._lock:
+            if url in self._index:
+                self._index[url]["last_access"] = time.time()
+            self.hits += 1
+        return records
+
+    def store(self, url, response, records):
+        """保存新响应的校验信息与解析结果；响应不带校验信息时不缓存"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        payload = json.dumps(records, ensure_ascii=False)
+        # 每次写入使用唯一的临时文件，同一URL并发保存时不会互相覆盖写了一半的内容；
+        # 替换与索引更新在锁内进行，记录文件与索引中的校验信息来自同一次保存
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.cache_dir,
+                                         suffix='.tmp', delete=False) as f:
+            f.write(payload)
+        with self._lock:
+            os.replace(f.name, self._records_path(url))
+            self._index[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": len(payload.encode('utf-8')),
+                "last_access": time.time(),
+            }
+            self._evict()
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def _evict(self):
+        """超出容量时按最近访问时间淘汰（调用方需持有锁）"""
+        total = sum(entry["size"] for entry in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for url, entry in sorted(self._index.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            del self._index[url]
+            try:
+                os.remove(self._records_path(url))
+            except FileNotFoundError:
+                pass
+
+    def flush(self):
+        """把索引写回磁盘"""
+        with self._lock:
+            if not self._index and not os.path.exists(self.index_path):
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+
+    def stats(self):
+        with self._lock:
+            return {"cache_hits": self.hits, "cache_misses": self.misses,
+                    "cache_entries": len(self._index)}
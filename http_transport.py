@@ -0,0 +1,159 @@
+"""
+爬虫HTTP传输层 - 分主机连接池、抖动指数退避重试、分主机请求统计
+"""
+import random
+import threading
+import time
+from urllib.parse import urlparse, urlunparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# 可重试的HTTP状态码（限流与服务端临时错误）
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HttpTransport:
+    """
+    爬虫使用的HTTP传输对象
+    - 每个主机一个Session，独立的连接池与keep-alive连接
+    - 连接异常/超时/可重试状态码按抖动指数退避重试
+    - 连接超时与读取超时分开配置
+    - 按主机统计请求数、字节数、重试次数与延迟
+    - host_overrides可将真实主机映射到本地替身服务器，便于离线测试
+      例如 {"news.pku.edu.cn": "http://127.0.0.1:8000"}
+    """
+
+    def __init__(self, headers=None, pool_maxsize=10, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, connect_timeout=5,
+                 read_timeout=10, retry_statuses=RETRY_STATUSES,
+                 host_overrides=None):
+        self.headers = dict(headers or {})
+        self.headers.setdefault('Connection', 'keep-alive')
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = (connect_timeout, read_timeout)
+        self.retry_statuses = set(retry_statuses)
+        self.host_overrides = dict(host_overrides or {})
+        self._sessions = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _session_for(self, host):
+        """获取（或创建）某主机专用的Session"""
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                session.headers.update(self.headers)
+                # 重试由本类负责（需要统计重试次数），适配器本身不重试
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=self.pool_maxsize,
+                                      max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+            return session
+
+    def _host_stats(self, host):
+        """获取某主机的统计记录（调用方需持有锁）"""
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = {
+                "requests": 0,
+                "bytes": 0,
+                "retries": 0,
+                "errors": 0,
+                "latency_total": 0.0,
+                "latency_max": 0.0,
+            }
+            self._stats[host] = stats
+        return stats
+
+    def resolve(self, url):
+        """按host_overrides改写URL（离线测试用）"""
+        parsed = urlparse(url)
+        target = self.host_overrides.get(parsed.netloc)
+        if not target:
+            return url
+        override = urlparse(target)
+        return urlunparse(parsed._replace(scheme=override.scheme or parsed.scheme,
+                                          netloc=override.netloc))
+
+    def backoff(self, attempt):
+        """第attempt次重试前的等待时间（full jitter指数退避）"""
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def get(self, url, headers=None):
+        """
+        发起GET请求，失败时按退避策略重试
+        返回最后一次的响应；所有尝试都抛出异常时重新抛出最后的异常
+        """
+        host = urlparse(url).netloc
+        session = self._session_for(host)
+        target_url = self.resolve(url)
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = session.get(target_url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(host, time.perf_counter() - start, 0, error=True)
+                if attempt >= self.max_retries:
+                    raise
+                self._record_retry(host)
+                time.sleep(self.backoff(attempt))
+                continue
+
+            self._record(host, time.perf_counter() - start, len(response.content))
+            if response.status_code in self.retry_statuses and attempt < self.max_retries:
+                self._record_retry(host)
+                time.sleep(self._retry_delay(response, attempt))
+                continue
+            return response
+
+    def _retry_delay(self, response, attempt):
+        """优先遵循服务端的Retry-After（秒数形式），否则使用退避时间"""
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return self.backoff(attempt)
+
+    def _record(self, host, latency, size, error=False):
+        with self._lock:
+            stats = self._host_stats(host)
+            stats["requests"] += 1
+            stats["bytes"] += size
+            stats["latency_total"] += latency
+            stats["latency_max"] = max(stats["latency_max"], latency)
+            if error:
+                stats["errors"] += 1
+        metrics.record_request(host, latency, size, error)
+
+    def _record_retry(self, host):
+        with self._lock:
+            self._host_stats(host)["retries"] += 1
+
+    def stats(self):
+        """返回按主机汇总的统计（可直接写入JSON）"""
+        with self._lock:
+            result = {}
+            for host, stats in self._stats.items():
+                item = dict(stats)
+                item["latency_total"] = round(item["latency_total"], 4)
+                item["latency_max"] = round(item["latency_max"], 4)
+                item["latency_avg"] = round(stats["latency_total"] / stats["requests"], 4) if stats["requests"] else 0.0
+                result[host] = item
+            return result
+
+    def close(self):
+        """关闭所有主机的连接池"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
@@ -1,47 +1,52 @@
 # main.py
 import os
-import time
-from datetime import datetime
+import sys
 
-# 导入所有依赖函数
-from crawler import run_crawler
-from processor import run_processing
-from visualizer import run_visualization
-from app import app
+# 批处理模块（requests/bs4、pandas、matplotlib）在用到时才导入，只启动Web服务时不加载
 
 # 修复：删除重复的stats = run_crawler() 避免提前执行爬虫
 # stats = run_crawler()  # 这行是多余的，已删除
 
-def main():
+def run_pipeline(force=()):
+    """
+    批处理流水线：爬取 -> 清洗 -> 汇总分析/可视化 -> 预渲染首页
+    由pipeline.py按依赖关系调度，输入未变化的阶段跳过，失败后重新运行从失败的阶段继续
+    """
+    from pipeline import run
+
+    print("\n[1/2] 运行数据流水线...")
+    return run(force=force)
+
+def serve():
+    """启动Web服务（开发用；生产环境用 gunicorn -c gunicorn.conf.py app:app）"""
+    from app import app, ensure_dirs
+
+    ensure_dirs()
+
+    # 4. 启动Web服务（适配Zeabur端口规则）
+    print("\n[2/2] 启动Web服务...")
+    # 关键修复：读取Zeabur自动注入的PORT环境变量，兼容本地和部署环境
+    port = int(os.environ.get("PORT", 5000))  # Zeabur默认PORT=8080，本地默认5000
+    host = "0.0.0.0"  # 必须绑定0.0.0.0才能被Zeabur访问
+    print(f"✅ 平台已启动！访问 http://{host}:{port}")
+    app.run(
+        host=host,
+        port=port,
+        debug=False,  # 生产环境关闭debug
+        threaded=True  # 开启多线程，提升并发能力
+    )
+
+def main(mode="all"):
+    """mode: all（流水线后启动服务）、pipeline（只运行流水线）、serve（只启动服务）"""
     print("=" * 50)
     print("北京大学校园数据分析平台")
     print("=" * 50)
     
     try:
-        # 1. 爬取数据
-        print("\n[1/4] 开始爬取数据...")
-        stats_crawl = run_crawler()
-        
-        # 2. 处理数据
-        print("\n[2/4] 开始处理数据...")
-        analysis = run_processing()
-        
-        # 3. 生成可视化
-        print("\n[3/4] 生成可视化图表...")
-        run_visualization()
-        
-        # 4. 启动Web服务（适配Zeabur端口规则）
-        print("\n[4/4] 启动Web服务...")
-        # 关键修复：读取Zeabur自动注入的PORT环境变量，兼容本地和部署环境
-        port = int(os.environ.get("PORT", 5000))  # Zeabur默认PORT=8080，本地默认5000
-        host = "0.0.0.0"  # 必须绑定0.0.0.0才能被Zeabur访问
-        print(f"✅ 平台已启动！访问 http://{host}:{port}")
-        app.run(
-            host=host,
-            port=port,
-            debug=False,  # 生产环境关闭debug
-            threaded=True  # 开启多线程，提升并发能力
-        )
+        if mode in ("all", "pipeline"):
+            run_pipeline()
+        if mode in ("all", "serve"):
+            serve()
         
     except Exception as e:
         print(f"❌ 运行出错: {str(e)}")
@@ -60,5 +65,9 @@ if __name__ == "__main__":
     for dir_path in required_dirs:
         os.makedirs(dir_path, exist_ok=True)
     
+    # 用法: python main.py [all|pipeline|serve]
+    mode = sys.argv[1] if len(sys.argv) > 1 else "all"
+    if mode not in ("all", "pipeline", "serve"):
+        sys.exit(f"用法: python {sys.argv[0]} [all|pipeline|serve]")
     # 修复：删除重复的main()调用，避免执行两次全流程
-    main()  # 仅保留一次调用
\ No newline at end of file
+    main(mode)  # 仅保留一次调用
\ No newline at end of file
@@ -0,0 +1,319 @@
+"""
+指标采集 - 批处理各阶段的span（耗时、行数、写出字节数、进程峰值内存）与Web请求延迟直方图，
+以Prometheus文本格式在 /metrics 输出
+
+- 批处理（爬取/处理/可视化）每次运行结束时把本次的指标写入 data/metrics/<组件>.json，
+  Web进程读取后以“最近一次运行”的形式输出
+- gunicorn的每个worker定期把自己的请求指标写入 data/metrics/web/<pid>.json，
+  任一worker响应 /metrics 时合并所有worker的数据
+- 设置环境变量 PIPELINE_PROFILE=1（或逗号分隔的阶段名）时，对应span用cProfile采样，
+  结果写入 data/metrics/profiles/<阶段>-<标签>-<pid>.prof
+"""
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_DIR = "data/metrics"
+WEB_METRICS_DIR = os.path.join(METRICS_DIR, "web")
+PROFILE_DIR = os.path.join(METRICS_DIR, "profiles")
+# 请求/抓取延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# worker写出请求指标的最小间隔（秒）
+WEB_FLUSH_INTERVAL = 5.0
+# 超过该时长未更新的worker文件（已退出的旧进程）不再合并
+WEB_SNAPSHOT_TTL = 24 * 3600
+PIPELINE_COMPONENTS = ["crawl", "process", "visualize", "pipeline"]
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def peak_rss_bytes():
+    """当前进程自启动以来的峰值RSS（Linux的ru_maxrss单位为KB，macOS为字节）"""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class Registry:
+    """
+    一组指标（线程安全）：计数器、直方图，以及按 (阶段, 标签) 累加的span统计
+    snapshot()/merge() 用于跨进程传递（子进程任务、worker文件）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.spans = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            item = self.histograms.get(key)
+            if item is None:
+                item = self.histograms[key] = {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    item["buckets"][i] += 1
+            item["sum"] += value
+            item["count"] += 1
+
+    def add_span(self, stage, duration, rows=0, bytes_written=0, process_peak_rss=0, **labels):
+        key = _key(stage, labels)
+        with self._lock:
+            item = self.spans.get(key)
+            if item is None:
+                item = self.spans[key] = {"count": 0, "seconds": 0.0, "rows": 0, "bytes": 0, "process_peak_rss": 0}
+            item["count"] += 1
+            item["seconds"] += duration
+            item["rows"] += rows
+            item["bytes"] += bytes_written
+            item["process_peak_rss"] = max(item["process_peak_rss"], process_peak_rss)
+
+    def snapshot(self):
+        """可JSON序列化的副本：[[名称, 标签字典, 值], ...]"""
+        with self._lock:
+            return {
+                kind: [[name, dict(labels), json.loads(json.dumps(value))]
+                       for (name, labels), value in getattr(self, kind).items()]
+                for kind in ("counters", "histograms", "spans")
+            }
+
+    def merge(self, snapshot):
+        """合并另一个进程的快照（计数与耗时相加，峰值内存取最大）"""
+        for name, labels, value in snapshot.get("counters", []):
+            self.inc(name, value, **labels)
+        with self._lock:
+            for name, labels, value in snapshot.get("histograms", []):
+                key = _key(name, labels)
+                item = self.histograms.setdefault(key, {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0})
+                item["buckets"] = [a + b for a, b in zip(item["buckets"], value["buckets"])]
+                item["sum"] += value["sum"]
+                item["count"] += value["count"]
+        for name, labels, value in snapshot.get("spans", []):
+            key = _key(name, labels)
+            with self._lock:
+                item = self.spans.setdefault(key, {"count": 0, "seconds": 0.0, "rows": 0, "bytes": 0, "process_peak_rss": 0})
+                for field in ("count", "seconds", "rows", "bytes"):
+                    item[field] += value[field]
+                item["process_peak_rss"] = max(item["process_peak_rss"], value.get("process_peak_rss", 0))
+
+
+# 当前进程的批处理指标（每个组件运行开始时清空）与Web请求指标
+pipeline = Registry()
+web = Registry()
+_profiling = threading.local()
+
+
+def profile_enabled(stage):
+    setting = os.environ.get("PIPELINE_PROFILE", "")
+    if not setting or setting == "0":
+        return False
+    return setting in ("1", "all") or stage in setting.split(",")
+
+
+@contextmanager
+def span(stage, **labels):
+    """
+    记录一个阶段：with span("clean", dataset="books") as s: ...; s["rows"] = len(df)
+    可设置 s["rows"]、s["bytes"]；退出后 s["duration"] 为耗时（秒）
+    """
+    info = {"rows": 0, "bytes": 0, "duration": 0.0}
+    profiler = None
+    # cProfile不能嵌套，外层span已在采样时内层不再采样
+    if profile_enabled(stage) and not getattr(_profiling, "active", False):
+        import cProfile
+        profiler = cProfile.Profile()
+        _profiling.active = True
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        info["duration"] = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            _profiling.active = False
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            suffix = "-".join(str(v) for _, v in sorted(labels.items()))
+            filename = f"{stage}-{suffix}-{os.getpid()}.prof" if suffix else f"{stage}-{os.getpid()}.prof"
+            profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+        pipeline.add_span(stage, info["duration"], int(info["rows"]), int(info["bytes"]), peak_rss_bytes(), **labels)
+
+
+def file_bytes(*paths):
+    """若干文件的总大小（不存在的文件计0），用作span的写出字节数"""
+    return sum(os.path.getsize(path) for path in paths if path and os.path.exists(path))
+
+
+def record_request(host, latency, size, error=False):
+    """一次爬虫HTTP请求（由传输层在每次尝试后调用）"""
+    pipeline.observe("crawl_request_duration_seconds", latency, host=host)
+    pipeline.inc("crawl_response_bytes_total", size, host=host)
+    if error:
+        pipeline.inc("crawl_request_errors_total", host=host)
+
+
+# ===================== 跨进程传递 =====================
+def begin_run():
+    """批处理组件开始运行：清空上一次的指标"""
+    pipeline.clear()
+
+
+def isolated(func, *args):
+    """
+    在进程池任务中执行func：先清空从父进程继承的指标，返回 (func的结果, 本任务的指标快照)
+    父进程用 pipeline.merge() 合并快照
+    """
+    pipeline.clear()
+    return func(*args), pipeline.snapshot()
+
+
+def _write_json_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+def save_run(component, metrics_dir=METRICS_DIR):
+    """批处理组件运行结束：把本次指标写入 <metrics_dir>/<component>.json"""
+    _write_json_atomic(os.path.join(metrics_dir, f"{component}.json"),
+                       {"component": component, "finished": time.time(), "metrics": pipeline.snapshot()})
+
+
+_web_flush = {"last": 0.0}
+
+
+def flush_web(force=False, web_dir=WEB_METRICS_DIR):
+    """把本worker的请求指标写入 <web_dir>/<pid>.json（限频）"""
+    now = time.monotonic()
+    if not force and now - _web_flush["last"] < WEB_FLUSH_INTERVAL:
+        return
+    _web_flush["last"] = now
+    try:
+        _write_json_atomic(os.path.join(web_dir, f"{os.getpid()}.json"), web.snapshot())
+    except OSError:
+        pass
+
+
+# ===================== Prometheus文本格式 =====================
+METRIC_HELP = {
+    "http_request_duration_seconds": "Flask路由的请求延迟（秒）",
+    "http_requests_total": "Flask路由的请求数",
+    "crawl_request_duration_seconds": "最近一次爬取中每个HTTP请求的延迟（秒）",
+    "crawl_response_bytes_total": "最近一次爬取下载的响应字节数",
+    "crawl_request_errors_total": "最近一次爬取中连接失败/超时的请求数",
+    "pipeline_stages_total": "最近一次流水线调度中各阶段的结果（ok/skipped/failed/blocked）",
+}
+SPAN_GAUGES = [
+    ("pipeline_span_seconds", "seconds", "最近一次运行中各阶段的累计耗时（秒）"),
+    ("pipeline_span_count", "count", "最近一次运行中各阶段的执行次数"),
+    ("pipeline_span_rows", "rows", "最近一次运行中各阶段处理的行数"),
+    ("pipeline_span_bytes_written", "bytes", "最近一次运行中各阶段写出的字节数"),
+    ("pipeline_span_process_peak_rss_bytes", "process_peak_rss",
+     "阶段结束时所在进程自启动以来的峰值RSS（字节，包含同一进程中之前阶段的峰值，不是该阶段自身的峰值）"),
+]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def _relabel(snapshot, **extra):
+    """给快照中的所有序列加上额外标签"""
+    return {kind: [[name, dict(labels, **extra), value] for name, labels, value in items]
+            for kind, items in snapshot.items()}
+
+
+def _load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def collect(metrics_dir=METRICS_DIR):
+    """
+    合并本worker与其他worker的请求指标、各批处理组件最近一次运行的指标
+    返回 (合并后的Registry, [(组件, 结束时间)])
+    """
+    merged = Registry()
+    merged.merge(web.snapshot())
+    web_dir = os.path.join(metrics_dir, "web")
+    if os.path.isdir(web_dir):
+        now = time.time()
+        for filename in os.listdir(web_dir):
+            path = os.path.join(web_dir, filename)
+            if not filename.endswith(".json") or filename == f"{os.getpid()}.json":
+                continue
+            try:
+                stale = now - os.path.getmtime(path) > WEB_SNAPSHOT_TTL
+            except OSError:
+                continue
+            snapshot = None if stale else _load_json(path)
+            if snapshot:
+                merged.merge(snapshot)
+    finished = []
+    for component in PIPELINE_COMPONENTS:
+        run = _load_json(os.path.join(metrics_dir, f"{component}.json"))
+        if run:
+            finished.append((component, run["finished"]))
+            merged.merge(_relabel(run["metrics"], component=component))
+    return merged, finished
+
+
+def render(metrics_dir=METRICS_DIR):
+    """输出Prometheus文本格式（/metrics）"""
+    registry, finished = collect(metrics_dir)
+    snapshot = registry.snapshot()
+    lines = []
+    series = {}
+    for kind in ("counters", "histograms"):
+        for name, labels, value in snapshot[kind]:
+            series.setdefault((name, kind), []).append((labels, value))
+    for (name, kind), items in sorted(series.items()):
+        if name in METRIC_HELP:
+            lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+        lines.append(f"# TYPE {name} {'counter' if kind == 'counters' else 'histogram'}")
+        for labels, value in items:
+            if kind == "counters":
+                lines.append(f"{name}{_labels_text(labels)} {value}")
+                continue
+            for bound, count in zip(LATENCY_BUCKETS, value["buckets"]):
+                lines.append(f"{name}_bucket{_labels_text(dict(labels, le=bound))} {count}")
+            lines.append(f"{name}_bucket{_labels_text(dict(labels, le='+Inf'))} {value['count']}")
+            lines.append(f"{name}_sum{_labels_text(labels)} {value['sum']:.6f}")
+            lines.append(f"{name}_count{_labels_text(labels)} {value['count']}")
+    if finished:
+        lines.append("# HELP pipeline_last_run_timestamp_seconds 批处理组件最近一次运行结束的时间")
+        lines.append("# TYPE pipeline_last_run_timestamp_seconds gauge")
+        lines.extend(f'pipeline_last_run_timestamp_seconds{{component="{c}"}} {t:.3f}' for c, t in finished)
+    if snapshot["spans"]:
+        for name, field, help_text in SPAN_GAUGES:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{_labels_text(dict(labels, stage=stage))} {value[field]}"
+                         for stage, labels, value in snapshot["spans"])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,269 @@
+"""
+流水线调度 - 按依赖关系（DAG）运行爬取、清洗、汇总分析、可视化与首页预渲染
+
+- 每个阶段声明输入/输出文件（glob）与实现它的源文件；输入内容、源文件与参数的指纹与上次成功运行一致，
+  且输出文件未被改动时跳过该阶段
+- 依赖都已完成的阶段在进程池中并行执行：四个数据集的清洗互不依赖，汇总分析与图表渲染也可同时进行
+- 每个阶段成功后立即把指纹写入 data/pipeline_state.json；中途崩溃后重新运行，已完成的阶段直接跳过，
+  从失败（或未完成）的阶段继续
+
+用法: python pipeline.py [--force 阶段,...|all] [--workers N] [--dry-run]
+环境变量:
+    CRAWL_MAX_AGE     爬取结果的有效期（秒，默认21600）；爬取没有输入文件，超过有效期才重新爬取
+    PRERENDER_INDEX   0 表示不预渲染首页
+"""
+import argparse
+import glob
+import hashlib
+import importlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import metrics
+import storage
+
+STATE_PATH = "data/pipeline_state.json"
+# 阶段的源文件相对本模块所在目录（refresher在版本目录中运行流水线时，数据路径相对工作目录）
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CRAWL_MAX_AGE = float(os.environ.get("CRAWL_MAX_AGE", 6 * 3600))
+DATASETS = ["books", "courses", "news", "notices"]
+# 原始数据格式：爬虫流式写出JSONL（可选Parquet），合成数据与旧版快照为CSV/JSON（增量文件由汇总阶段消费，不作为清洗的输入）
+RAW_FORMATS = ["csv", "json", "jsonl", "parquet"]
+
+
+class Stage:
+    """
+    流水线中的一个阶段
+    target为 "模块:函数"，在子进程中导入并调用（调度进程不加载pandas/matplotlib）
+    inputs/outputs为文件glob（相对工作目录）；code为实现该阶段的源文件与模板（相对项目根目录），修改后阶段重新运行
+    max_age为没有输入文件的阶段（爬取）在上次成功运行后的有效期（秒）
+    """
+
+    def __init__(self, name, target, args=(), deps=(), inputs=(), outputs=(), code=(), max_age=None):
+        self.name = name
+        self.target = target
+        self.args = tuple(args)
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = list(code)
+        self.max_age = max_age
+
+    def fingerprint(self, hasher):
+        code = {path: hasher.digest(os.path.join(ROOT, path)) for path in self.code
+                if os.path.exists(os.path.join(ROOT, path))}
+        digest = hashlib.sha256()
+        digest.update(json.dumps([self.target, self.args, code, hasher.digests(self.inputs)],
+                                 sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+
+def build_stages():
+    """默认的流水线：爬取 -> 各数据集清洗 -> 汇总分析 / 图表渲染 -> 首页预渲染"""
+    processed = [path for name in DATASETS
+                 for path in (storage.processed_csv_path(name), storage.processed_parquet_path(name))]
+    stages = [
+        Stage("crawl", "crawler:run_crawler",
+              outputs=[f"{storage.RAW_DIR}/{name}.{ext}" for name in DATASETS for ext in RAW_FORMATS]
+              + ["data/statistics.json"],
+              code=["crawler.py", "synthetic.py", "html_parsers.py", "http_transport.py", "http_cache.py"],
+              max_age=CRAWL_MAX_AGE),
+    ]
+    for name in DATASETS:
+        stages.append(Stage(f"process_{name}", "processor:process_dataset", args=(name,), deps=["crawl"],
+                            inputs=[f"{storage.RAW_DIR}/{name}.{ext}" for ext in RAW_FORMATS],
+                            outputs=[storage.processed_csv_path(name), storage.processed_parquet_path(name)],
+                            code=["processor.py", "storage.py"]))
+    process_stages = [f"process_{name}" for name in DATASETS]
+    stages.append(Stage("analyze", "processor:run_publish", deps=process_stages, inputs=processed,
+                        outputs=["data/processed/merged_data.csv", "data/processed/analysis_state.json",
+                                 "data/processed/search/*", "data/responses/*",
+                                 "data/analysis.json", "data/samples.json"],
+                        code=["processor.py", "aggregates.py", "search_index.py", "precomputed.py"]))
+    # 图表只依赖清洗后的数据，与汇总分析并行；单个图表是否重绘由visualizer按内容哈希判断
+    stages.append(Stage("visualize", "visualizer:render_all_charts", deps=process_stages, inputs=processed,
+                        outputs=["data/visualizations/*", "static/images/*"],
+                        code=["visualizer.py", "chart_data.py", "dataset_cache.py"]))
+    if os.environ.get("PRERENDER_INDEX", "1") != "0":
+        stages.append(Stage("prerender", "app:prerender_index", deps=["crawl", "analyze"],
+                            inputs=["data/statistics.json", "data/analysis.json"],
+                            outputs=["data/site/index.html"], code=["app.py", "templates/index.html"]))
+    return stages
+
+
+def check_graph(stages):
+    """依赖必须是已声明的阶段且不能成环"""
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        unknown = [dep for dep in stage.deps if dep not in names]
+        if unknown:
+            raise ValueError(f"阶段{stage.name}依赖未知的阶段: {', '.join(unknown)}")
+    done = set()
+    remaining = list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if all(dep in done for dep in stage.deps)]
+        if not ready:
+            raise ValueError(f"阶段之间存在循环依赖: {', '.join(stage.name for stage in remaining)}")
+        done.update(stage.name for stage in ready)
+        remaining = [stage for stage in remaining if stage.name not in done]
+
+
+# ===================== 指纹与状态 =====================
+class FileHasher:
+    """
+    文件内容摘要；按 (大小, mtime) 缓存，未改动的文件不重新读取
+    缓存随状态文件保存，下次运行时大文件也只需stat
+    """
+
+    def __init__(self, cache=None):
+        self.cache = dict(cache or {})
+
+    def digest(self, path):
+        stat = os.stat(path)
+        cached = self.cache.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def digests(self, patterns):
+        """glob匹配到的所有文件 {路径: 摘要}（不存在的文件不出现）"""
+        result = {}
+        for pattern in patterns:
+            for path in sorted(glob.glob(pattern)):
+                if os.path.isfile(path) and not path.endswith(".tmp"):
+                    result[path] = self.digest(path)
+        return result
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"stages": {}, "files": {}}
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def up_to_date(stage, record, fingerprint, outputs):
+    """上次成功运行的指纹一致、输出文件未被改动且未过期"""
+    if not record or record.get("status") != "ok":
+        return False
+    if record.get("fingerprint") != fingerprint or record.get("outputs") != outputs or not outputs:
+        return False
+    return stage.max_age is None or time.time() - record["finished"] <= stage.max_age
+
+
+# ===================== 调度 =====================
+def call_target(target, args):
+    """在子进程中执行阶段函数（返回值不传回调度进程，避免序列化DataFrame）"""
+    module, _, func = target.partition(":")
+    getattr(importlib.import_module(module), func)(*args)
+
+
+def run(stages=None, force=(), workers=None, dry_run=False, state_path=STATE_PATH):
+    """
+    运行流水线，返回 {阶段: ok/skipped/failed/blocked/planned}
+    force为强制重新运行的阶段名（"all"表示全部）；dry_run=True时只打印计划
+    有阶段失败时，成功阶段的状态已保存，抛出RuntimeError（重新运行即从失败处继续）
+    """
+    stages = stages or build_stages()
+    check_graph(stages)
+    force = {stage.name for stage in stages} if "all" in force else set(force)
+    state = load_state(state_path)
+    state.setdefault("stages", {})
+    hasher = FileHasher(state.get("files"))
+    status, running = {}, {}
+    metrics.begin_run()
+    print("🧭 流水线调度: " + ", ".join(stage.name for stage in stages))
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        while len(status) < len(stages):
+            for stage in stages:
+                if stage.name in status or any(s.name == stage.name for s, _, _ in running.values()):
+                    continue
+                deps = [status.get(dep) for dep in stage.deps]
+                if any(s in ("failed", "blocked") for s in deps):
+                    status[stage.name] = "blocked"
+                    print(f"⛔ {stage.name}: 上游阶段失败，未运行")
+                    continue
+                if "planned" in deps:
+                    status[stage.name] = "planned"
+                    print(f"📝 {stage.name}: 上游将重新运行")
+                    continue
+                if not all(s in ("ok", "skipped") for s in deps):
+                    continue
+                fingerprint = stage.fingerprint(hasher)
+                record = state["stages"].get(stage.name)
+                if stage.name not in force and up_to_date(stage, record, fingerprint, hasher.digests(stage.outputs)):
+                    status[stage.name] = "skipped"
+                    print(f"⏭️  {stage.name}: 输入未变化，跳过")
+                    continue
+                if dry_run:
+                    status[stage.name] = "planned"
+                    print(f"📝 {stage.name}: 将重新运行")
+                    continue
+                print(f"🚀 {stage.name}: 开始运行")
+                future = pool.submit(metrics.isolated, call_target, stage.target, stage.args)
+                running[future] = (stage, fingerprint, time.perf_counter())
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, fingerprint, started = running.pop(future)
+                duration = time.perf_counter() - started
+                try:
+                    _, snapshot = future.result()
+                except Exception as e:
+                    status[stage.name] = "failed"
+                    state["stages"][stage.name] = {"status": "failed", "error": str(e), "finished": time.time()}
+                    print(f"❌ {stage.name}: 失败 ({e})")
+                else:
+                    metrics.pipeline.merge(snapshot)
+                    status[stage.name] = "ok"
+                    state["stages"][stage.name] = {"status": "ok", "fingerprint": fingerprint,
+                                                   "outputs": hasher.digests(stage.outputs),
+                                                   "finished": time.time(), "duration": round(duration, 3)}
+                    print(f"✅ {stage.name}: 完成 ({duration:.2f}s)")
+                metrics.pipeline.add_span("dag_stage", duration, task=stage.name)
+                # 每个阶段结束立即落盘，崩溃后可从这里继续
+                state["files"] = hasher.cache
+                save_state(state, state_path)
+    for name, result in status.items():
+        metrics.pipeline.inc("pipeline_stages_total", task=name, result=result)
+    if not dry_run:
+        state["files"] = {path: item for path, item in hasher.cache.items() if os.path.exists(path)}
+        save_state(state, state_path)
+        metrics.save_run("pipeline")
+    counts = {result: list(status.values()).count(result) for result in sorted(set(status.values()))}
+    print(f"⏱️  流水线耗时: {time.perf_counter() - start_time:.2f}秒 "
+          + " ".join(f"{result}={count}" for result, count in counts.items()))
+    failed = [name for name, result in status.items() if result == "failed"]
+    if failed:
+        raise RuntimeError(f"流水线阶段失败: {', '.join(failed)}")
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按依赖关系运行数据流水线，跳过输入未变化的阶段")
+    parser.add_argument("--force", default="", help="强制重新运行的阶段（逗号分隔，all表示全部）")
+    parser.add_argument("--workers", type=int, default=None, help="并行执行的阶段数（默认CPU核数）")
+    parser.add_argument("--dry-run", action="store_true", help="只打印哪些阶段需要运行")
+    args = parser.parse_args()
+    run(force=[name for name in args.force.split(",") if name], workers=args.workers, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
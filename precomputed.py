@@ -0,0 +1,148 @@
+"""
+预计算API响应 - 数据处理完成后把不带参数的接口响应序列化并预压缩（gzip/brotli）
+响应保存在 data/responses/，manifest.json 记录每个接口的内容哈希（用作强ETag）与各编码文件
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import storage
+from dataset_cache import date_formats, frame_to_records
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，缺失时只提供gzip
+    brotli = None
+
+RESPONSE_DIR = "data/responses"
+MANIFEST_NAME = "manifest.json"
+
+# 首页样本只展示这些字段
+SAMPLE_COLUMNS = {
+    'books': ['book_id', 'title', 'author', 'category', 'year'],
+    'courses': ['course_id', 'name', 'teacher', 'department', 'credit'],
+    'news': ['news_id', 'title', 'category', 'date'],
+    'notices': ['notice_id', 'title', 'type', 'date']
+}
+DATASETS = list(SAMPLE_COLUMNS)
+# 各编码对应的文件后缀
+ENCODINGS = {"identity": "", "gzip": ".gz", "br": ".br"}
+
+
+def records_head(name, n, columns=None, processed_dir=storage.PROCESSED_DIR):
+    """处理后数据的前n条记录（与API缓存相同的转换方式，日期格式由整列决定）"""
+    df = storage.load_processed(name, columns=columns, processed_dir=processed_dir)
+    return frame_to_records(df.head(n), date_formats(df)) if df is not None else []
+
+
+def endpoint_payloads(processed_dir=storage.PROCESSED_DIR):
+    """各接口不带参数时的响应内容"""
+    payloads = {
+        "samples": {f"{name}_sample": records_head(name, 10, SAMPLE_COLUMNS[name], processed_dir)
+                    for name in DATASETS}
+    }
+    for name in DATASETS:
+        payloads[name] = records_head(name, 100, processed_dir=processed_dir)
+    return payloads
+
+
+def _write_atomic(path, data):
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(data)
+    os.replace(f"{path}.tmp", path)
+
+
+def build_responses(response_dir=RESPONSE_DIR, processed_dir=storage.PROCESSED_DIR):
+    """
+    序列化并预压缩所有接口响应，最后原子替换manifest
+    文件名包含内容哈希，内容未变的接口不会重写文件；返回manifest
+    """
+    os.makedirs(response_dir, exist_ok=True)
+    manifest = {}
+    for endpoint, payload in endpoint_payloads(processed_dir).items():
+        body = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(body, quality=11)
+        files = {}
+        for encoding, data in variants.items():
+            filename = f"{endpoint}.{digest}.json{ENCODINGS[encoding]}"
+            path = os.path.join(response_dir, filename)
+            if not os.path.exists(path):
+                _write_atomic(path, data)
+            files[encoding] = {"file": filename, "size": len(data)}
+        manifest[endpoint] = {"etag": digest, "files": files}
+    _write_atomic(os.path.join(response_dir, MANIFEST_NAME),
+                  json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+    _remove_stale_files(response_dir, manifest)
+    return manifest
+
+
+def _remove_stale_files(response_dir, manifest):
+    """删除不再被manifest引用的旧版本文件"""
+    current = {entry["file"] for item in manifest.values() for entry in item["files"].values()}
+    current.add(MANIFEST_NAME)
+    for filename in os.listdir(response_dir):
+        if filename not in current and not filename.endswith(".tmp"):
+            os.remove(os.path.join(response_dir, filename))
+
+
+class PrecomputedResponses:
+    """读取预计算响应（线程安全）：manifest变化时重新加载，响应体按需读入内存"""
+
+    def __init__(self, response_dir=RESPONSE_DIR):
+        self.response_dir = response_dir
+        self._signature = None
+        self._manifest = {}
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        path = os.path.join(self.response_dir, MANIFEST_NAME)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._signature, self._manifest, self._bodies = None, {}, {}
+            return
+        signature = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        if signature == self._signature:
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            self._manifest = json.load(f)
+        self._signature = signature
+        self._bodies = {}
+
+    def get(self, endpoint, accepted):
+        """
+        按客户端可接受的编码（accepted为编码名 -> 权重的函数）选择响应
+        返回 (响应体, ETag, 编码)；没有预计算响应时返回None
+        强ETag按编码区分（同一内容的不同压缩结果是不同的表示）
+        """
+        with self._lock:
+            self._refresh()
+            item = self._manifest.get(endpoint)
+            if item is None:
+                return None
+            encoding = "identity"
+            for candidate in ("br", "gzip"):
+                if candidate in item["files"] and accepted(candidate) > 0:
+                    encoding = candidate
+                    break
+            filename = item["files"][encoding]["file"]
+            body = self._bodies.get(filename)
+            if body is None:
+                try:
+                    with open(os.path.join(self.response_dir, filename), 'rb') as f:
+                        body = f.read()
+                except FileNotFoundError:
+                    return None
+                self._bodies[filename] = body
+            etag = item["etag"] if encoding == "identity" else f"{item['etag']}-{encoding}"
+            return body, etag, encoding
+
+
+# 应用进程共享的实例
+precomputed_responses = PrecomputedResponses()
@@ -5,30 +5,58 @@ import pandas as pd
 import json
 from datetime import datetime
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
-def load_data():
-    """加载所有类型的数据"""
+import metrics
+import storage
+from search_index import SEARCH_DIR, build_search_index
+from precomputed import RESPONSE_DIR, build_responses
+import aggregates as analysis_state
+from aggregates import DatasetAggregate, build_analysis
+
+DATA_FILES = {
+    "books": "data/raw/books.csv",
+    "courses": "data/raw/courses.csv", 
+    "news": "data/raw/news.csv",
+    "notices": "data/raw/notices.csv"  # 新增
+}
+
+def latest_raw_file(file_path):
+    """流式爬取写出的JSONL比CSV快照更新时，优先读取JSONL"""
+    jsonl_path = os.path.splitext(file_path)[0] + ".jsonl"
+    if os.path.exists(jsonl_path) and (
+            not os.path.exists(file_path) or os.path.getmtime(jsonl_path) > os.path.getmtime(file_path)):
+        return jsonl_path
+    return file_path
+
+def load_dataset(data_type, file_path, columns=None):
+    """加载单个原始数据文件（columns指定时只读取这些列），失败时返回空DataFrame"""
+    file_path = latest_raw_file(file_path)
+    try:
+        if os.path.exists(file_path):
+            if file_path.endswith(".jsonl"):
+                df = pd.read_json(file_path, lines=True, dtype=False)
+                if columns is not None:
+                    df = df[[c for c in columns if c in df.columns]]
+            else:
+                usecols = (lambda c: c in columns) if columns is not None else None
+                df = pd.read_csv(file_path, encoding='utf-8', usecols=usecols)
+            print(f"✅ 加载 {data_type}: {len(df)}条")
+            return df
+        print(f"⚠️ 文件不存在: {file_path}")
+    except Exception as e:
+        print(f"❌ 加载 {data_type} 失败: {e}")
+    return pd.DataFrame()
+
+def load_data(columns=None):
+    """加载所有类型的数据（columns可按数据类型指定需要的列：{"books": [...]}）"""
     print("📂 加载数据文件...")    
-    data_files = {
-        "books": "data/raw/books.csv",
-        "courses": "data/raw/courses.csv", 
-        "news": "data/raw/news.csv",
-        "notices": "data/raw/notices.csv"  # 新增
-    }    
     loaded_data = {}   
-    for data_type, file_path in data_files.items():
-        try:
-            if os.path.exists(file_path):
-                df = pd.read_csv(file_path, encoding='utf-8')
-                loaded_data[data_type] = df
-                print(f"✅ 加载 {data_type}: {len(df)}条")
-            else:
-                print(f"⚠️ 文件不存在: {file_path}")
-                loaded_data[data_type] = pd.DataFrame()
-        except Exception as e:
-            print(f"❌ 加载 {data_type} 失败: {e}")
-            loaded_data[data_type] = pd.DataFrame()   
+    for data_type, file_path in DATA_FILES.items():
+        wanted = columns.get(data_type) if columns else None
+        loaded_data[data_type] = load_dataset(data_type, file_path, wanted)
     return (
         loaded_data.get("books", pd.DataFrame()),
         loaded_data.get("courses", pd.DataFrame()),
@@ -151,78 +179,102 @@ def clean_notices(df):
             df[col] = default    
     print(f"✅ 公告清洗完成: {len(df)}条")
     return df
-def analyze_all_data(books, courses, news, notices):
-    """分析所有数据"""
+CLEANERS = {
+    "books": clean_books,
+    "courses": clean_courses,
+    "news": clean_news,
+    "notices": clean_notices
+}
+def load_processed_frame(name):
+    """读取已处理数据（带类型的列式存储，回退到CSV），不存在时返回None"""
+    return storage.load_processed(name)
+def apply_delta(name, processed, delta):
+    """
+    把增量应用到已处理数据：删除过期记录，清洗并追加新增/变更记录
+    返回 (更新后的数据, 被移除的记录, 新加入的记录)，后两者用于增量更新统计
+    """
+    key = storage.RECORD_KEYS[name]
+    fresh_records = delta["added"] + delta["changed"]
+    # 新增记录也按主键覆盖（清单丢失时所有记录都会被视为新增）
+    stale = set(delta["deleted"]) | {str(r[key]) for r in fresh_records}
+    removed = processed.head(0)
+    if stale and key in processed.columns:
+        stale_mask = processed[key].astype(str).isin(stale)
+        removed = processed[stale_mask]
+        processed = processed[~stale_mask]
+    if not fresh_records:
+        return processed.reset_index(drop=True), removed, pd.DataFrame()
+    fresh = CLEANERS[name](pd.DataFrame(fresh_records))
+    return pd.concat([processed, fresh], ignore_index=True), removed, fresh
+def load_incremental():
+    """
+    增量加载：已有处理结果时只清洗增量文件中的记录，
+    没有处理结果时回退为完整加载+清洗
+    返回 (清洗后的数据字典, 已应用的增量数据类型列表, 变化记录字典)
+    变化记录为 {数据类型: (被移除的记录, 新加入的记录)}，完整重新清洗的数据类型不在其中
+    """
+    print("📂 增量加载数据...")
+    cleaned, applied, changes = {}, [], {}
+    for name, file_path in DATA_FILES.items():
+        delta = storage.load_delta(name)
+        processed = load_processed_frame(name)
+        if processed is None:
+            cleaned[name] = CLEANERS[name](load_dataset(name, file_path))
+        elif delta is None:
+            print(f"✅ {name}无增量，复用已处理数据: {len(processed)}条")
+            cleaned[name] = processed
+            changes[name] = (processed.head(0), processed.head(0))
+        else:
+            summary = storage.delta_summary(delta)
+            print(f"🔁 应用{name}增量: 新增{summary['added']} 变更{summary['changed']} 删除{summary['deleted']}")
+            cleaned[name], removed, fresh = apply_delta(name, processed, delta)
+            changes[name] = (removed, fresh)
+        if delta is not None:
+            applied.append(name)
+    return cleaned, applied, changes
+def build_aggregates(cleaned):
+    """由完整的清洗后数据计算统计"""
+    result = {}
+    for name, df in cleaned.items():
+        result[name] = DatasetAggregate(name)
+        result[name].add(df)
+    return result
+def update_aggregates(cleaned, changes):
+    """
+    在持久化的统计状态上应用变化记录（O(变化量)）
+    没有状态、数据类型被完整重新清洗或条数对不上时，该数据类型回退为完整统计
+    """
+    state = analysis_state.load_state()
+    result = {}
+    for name, df in cleaned.items():
+        aggregate = state.get(name) if state else None
+        if aggregate is not None and name in changes:
+            removed, fresh = changes[name]
+            aggregate.remove(removed)
+            aggregate.add(fresh)
+            if aggregate.rows == len(df):
+                result[name] = aggregate
+                continue
+            print(f"⚠️ {name}统计状态与数据条数不一致，重新完整统计")
+        result[name] = build_aggregates({name: df})[name]
+    return result
+def verify_analysis(analysis, cleaned):
+    """校验：与完整重新计算的结果比较（忽略时间戳），返回不一致的字段列表"""
+    expected = build_analysis(build_aggregates(cleaned), analysis["timestamp"])
+    mismatches = []
+    for section, value in expected.items():
+        if analysis.get(section) != value:
+            mismatches.append(section)
+    return mismatches
+def analyze_all_data(books, courses, news, notices, aggregates=None):
+    """
+    分析所有数据
+    统计由可累加的DatasetAggregate生成；分块模式下直接传入逐块累计好的aggregates
+    """
     print("📊 开始数据分析...")   
-    analysis = {
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "summary": {
-            "total_records": len(books) + len(courses) + len(news) + len(notices),
-            "books_count": len(books),
-            "courses_count": len(courses), 
-            "news_count": len(news),
-            "notices_count": len(notices)  # 新增
-        },
-        "books_analysis": {},
-        "courses_analysis": {},
-        "news_analysis": {},
-        "notices_analysis": {}  # 新增
-    }    
-    # 1. 图书分析
-    if not books.empty:
-        if 'category' in books.columns:
-            cat_counts = books['category'].value_counts().head(10)
-            analysis["books_analysis"]["top_categories"] = cat_counts.to_dict()
-        
-        if 'year_clean' in books.columns:
-            analysis["books_analysis"]["year_stats"] = {
-                "average_year": int(books['year_clean'].mean()),
-                "latest_year": int(books['year_clean'].max()),
-                "year_range": f"{int(books['year_clean'].min())}-{int(books['year_clean'].max())}"
-            }    
-    # 2. 课程分析
-    if not courses.empty:
-        if 'department' in courses.columns:
-            dept_counts = courses['department'].value_counts().head(10)
-            analysis["courses_analysis"]["top_departments"] = dept_counts.to_dict()
-        
-        if 'credit' in courses.columns:
-            analysis["courses_analysis"]["credit_stats"] = {
-                "average_credit": float(courses['credit'].mean()),
-                "max_credit": int(courses['credit'].max()),
-                "min_credit": int(courses['credit'].min())
-            }    
-    # 3. 新闻分析
-    if not news.empty:
-        if 'category' in news.columns:
-            news_cat_counts = news['category'].value_counts().head(10)
-            analysis["news_analysis"]["categories"] = news_cat_counts.to_dict()
-        
-        if 'date_clean' in news.columns:
-            date_range = {
-                "start": news['date_clean'].min().strftime("%Y-%m-%d"),
-                "end": news['date_clean'].max().strftime("%Y-%m-%d")
-            }
-            analysis["news_analysis"]["date_range"] = date_range   
-    # 4. 公告分析（新增）
-    if not notices.empty:
-        if 'category' in notices.columns:
-            notice_cat_counts = notices['category'].value_counts().head(10)
-            analysis["notices_analysis"]["categories"] = notice_cat_counts.to_dict()
-        
-        if 'date_clean' in notices.columns:
-            notice_dates = {
-                "start": notices['date_clean'].min().strftime("%Y-%m-%d"),
-                "end": notices['date_clean'].max().strftime("%Y-%m-%d"),
-                "total_days": (notices['date_clean'].max() - notices['date_clean'].min()).days
-            }
-            analysis["notices_analysis"]["date_info"] = notice_dates       
-        if 'content_length' in notices.columns:
-            analysis["notices_analysis"]["content_stats"] = {
-                "avg_length": int(notices['content_length'].mean()),
-                "max_length": int(notices['content_length'].max()),
-                "min_length": int(notices['content_length'].min())
-            }   
+    if aggregates is None:
+        aggregates = build_aggregates({"books": books, "courses": courses, "news": news, "notices": notices})
+    analysis = build_analysis(aggregates, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
     print("✅ 数据分析完成")
     return analysis
 def save_processed_data(books_clean, courses_clean, news_clean, notices_clean):
@@ -237,25 +289,22 @@ def save_processed_data(books_clean, courses_clean, news_clean, notices_clean):
         ("notices", notices_clean)  # 新增
     ]   
     for name, df in data_to_save:
-        if not df.empty:
-            file_path = f"data/processed/{name}_clean.csv"
-            df.to_csv(file_path, index=False, encoding='utf-8-sig')
-            print(f"   ✅ {name}: {len(df)}条 -> {file_path}")    
-    # 创建合并数据集（用于分析）
-    merged_data = []    
-    for name, df in data_to_save:
-        if not df.empty:
-            # 添加类型标识
-            df_copy = df.copy()
-            df_copy['data_type'] = name           
-            # 选择通用列
-            common_cols = []
-            for col in ['title', 'name', 'author', 'teacher', 'category', 'date', 'date_clean']:
-                if col in df_copy.columns:
-                    common_cols.append(col)            
-            common_cols.append('data_type')            
-            if common_cols:
-                merged_data.append(df_copy[common_cols])    
+        save_dataset(name, df)
+    save_merged_data(data_to_save)
+def save_dataset(name, df):
+    """保存单个数据集：列式存储（带显式类型）供程序读取，CSV保留作兼容导出"""
+    if not df.empty:
+        parquet_path = storage.save_processed_frame(name, df)
+        print(f"   ✅ {name}: {len(df)}条 -> {parquet_path or storage.processed_csv_path(name)}")
+MERGED_COLUMNS = ['title', 'name', 'author', 'teacher', 'category', 'date', 'date_clean', 'data_type']
+def merged_frame(name, df):
+    """取出合并数据集需要的通用列，并添加类型标识"""
+    df_copy = df.copy()
+    df_copy['data_type'] = name
+    return df_copy[[col for col in MERGED_COLUMNS if col in df_copy.columns]]
+def save_merged_data(data_to_save):
+    """创建合并数据集（用于分析）"""
+    merged_data = [merged_frame(name, df) for name, df in data_to_save if not df.empty]
     if merged_data:
         merged_df = pd.concat(merged_data, ignore_index=True)
         merged_df.to_csv("data/processed/merged_data.csv", index=False, encoding='utf-8-sig')
@@ -317,64 +366,303 @@ def save_analysis_results(analysis, books_clean, courses_clean, news_clean, noti
         print("   ✅ 数据样本 -> data/samples.json")
     except Exception as e:
         print(f"   ⚠️ 保存样本失败: {e}")
-def run_processing():
-    """运行数据处理流程"""
+# 超过该行数的数据集按块清洗
+CHUNK_SIZE = 200000
+def clean_in_chunks(name, df, chunk_size=CHUNK_SIZE):
+    """按块调用清洗函数，最后跨块去重（清洗是逐行的，分块结果与整体清洗一致）"""
+    cleaner = CLEANERS[name]
+    if len(df) <= chunk_size:
+        return cleaner(df)
+    chunks = [cleaner(df.iloc[start:start + chunk_size].copy())
+              for start in range(0, len(df), chunk_size)]
+    return pd.concat(chunks, ignore_index=True).drop_duplicates().reset_index(drop=True)
+def process_dataset(name, chunk_size=CHUNK_SIZE):
+    """
+    单个数据集的加载 -> 清洗 -> 保存（流水线中的一个任务，可在子进程中执行）
+    返回 (数据类型, 清洗后的DataFrame, 各阶段耗时)
+    """
+    timings = {}
+    with metrics.span("load", dataset=name) as s:
+        df = load_dataset(name, DATA_FILES[name])
+        s["rows"] = len(df)
+    timings["load"] = s["duration"]
+    with metrics.span("clean", dataset=name) as s:
+        df_clean = clean_in_chunks(name, df, chunk_size)
+        s["rows"] = len(df_clean)
+    timings["clean"] = s["duration"]
+    with metrics.span("save", dataset=name) as s:
+        save_dataset(name, df_clean)
+        s["rows"] = len(df_clean)
+        s["bytes"] = metrics.file_bytes(storage.processed_parquet_path(name), storage.processed_csv_path(name))
+    timings["save"] = s["duration"]
+    return name, df_clean, timings
+def run_cleaning_pipeline(workers=None, chunk_size=CHUNK_SIZE):
+    """
+    在进程池中并发执行四个数据集的加载、清洗与保存
+    workers=1时在当前进程中依次执行；返回 (清洗后的数据字典, 各数据集各阶段耗时)
+    子进程中记录的指标随结果传回并合并到当前进程
+    """
+    names = list(DATA_FILES)
+    if workers == 1:
+        results = [process_dataset(name, chunk_size) for name in names]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or len(names)) as pool:
+            outputs = list(pool.map(metrics.isolated, [process_dataset] * len(names),
+                                    names, [chunk_size] * len(names)))
+        results = [result for result, _ in outputs]
+        for _, snapshot in outputs:
+            metrics.pipeline.merge(snapshot)
+    cleaned = {name: df for name, df, _ in results}
+    timings = {name: stage_timings for name, _, stage_timings in results}
+    return cleaned, timings
+def iter_raw_chunks(data_type, file_path, chunk_size):
+    """按块读取原始数据文件（CSV按字符串读入，保证各块同一行的摘要一致），文件不存在时不产生数据"""
+    file_path = latest_raw_file(file_path)
+    if not os.path.exists(file_path):
+        print(f"⚠️ 文件不存在: {file_path}")
+        return
+    if file_path.endswith(".jsonl"):
+        reader = pd.read_json(file_path, lines=True, dtype=False, chunksize=chunk_size)
+    else:
+        reader = pd.read_csv(file_path, encoding='utf-8', dtype=str, chunksize=chunk_size)
+    with reader:
+        yield from reader
+def process_dataset_chunked(name, chunk_size, merged_path):
+    """
+    分块处理单个数据集：逐块跨块去重 -> 清洗 -> 写出 -> 累加统计
+    跨块去重只保存每行的64位摘要；返回 (统计, 前100条样本, 各阶段耗时)
+    """
+    aggregate = DatasetAggregate(name)
+    writer = storage.ProcessedWriter(name)
+    seen = set()
+    samples = []
+    sample_rows = 0
+    timings = {"load": 0.0, "clean": 0.0, "save": 0.0}
+    chunks = iter_raw_chunks(name, DATA_FILES[name], chunk_size)
+    try:
+        while True:
+            with metrics.span("load", dataset=name) as s:
+                chunk = next(chunks, None)
+                s["rows"] = 0 if chunk is None else len(chunk)
+            timings["load"] += s["duration"]
+            if chunk is None:
+                break
+            with metrics.span("clean", dataset=name) as s:
+                digests = pd.util.hash_pandas_object(chunk, index=False)
+                keep = ~digests.duplicated() & ~digests.isin(seen)
+                seen.update(digests[keep].tolist())
+                df_clean = CLEANERS[name](chunk[keep.values].reset_index(drop=True))
+                aggregate.add(df_clean)
+                s["rows"] = len(df_clean)
+            timings["clean"] += s["duration"]
+            with metrics.span("save", dataset=name) as s:
+                writer.write(df_clean)
+                if not df_clean.empty:
+                    # 各数据集的通用列不同，分块追加时统一为固定列
+                    merged = merged_frame(name, df_clean).reindex(columns=MERGED_COLUMNS)
+                    merged.to_csv(merged_path, index=False, encoding='utf-8-sig', mode='a',
+                                  header=not os.path.exists(merged_path))
+                s["rows"] = len(df_clean)
+            timings["save"] += s["duration"]
+            if sample_rows < 100:
+                samples.append(df_clean.head(100 - sample_rows))
+                sample_rows += len(samples[-1])
+    except Exception:
+        writer.abort()
+        raise
+    # 分块写出的字节数在文件落盘后一次计入
+    with metrics.span("finalize", dataset=name) as s:
+        writer.close()
+        s["rows"] = writer.count
+        s["bytes"] = metrics.file_bytes(writer.parquet_path, writer.csv_path)
+    timings["save"] += s["duration"]
+    if writer.count:
+        print(f"   ✅ {name}: {writer.count}条 -> {writer.parquet_path or writer.csv_path}")
+    sample = pd.concat(samples, ignore_index=True) if samples else pd.DataFrame()
+    return aggregate, sample, timings
+def run_chunked_pipeline(chunk_size=CHUNK_SIZE):
+    """
+    分块处理模式：各数据集按块流过清洗逻辑，峰值内存只与块大小有关
+    返回 (各数据集前100条样本, 累加统计, 各数据集各阶段耗时)
+    """
+    os.makedirs(storage.PROCESSED_DIR, exist_ok=True)
+    merged_path = os.path.join(storage.PROCESSED_DIR, "merged_data.csv")
+    tmp_path = f"{merged_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    samples, aggregates, timings = {}, {}, {}
+    for name in DATA_FILES:
+        aggregates[name], samples[name], timings[name] = process_dataset_chunked(name, chunk_size, tmp_path)
+    if os.path.exists(tmp_path):
+        os.replace(tmp_path, merged_path)
+        print(f"   ✅ 合并数据 -> {merged_path}")
+    return samples, aggregates, timings
+def print_timings(timings):
+    """打印各阶段耗时"""
+    print("\n⏱️  分阶段耗时:")
+    for stage, value in timings.items():
+        if isinstance(value, dict):
+            detail = "  ".join(f"{k}={v:.3f}s" for k, v in value.items())
+            print(f"   {stage:<14}{detail}")
+        else:
+            print(f"   {stage:<14}{value:.3f}s")
+def publish_results(cleaned, timings, start_time, aggregates=None, incremental=False, changes=None,
+                    applied_deltas=(), chunked=False, verify=False):
+    """
+    清洗之后的步骤：保存合并数据、更新统计状态、重建检索索引与预计算响应、分析并保存结果
+    cleaned为各数据集清洗后的数据（分块模式下为样本）；四类数据都为空时返回None
+    """
+    books_clean = cleaned["books"]
+    courses_clean = cleaned["courses"]
+    news_clean = cleaned["news"]
+    notices_clean = cleaned["notices"]
+    if books_clean.empty and courses_clean.empty and news_clean.empty and notices_clean.empty:
+        print("❌ 没有找到任何数据文件")
+        return None
+    # 3. 保存处理后的数据
+    print("\n" + "-" * 40)
+    print("保存数据")
+    print("-" * 40)
+    data_to_save = [
+        ("books", books_clean),
+        ("courses", courses_clean),
+        ("news", news_clean),
+        ("notices", notices_clean)
+    ]
+    with metrics.span("save_merged") as s:
+        if incremental:
+            save_processed_data(books_clean, courses_clean, news_clean, notices_clean)
+        elif not chunked:
+            save_merged_data(data_to_save)
+        s["bytes"] = metrics.file_bytes("data/processed/merged_data.csv")
+    timings["save_merged"] = s["duration"]
+    # 统计状态与处理结果一起落盘后再删除增量文件（重复应用同一增量结果不变）
+    with metrics.span("aggregate") as s:
+        if incremental:
+            aggregates = update_aggregates(cleaned, changes)
+        elif aggregates is None:
+            aggregates = build_aggregates(cleaned)
+        analysis_state.save_state(aggregates)
+    timings["aggregate"] = s["duration"]
+    # 由刚写出的处理后数据重建全文检索索引（行号与API缓存读取的文件一致）
+    with metrics.span("search_index") as s:
+        search_meta = build_search_index()
+        s["rows"] = search_meta['documents']
+    print(f"   ✅ 检索索引: {search_meta['documents']}篇文档, {search_meta['terms']}个词元 -> {SEARCH_DIR}")
+    timings["search_index"] = s["duration"]
+    # 预先生成API响应（含gzip/brotli压缩版本）
+    with metrics.span("responses") as s:
+        build_responses()
+    print(f"   ✅ 预计算API响应 -> {RESPONSE_DIR}/")
+    timings["responses"] = s["duration"]
+    # 处理结果已落盘，增量文件可以删除；全量处理也包含了所有增量
+    for name in (applied_deltas if incremental else DATA_FILES):
+        storage.consume_delta(name)
+    # 4. 分析数据
+    print("\n" + "-" * 40)
+    print("数据分析")
+    print("-" * 40)       
+    with metrics.span("analyze") as s:
+        analysis = analyze_all_data(books_clean, courses_clean, news_clean, notices_clean, aggregates)
+    timings["analyze"] = s["duration"]
+    if verify and not chunked:
+        mismatches = verify_analysis(analysis, cleaned)
+        if mismatches:
+            print(f"⚠️ 增量统计与完整计算不一致: {', '.join(mismatches)}，改用完整计算结果")
+            aggregates = build_aggregates(cleaned)
+            analysis_state.save_state(aggregates)
+            analysis = analyze_all_data(books_clean, courses_clean, news_clean, notices_clean, aggregates)
+        else:
+            print("✅ 校验通过：增量统计与完整计算一致")
+    # 5. 保存分析结果
+    print("\n" + "-" * 40)
+    print("保存结果")
+    print("-" * 40)      
+    with metrics.span("save_results") as s:
+        save_analysis_results(analysis, books_clean, courses_clean, news_clean, notices_clean)
+        s["bytes"] = metrics.file_bytes("data/analysis.json", "data/samples.json")
+    timings["save_results"] = s["duration"]
+    # 6. 显示统计信息
+    total_time = time.perf_counter() - start_time
+    timings["total"] = total_time
+    metrics.save_run("process")
+    print("\n" + "=" * 60)
+    print("✅ 数据处理完成!")
+    print("=" * 60)        
+    print(f"\n📊 数据统计:")
+    summary = analysis['summary']
+    print(f"   图书数据: {summary['books_count']}条")
+    print(f"   课程数据: {summary['courses_count']}条")
+    print(f"   新闻数据: {summary['news_count']}条")
+    print(f"   公告数据: {summary['notices_count']}条")
+    print(f"   总计: {analysis['summary']['total_records']}条")        
+    print_timings(timings)
+    print(f"\n⏱️  处理耗时: {total_time:.2f}秒")
+    print(f"📁 输出目录: data/processed/")
+    print(f"📄 分析文件: data/analysis.json")
+    print(f"📋 样本文件: data/samples.json")
+    print("=" * 60)     
+    # 分阶段耗时随返回值提供（不写入analysis.json）
+    analysis["timings"] = timings
+    return analysis
+def run_processing(incremental=False, workers=None, chunk_size=CHUNK_SIZE, chunked=False, verify=False):
+    """
+    运行数据处理流程
+    incremental=True时只处理爬虫输出的增量记录，统计也只按变化记录更新；
+    verify=True时把增量统计与完整重新计算的结果比对；
+    chunked=True时按chunk_size分块读取、清洗并累加统计，适合超出内存的原始数据；
+    其余情况下四个数据集在进程池中并发清洗和保存（workers=1时依次执行）
+    """
     print("\n" + "=" * 60)
     print("数据处理流程")
     print("=" * 60)   
-    start_time = time.time() if 'time' in globals() else datetime.now().timestamp()   
+    start_time = time.perf_counter()
+    timings = {}
+    metrics.begin_run()
     try:
-        # 1. 加载数据
-        books, courses, news, notices = load_data()       
-        if books.empty and courses.empty and news.empty and notices.empty:
-            print("❌ 没有找到任何数据文件")
-            return None    
-        # 2. 清洗数据
-        print("\n" + "-" * 40)
-        print("数据清洗")
-        print("-" * 40)        
-        books_clean = clean_books(books)
-        courses_clean = clean_courses(courses)
-        news_clean = clean_news(news)
-        notices_clean = clean_notices(notices)  # 新增        
-        # 3. 保存处理后的数据
-        print("\n" + "-" * 40)
-        print("保存数据")
-        print("-" * 40)      
-        save_processed_data(books_clean, courses_clean, news_clean, notices_clean)      
-        # 4. 分析数据
-        print("\n" + "-" * 40)
-        print("数据分析")
-        print("-" * 40)       
-        analysis = analyze_all_data(books_clean, courses_clean, news_clean, notices_clean)      
-        # 5. 保存分析结果
-        print("\n" + "-" * 40)
-        print("保存结果")
-        print("-" * 40)      
-        save_analysis_results(analysis, books_clean, courses_clean, news_clean, notices_clean)       
-        # 6. 显示统计信息
-        total_time = (datetime.now().timestamp() - start_time) if 'time' in globals() else 0      
-        print("\n" + "=" * 60)
-        print("✅ 数据处理完成!")
-        print("=" * 60)        
-        print(f"\n📊 数据统计:")
-        print(f"   图书数据: {len(books_clean)}条")
-        print(f"   课程数据: {len(courses_clean)}条")
-        print(f"   新闻数据: {len(news_clean)}条")
-        print(f"   公告数据: {len(notices_clean)}条")
-        print(f"   总计: {analysis['summary']['total_records']}条")        
-        print(f"\n⏱️  处理耗时: {total_time:.2f}秒")
-        print(f"📁 输出目录: data/processed/")
-        print(f"📄 分析文件: data/analysis.json")
-        print(f"📋 样本文件: data/samples.json")
-        print("=" * 60)     
-        return analysis       
+        applied_deltas = []
+        aggregates = changes = None
+        if incremental:
+            # 1-2. 增量加载并清洗
+            with metrics.span("incremental") as s:
+                cleaned, applied_deltas, changes = load_incremental()
+            timings["incremental"] = s["duration"]
+        elif chunked:
+            # 1-2. 分块加载、清洗并保存（cleaned中只保留样本）
+            print("\n" + "-" * 40)
+            print(f"分块处理数据（每块{chunk_size}条）")
+            print("-" * 40)
+            cleaned, aggregates, timings = run_chunked_pipeline(chunk_size)
+        else:
+            # 1-2. 加载并清洗数据（各数据集并发，保存也在各自任务中完成）
+            print("\n" + "-" * 40)
+            print("加载与清洗数据")
+            print("-" * 40)
+            cleaned, timings = run_cleaning_pipeline(workers, chunk_size)
+        return publish_results(cleaned, timings, start_time, aggregates, incremental=incremental,
+                               changes=changes, applied_deltas=applied_deltas, chunked=chunked, verify=verify)
     except Exception as e:
         print(f"\n❌ 数据处理失败: {e}")
         import traceback
         traceback.print_exc()
         return None
-# 添加time模块导入（如果需要）
-import time
+def run_publish():
+    """
+    流水线调度（pipeline.py）使用：各数据集已由process_dataset分别清洗并保存，
+    读取处理后数据完成清洗之后的步骤；失败时抛出异常
+    """
+    print("\n" + "=" * 60)
+    print("数据汇总与分析")
+    print("=" * 60)
+    start_time = time.perf_counter()
+    metrics.begin_run()
+    cleaned = {}
+    for name in DATA_FILES:
+        df = load_processed_frame(name)
+        cleaned[name] = pd.DataFrame() if df is None else df
+    analysis = publish_results(cleaned, {}, start_time)
+    if analysis is None:
+        raise RuntimeError("没有找到任何处理后的数据")
+    return analysis
 if __name__ == "__main__":
     run_processing()
\ No newline at end of file
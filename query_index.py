@@ -0,0 +1,194 @@
+"""
+API查询索引 - 数据集加载时建立的内存索引，支持过滤、排序、分页与字段投影
+过滤字段为“取值 -> 行号数组”的倒排索引，日期范围用有序数组二分查找，排序顺序按需计算后缓存
+每次请求只处理命中的行号，不扫描整个DataFrame
+"""
+import base64
+import hashlib
+import json
+import threading
+
+# 支持等值过滤的字段（数据集中存在时才建立索引）
+FILTER_FIELDS = ['category', 'department', 'teacher', 'year_clean']
+# 日期范围过滤使用的字段
+DATE_FIELD = 'date_clean'
+DEFAULT_LIMIT = 100
+# run_query识别的全部参数；请求中不含其中任何一个时按原接口返回（其他参数如缓存破坏参数忽略）
+QUERY_PARAMS = frozenset(['offset', 'cursor', 'limit', 'sort', 'fields', 'date_from', 'date_to', *FILTER_FIELDS])
+MAX_LIMIT = 1000
+
+
+class QueryError(ValueError):
+    """查询参数无效（API返回400）"""
+
+
+def _index_key(value):
+    """索引键统一为字符串，与查询参数直接比较"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+class DatasetIndex:
+    """单个数据集（一个文件版本）的查询索引，建立后只读；排序顺序按需计算并缓存"""
+
+    def __init__(self, frame, version):
+        import numpy as np
+        import pandas as pd
+        self.frame = frame
+        self.version = version
+        self.rows = len(self.frame)
+        self.filters = {}
+        for field in FILTER_FIELDS:
+            if field in self.frame.columns:
+                # indices为行位置（与索引标签无关）
+                groups = self.frame.groupby(field, observed=True, sort=False).indices
+                self.filters[field] = {_index_key(value): rows for value, rows in groups.items()}
+        self.dates = None
+        if DATE_FIELD in self.frame.columns:
+            values = pd.to_datetime(self.frame[DATE_FIELD], errors='coerce').to_numpy()
+            valid = np.flatnonzero(~np.isnat(values))
+            order = valid[np.argsort(values[valid], kind='stable')]
+            self.dates = (values[order], order)
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def match(self, filters, date_from=None, date_to=None):
+        """返回满足所有条件的行号（升序）；没有任何条件时返回None表示全部行"""
+        import numpy as np
+        matched = None
+        for field, values in filters.items():
+            index = self.filters.get(field)
+            if index is None:
+                raise QueryError(f"不支持的过滤字段: {field}")
+            parts = [index[value] for value in values if value in index]
+            if len(parts) == 1:
+                rows = parts[0]
+            else:
+                rows = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+            matched = rows if matched is None else np.intersect1d(matched, rows, assume_unique=True)
+        if date_from is not None or date_to is not None:
+            if self.dates is None:
+                raise QueryError(f"数据集没有日期字段: {DATE_FIELD}")
+            values, order = self.dates
+            start = 0 if date_from is None else np.searchsorted(values, np.datetime64(date_from), 'left')
+            # date_to包含当天
+            end = len(values) if date_to is None else np.searchsorted(
+                values, np.datetime64(date_to) + np.timedelta64(1, 'D'), 'left')
+            rows = np.sort(order[start:end])
+            matched = rows if matched is None else np.intersect1d(matched, rows, assume_unique=True)
+        return matched
+
+    def order(self, sort):
+        """返回 (按sort排序的行号, 每行的名次)；sort前缀-表示降序，空值总排在最后"""
+        import numpy as np
+        with self._lock:
+            cached = self._orders.get(sort)
+        if cached is not None:
+            return cached
+        field = sort.lstrip('-')
+        if field not in self.frame.columns:
+            raise QueryError(f"不支持的排序字段: {field}")
+        column = self.frame[field].reset_index(drop=True)
+        if str(column.dtype) == 'category':
+            column = column.astype(object)
+        order = column.sort_values(ascending=not sort.startswith('-'), kind='stable',
+                                   na_position='last').index.to_numpy()
+        rank = np.empty(self.rows, dtype=np.int64)
+        rank[order] = np.arange(self.rows)
+        with self._lock:
+            self._orders[sort] = (order, rank)
+        return order, rank
+
+    def query(self, filters=None, date_from=None, date_to=None, sort=None, offset=0, limit=DEFAULT_LIMIT):
+        """返回 (当前页的行号, 满足条件的总行数)"""
+        import numpy as np
+        matched = self.match(filters or {}, date_from, date_to)
+        if sort:
+            order, rank = self.order(sort)
+            rows = order if matched is None else matched[np.argsort(rank[matched], kind='stable')]
+        else:
+            rows = np.arange(self.rows) if matched is None else matched
+        return rows[offset:offset + limit], len(rows)
+
+
+def query_digest(filters, date_from, date_to, sort):
+    """决定结果顺序的查询条件（过滤、日期范围、排序）的摘要，与参数顺序、取值顺序无关"""
+    normalized = [sorted((field, sorted(set(values))) for field, values in filters.items()),
+                  date_from, date_to, sort or None]
+    return hashlib.sha1(json.dumps(normalized, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def encode_cursor(offset, version, digest):
+    return base64.urlsafe_b64encode(f"{version}:{digest}:{offset}".encode()).decode()
+
+
+def decode_cursor(cursor, version, digest):
+    """游标只对生成它的数据版本与查询条件有效，数据更新或条件改变后需要从头翻页"""
+    try:
+        cursor_version, cursor_digest, offset = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit(':', 2)
+        offset = int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise QueryError("无效的游标")
+    if cursor_version != version:
+        raise QueryError("数据已更新，游标已失效")
+    if cursor_digest != digest:
+        raise QueryError("游标与当前的过滤/排序条件不匹配")
+    return offset
+
+
+def int_arg(args, name, default, minimum=0, maximum=None):
+    value = args.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise QueryError(f"参数{name}必须是整数")
+    if value < minimum:
+        raise QueryError(f"参数{name}不能小于{minimum}")
+    return min(value, maximum) if maximum is not None else value
+
+
+def date_arg(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    import pandas as pd
+    try:
+        return pd.Timestamp(value).strftime('%Y-%m-%d')
+    except ValueError:
+        raise QueryError(f"参数{name}不是有效日期")
+
+
+def run_query(index, records, args):
+    """
+    按请求参数查询，返回响应字典
+    参数: offset/cursor, limit, sort（字段名，前缀-表示降序）, fields（逗号分隔）,
+         date_from/date_to, 以及FILTER_FIELDS中的字段（逗号分隔表示多个取值）
+    """
+    limit = int_arg(args, 'limit', DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT)
+    filters = {field: [v for v in args.get(field).split(',') if v]
+               for field in FILTER_FIELDS if args.get(field)}
+    date_from, date_to = date_arg(args, 'date_from'), date_arg(args, 'date_to')
+    sort = args.get('sort')
+    digest = query_digest(filters, date_from, date_to, sort)
+    cursor = args.get('cursor')
+    offset = decode_cursor(cursor, index.version, digest) if cursor else int_arg(args, 'offset', 0)
+    fields = [f for f in args.get('fields', '').split(',') if f]
+    unknown = [f for f in fields if f not in index.frame.columns]
+    if unknown:
+        raise QueryError(f"不支持的字段: {', '.join(unknown)}")
+    rows, total = index.query(filters, date_from, date_to, sort, offset, limit)
+    if fields:
+        items = [{f: records[i][f] for f in fields if f in records[i]} for i in rows]
+    else:
+        items = [records[i] for i in rows]
+    next_offset = offset + len(items)
+    return {
+        "items": items,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": encode_cursor(next_offset, index.version, digest) if next_offset < total else None,
+    }
@@ -0,0 +1,214 @@
+"""
+后台定时刷新 - 在新的版本目录中重新爬取并处理数据，完成后原子切换 current 指针，Web进程无需重启
+
+目录结构（项目根目录下）:
+    releases/<时间戳>/data/            一个版本完整的数据目录（原始数据、处理结果、预计算响应等）
+    releases/<时间戳>/static/images/   该版本的图表
+    releases/current -> <时间戳>       当前版本（符号链接，os.replace原子替换）
+    data -> releases/current/data
+    static/images -> ../releases/current/static/images
+
+- 新版本先复制当前版本（保留mtime，流水线按指纹跳过未变化的阶段），在 <时间戳>.building 中运行流水线
+  （强制重新爬取），成功且关键输出齐全后才改名并切换；失败时删除，Web继续使用旧版本
+- Web进程按路径打开文件，各缓存按文件签名（含inode）判断版本，切换后的下一次请求即加载新数据；
+  不会读到写了一半的文件，正在读取旧文件的请求也不受影响（保留最近 KEEP_RELEASES 个版本）
+
+用法:
+    python refresher.py           启动时立即刷新，之后每隔REFRESH_INTERVAL秒刷新一次
+    python refresher.py --once    只刷新一次
+    gunicorn设置 REFRESH_INTERVAL 后由主进程启动刷新进程（见gunicorn.conf.py）
+环境变量:
+    REFRESH_INTERVAL  刷新间隔（秒，默认3600）
+    KEEP_RELEASES     保留的版本数（默认3）
+"""
+import argparse
+import fcntl
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RELEASES_DIR = os.path.join(ROOT, "releases")
+CURRENT = os.path.join(RELEASES_DIR, "current")
+# 随版本切换的目录（相对项目根目录）
+RELEASE_PATHS = ["data", os.path.join("static", "images")]
+# 新版本必须包含这些文件才会被切换为当前版本
+REQUIRED_OUTPUTS = ["data/analysis.json", "data/samples.json", "data/processed/merged_data.csv"]
+BUILDING_SUFFIX = ".building"
+# 已有当前版本时，原位置上出现的真实目录（例如镜像中打包的data/）移到这里，只保留最近一次
+STALE_DIR = os.path.join(RELEASES_DIR, ".stale")
+REFRESH_INTERVAL = float(os.environ.get("REFRESH_INTERVAL", 3600))
+KEEP_RELEASES = int(os.environ.get("KEEP_RELEASES", 3))
+
+
+def release_dir(name):
+    return os.path.join(RELEASES_DIR, name)
+
+
+def current_release():
+    """当前版本名，尚未建立版本目录时返回None"""
+    try:
+        return os.readlink(CURRENT)
+    except OSError:
+        return None
+
+
+def new_release_name():
+    name = time.strftime("%Y%m%d-%H%M%S")
+    suffix = 1
+    while os.path.lexists(release_dir(name)) or os.path.lexists(release_dir(name + BUILDING_SUFFIX)):
+        suffix += 1
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+    return name
+
+
+def point(link, target):
+    """原子地把符号链接link指向target（先建临时链接再替换）"""
+    tmp = f"{link}.tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.symlink(target, tmp)
+    os.replace(tmp, link)
+
+
+def only_empty_dirs(path):
+    return all(not files for _, _, files in os.walk(path))
+
+
+def ensure_layout():
+    """
+    首次使用时把项目中已有的 data、static/images 移入初始版本，
+    并在原位置建立指向 releases/current 的符号链接；已是该布局时不做任何事
+    已有当前版本而原位置又是真实目录时（重建容器后镜像中的data/、导入app时创建的空目录），
+    空目录直接删除，有文件的目录移到 releases/.stale/ 后再建立符号链接
+    """
+    os.makedirs(RELEASES_DIR, exist_ok=True)
+    if current_release() is None:
+        name = new_release_name()
+        for path in RELEASE_PATHS:
+            src, dst = os.path.join(ROOT, path), os.path.join(release_dir(name), path)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if os.path.isdir(src) and not os.path.islink(src):
+                shutil.move(src, dst)
+            else:
+                os.makedirs(dst, exist_ok=True)
+        point(CURRENT, name)
+        print(f"📦 已建立初始版本 {name}")
+    for path in RELEASE_PATHS:
+        link = os.path.join(ROOT, path)
+        if os.path.islink(link):
+            continue
+        if os.path.isdir(link):
+            if only_empty_dirs(link):
+                shutil.rmtree(link)
+            else:
+                stale = os.path.join(STALE_DIR, path)
+                shutil.rmtree(stale, ignore_errors=True)
+                os.makedirs(os.path.dirname(stale), exist_ok=True)
+                shutil.move(link, stale)
+                print(f"⚠️ {path} 不是指向当前版本的符号链接，已移到 {stale}，使用版本 {current_release()}")
+        os.makedirs(os.path.dirname(link), exist_ok=True)
+        point(link, os.path.relpath(os.path.join(CURRENT, path), os.path.dirname(link)))
+
+
+@contextmanager
+def refresh_lock():
+    """同一时间只允许一个刷新进程构建版本"""
+    os.makedirs(RELEASES_DIR, exist_ok=True)
+    with open(os.path.join(RELEASES_DIR, ".lock"), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError("另一个刷新进程正在构建版本")
+        yield
+
+
+def run_pipeline(workdir, force):
+    """在workdir中运行流水线（数据路径相对工作目录）；被终止时连同流水线的子进程一起结束"""
+    command = [sys.executable, os.path.join(ROOT, "pipeline.py")]
+    if force:
+        command += ["--force", ",".join(force)]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in (ROOT, os.environ.get("PYTHONPATH")) if p))
+    process = subprocess.Popen(command, cwd=workdir, env=env, start_new_session=True)
+    try:
+        returncode = process.wait()
+    except BaseException:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+        raise
+    if returncode != 0:
+        raise RuntimeError(f"流水线退出码 {returncode}")
+
+
+def prune(keep=KEEP_RELEASES):
+    """删除最旧的版本，保留最近keep个（当前版本总是保留）"""
+    current = current_release()
+    names = sorted(name for name in os.listdir(RELEASES_DIR)
+                   if not name.startswith(".") and not name.endswith(BUILDING_SUFFIX)
+                   and not os.path.islink(release_dir(name)) and os.path.isdir(release_dir(name)))
+    for name in names[:-keep] if keep > 0 else names:
+        if name != current:
+            shutil.rmtree(release_dir(name), ignore_errors=True)
+            print(f"🗑️  删除旧版本 {name}")
+
+
+def refresh(force=("crawl",)):
+    """构建一个新版本并切换为当前版本，返回新版本名；失败时删除未完成的版本并抛出异常"""
+    with refresh_lock():
+        ensure_layout()
+        # 上次被中断的构建
+        for name in os.listdir(RELEASES_DIR):
+            if name.endswith(BUILDING_SUFFIX):
+                shutil.rmtree(release_dir(name), ignore_errors=True)
+        previous = current_release()
+        name = new_release_name()
+        building = release_dir(name + BUILDING_SUFFIX)
+        start = time.perf_counter()
+        print(f"🔄 构建新版本 {name}（基于 {previous}）")
+        try:
+            shutil.copytree(release_dir(previous), building, symlinks=True,
+                            ignore=shutil.ignore_patterns("*.tmp"))
+            run_pipeline(building, force)
+            missing = [path for path in REQUIRED_OUTPUTS if not os.path.exists(os.path.join(building, path))]
+            if missing:
+                raise RuntimeError(f"新版本缺少输出: {', '.join(missing)}")
+            os.rename(building, release_dir(name))
+        except BaseException:
+            shutil.rmtree(building, ignore_errors=True)
+            raise
+        point(CURRENT, name)
+        print(f"✅ 已切换到版本 {name}（{time.perf_counter() - start:.1f}秒）")
+        prune()
+        return name
+
+
+def run_forever(interval=REFRESH_INTERVAL):
+    """启动时立即刷新，之后按固定间隔刷新；单次失败不影响后续刷新"""
+    while True:
+        started = time.monotonic()
+        try:
+            refresh()
+        except Exception as e:
+            print(f"❌ 刷新失败: {e}")
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="定时重新爬取并处理数据，完成后原子切换数据版本")
+    parser.add_argument("--once", action="store_true", help="只刷新一次")
+    parser.add_argument("--interval", type=float, default=REFRESH_INTERVAL, help="刷新间隔（秒）")
+    args = parser.parse_args()
+    # 被gunicorn等父进程终止时清理未完成的版本
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    if args.once:
+        refresh()
+    else:
+        run_forever(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+全文检索索引 - 中文按相邻字符二元组（bigram）切分，BM25排序
+索引在数据处理完成后由处理后数据建立，保存为 data/processed/search/ 下的numpy数组，
+Flask进程以内存映射方式打开，多个worker共享同一份页缓存
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import storage
+
+SEARCH_DIR = os.path.join(storage.PROCESSED_DIR, "search")
+# 每种数据参与检索的文本字段
+SEARCH_FIELDS = {
+    "books": ["title"],
+    "courses": ["name", "description"],
+    "news": ["title", "summary", "content"],
+    "notices": ["title", "content"],
+}
+SEARCH_TYPES = list(SEARCH_FIELDS)
+# BM25参数
+K1 = 1.2
+B = 0.75
+# 检索结果默认返回的字段
+RESULT_FIELDS = {
+    "books": ["book_id", "title", "author", "category", "year"],
+    "courses": ["course_id", "name", "teacher", "department", "description"],
+    "news": ["news_id", "title", "summary", "category", "date"],
+    "notices": ["notice_id", "title", "category", "date"],
+}
+INDEX_FILES = ["terms", "offsets", "docs", "tfs", "doc_len", "doc_type", "doc_row"]
+
+
+def _word_mask(codes):
+    """可组成词元的字符：中日韩统一表意文字、数字与小写字母"""
+    return (((codes >= 0x4E00) & (codes <= 0x9FFF)) | ((codes >= 0x3400) & (codes <= 0x4DBF))
+            | ((codes >= 0x30) & (codes <= 0x39)) | ((codes >= 0x61) & (codes <= 0x7A)))
+
+
+def tokenize(texts):
+    """
+    把一组文本切分为bigram词元
+    返回 (词元编码, 所属文本序号)；词元编码为两个字符码位拼接成的整数（前一字符左移21位）
+    """
+    import numpy as np
+    # 先逐条转小写再计算长度：个别字符转小写后长度会变（如'İ'），否则之后的词元会归到错误的文本
+    texts = [text.lower() for text in texts]
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    # 用换行分隔各文本，换行不是词字符，不会产生跨文本的二元组
+    codes = np.frombuffer("\n".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    owners = np.repeat(np.arange(len(texts)), lengths + 1)[:len(codes)]
+    word = _word_mask(codes)
+    valid = np.flatnonzero(word[:-1] & word[1:])
+    return (codes[valid] << np.uint64(21)) | codes[valid + 1], owners[valid]
+
+
+def query_terms(text):
+    """查询串的词元（去重）；少于两个连续词字符时为空"""
+    import numpy as np
+    terms, _ = tokenize([text])
+    return np.unique(terms)
+
+
+def _document_texts(batch, fields):
+    """把一批记录的检索字段拼成一段文本（空值与'nan'不参与）"""
+    columns = [batch[field].astype(object).where(batch[field].notna(), "").astype(str).replace("nan", "")
+               for field in fields if field in batch.columns]
+    if not columns:
+        return [""] * len(batch)
+    text = columns[0]
+    for column in columns[1:]:
+        text = text.str.cat(column, sep="\n")
+    return text.tolist()
+
+
+def build_search_index(search_dir=SEARCH_DIR, processed_dir=storage.PROCESSED_DIR, batch_size=100000):
+    """
+    由处理后数据建立倒排索引，写入新的版本目录后再原子切换CURRENT指针
+    返回索引的元信息
+    """
+    import numpy as np
+    term_parts, doc_parts, tf_parts = [], [], []
+    doc_len, doc_type, doc_row = [], [], []
+    rows = {}
+    next_doc = 0
+    for type_id, name in enumerate(SEARCH_TYPES):
+        row = 0
+        for batch in storage.iter_processed_batches(name, SEARCH_FIELDS[name], batch_size, processed_dir):
+            texts = _document_texts(batch, SEARCH_FIELDS[name])
+            terms, owners = tokenize(texts)
+            # 批内按 (词元, 文档) 聚合出词频
+            order = np.lexsort((owners, terms))
+            terms, owners = terms[order], owners[order]
+            starts = np.flatnonzero(np.r_[True, (terms[1:] != terms[:-1]) | (owners[1:] != owners[:-1])])
+            term_parts.append(terms[starts])
+            doc_parts.append(owners[starts] + next_doc)
+            tf_parts.append(np.diff(np.r_[starts, len(terms)]))
+            doc_len.append(np.bincount(owners, minlength=len(texts)))
+            doc_type.append(np.full(len(texts), type_id, dtype=np.int8))
+            doc_row.append(np.arange(row, row + len(texts)))
+            row += len(texts)
+            next_doc += len(texts)
+        rows[name] = row
+    terms = np.concatenate(term_parts) if term_parts else np.empty(0, dtype=np.uint64)
+    docs = np.concatenate(doc_parts) if doc_parts else np.empty(0, dtype=np.int64)
+    tfs = np.concatenate(tf_parts) if tf_parts else np.empty(0, dtype=np.int64)
+    # 各批的文档号递增，按词元稳定排序后每个词元的倒排表仍按文档号有序
+    order = np.argsort(terms, kind="stable")
+    terms, docs, tfs = terms[order], docs[order], tfs[order]
+    vocabulary, first = np.unique(terms, return_index=True)
+    arrays = {
+        "terms": vocabulary,
+        "offsets": np.r_[first, len(terms)].astype(np.int64),
+        "docs": docs.astype(np.int32),
+        "tfs": np.minimum(tfs, np.iinfo(np.uint16).max).astype(np.uint16),
+        "doc_len": (np.concatenate(doc_len) if doc_len else np.empty(0)).astype(np.int32),
+        "doc_type": np.concatenate(doc_type) if doc_type else np.empty(0, dtype=np.int8),
+        "doc_row": (np.concatenate(doc_row) if doc_row else np.empty(0)).astype(np.int32),
+    }
+    meta = {
+        "version": time.strftime("%Y%m%d%H%M%S") + f"{time.time_ns() % 10**9:09d}",
+        "types": SEARCH_TYPES,
+        "rows": rows,
+        "documents": next_doc,
+        "terms": len(vocabulary),
+        "avg_doc_len": float(arrays["doc_len"].mean()) if next_doc else 0.0,
+    }
+    version_dir = os.path.join(search_dir, meta["version"])
+    os.makedirs(version_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(version_dir, f"{name}.npy"), array)
+    with open(os.path.join(version_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    pointer = os.path.join(search_dir, "CURRENT")
+    with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+        f.write(meta["version"])
+    os.replace(f"{pointer}.tmp", pointer)
+    _remove_old_versions(search_dir)
+    return meta
+
+
+def _remove_old_versions(search_dir, keep=2):
+    """
+    只保留最新的keep个版本目录：上一个版本留给刚读到旧指针的请求，
+    更早的版本直接删除（已打开的内存映射在Linux上不受影响）
+    """
+    versions = sorted(entry for entry in os.listdir(search_dir)
+                      if os.path.isdir(os.path.join(search_dir, entry)))
+    for entry in versions[:-keep]:
+        shutil.rmtree(os.path.join(search_dir, entry), ignore_errors=True)
+
+
+class SearchIndex:
+    """以内存映射方式打开的一个索引版本（只读）"""
+
+    def __init__(self, version_dir):
+        import numpy as np
+        with open(os.path.join(version_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        for name in INDEX_FILES:
+            setattr(self, name, np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r"))
+        self.version = self.meta["version"]
+        self.types = self.meta["types"]
+        self.documents = self.meta["documents"]
+        self.avg_doc_len = self.meta["avg_doc_len"] or 1.0
+
+    def search(self, text, types=None, offset=0, limit=20):
+        """
+        BM25检索，返回 ([(数据类型, 行号, 得分)], 命中总数)
+        types为数据类型列表时只返回这些类型的记录
+        """
+        import numpy as np
+        allowed = None
+        if types:
+            allowed = np.zeros(len(self.types), dtype=bool)
+            allowed[[self.types.index(t) for t in types]] = True
+        doc_parts, score_parts = [], []
+        for term in query_terms(text):
+            position = np.searchsorted(self.terms, term)
+            if position >= len(self.terms) or self.terms[position] != term:
+                continue
+            start, end = self.offsets[position], self.offsets[position + 1]
+            docs = np.asarray(self.docs[start:end])
+            tfs = np.asarray(self.tfs[start:end], dtype=np.float64)
+            idf = np.log(1 + (self.documents - len(docs) + 0.5) / (len(docs) + 0.5))
+            if allowed is not None:
+                keep = allowed[self.doc_type[docs]]
+                docs, tfs = docs[keep], tfs[keep]
+            norm = K1 * (1 - B + B * self.doc_len[docs] / self.avg_doc_len)
+            doc_parts.append(docs)
+            score_parts.append(idf * tfs * (K1 + 1) / (tfs + norm))
+        if not doc_parts:
+            return [], 0
+        # 按文档号直接累加得分（不排序），BM25得分恒为正，得分>0即命中
+        dense = np.bincount(np.concatenate(doc_parts), weights=np.concatenate(score_parts),
+                            minlength=self.documents)
+        docs = np.flatnonzero(dense)
+        scores = dense[docs]
+        total = len(docs)
+        wanted = min(offset + limit, total)
+        if wanted <= 0 or offset >= total:
+            return [], total
+        top = np.argpartition(-scores, wanted - 1)[:wanted] if wanted < total else np.arange(total)
+        # 得分相同时按文档号排序，翻页结果稳定
+        top = top[np.lexsort((docs[top], -scores[top]))][offset:wanted]
+        return [(self.types[self.doc_type[doc]], int(self.doc_row[doc]), float(score))
+                for doc, score in zip(docs[top], scores[top])], total
+
+
+_current = {"pointer": None, "index": None}
+_current_lock = threading.Lock()
+
+
+def current_index(search_dir=SEARCH_DIR):
+    """返回当前版本的索引；CURRENT指针变化时重新打开，索引不存在时返回None"""
+    pointer_path = os.path.join(search_dir, "CURRENT")
+    try:
+        with open(pointer_path, "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    # 数据目录经符号链接切换到新版本（refresher.py）时，按实际路径重新打开
+    pointer = (os.path.realpath(search_dir), version)
+    with _current_lock:
+        if _current["pointer"] != pointer:
+            _current["index"] = SearchIndex(os.path.join(search_dir, version))
+            _current["pointer"] = pointer
+        return _current["index"]
@@ -0,0 +1,468 @@
+"""
+原始数据存储 - 记录主键、内容哈希清单、增量（delta）文件与流式写入
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+RAW_DIR = "data/raw"
+MANIFEST_PATH = "data/raw/manifest.json"
+
+# 每种数据的记录主键
+RECORD_KEYS = {
+    "books": "book_id",
+    "news": "news_id",
+    "courses": "course_id",
+    "notices": "notice_id",
+}
+
+# 每种原始数据的字段全集（流式写入Parquet时用作固定schema，缺失字段为null）
+RAW_FIELDS = {
+    "books": ["book_id", "title", "author", "publisher", "category", "year", "isbn",
+              "description", "source", "type", "crawl_time"],
+    "news": ["news_id", "title", "summary", "content", "url", "date", "category",
+             "source", "type", "crawl_time"],
+    "courses": ["course_id", "name", "code", "teacher", "department", "credit", "hours",
+                "semester", "type", "description", "source", "crawl_time"],
+    "notices": ["notice_id", "title", "content", "url", "date", "type", "category",
+                "source", "crawl_time"],
+}
+RAW_INT_FIELDS = {"credit", "hours"}
+
+# 计算内容哈希时忽略的易变字段（每次爬取都会变化，不代表内容变化）
+VOLATILE_FIELDS = {"crawl_time"}
+
+
+def record_hash(record):
+    """计算单条记录的内容哈希（忽略易变字段）"""
+    content = {k: v for k, v in record.items() if k not in VOLATILE_FIELDS}
+    payload = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """加载哈希清单：{数据类型: {主键: 内容哈希}}"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """原子写入哈希清单"""
+    _write_json_atomic(path, manifest)
+
+
+class DeltaTracker:
+    """逐条观察本次快照的记录，与上次清单对比得出增量（只保留变化的记录）"""
+
+    def __init__(self, name, previous_hashes):
+        self.name = name
+        self.key = RECORD_KEYS[name]
+        self.previous_hashes = previous_hashes
+        self.hashes = {}
+        self.added = []
+        self.changed = []
+
+    def observe(self, record):
+        record_id = str(record.get(self.key))
+        digest = record_hash(record)
+        self.hashes[record_id] = digest
+        old_digest = self.previous_hashes.get(record_id)
+        if old_digest is None:
+            self.added.append(record)
+        elif old_digest != digest:
+            self.changed.append(record)
+
+    def delta(self):
+        deleted = [record_id for record_id in self.previous_hashes if record_id not in self.hashes]
+        return {
+            "dataset": self.name,
+            "key": self.key,
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "added": self.added,
+            "changed": self.changed,
+            "deleted": deleted,
+        }
+
+
+def compute_delta(name, records, previous_hashes):
+    """
+    对比本次快照与上次清单，返回 (delta, 新哈希表)
+    delta 包含新增、变更的完整记录以及被删除记录的主键
+    """
+    tracker = DeltaTracker(name, previous_hashes)
+    for record in records:
+        tracker.observe(record)
+    return tracker.delta(), tracker.hashes
+
+
+def delta_path(name, raw_dir=RAW_DIR):
+    return os.path.join(raw_dir, f"{name}.delta.json")
+
+
+def load_delta(name, raw_dir=RAW_DIR):
+    """读取尚未被处理的增量文件，不存在时返回None"""
+    try:
+        with open(delta_path(name, raw_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def merge_deltas(older, newer):
+    """合并两次未被消费的增量，结果等价于依次应用两者"""
+    key = older["key"]
+    state = {}  # 主键 -> ("added"/"changed", 记录) 或 ("deleted", None)
+    for record in older["added"]:
+        state[str(record[key])] = ("added", record)
+    for record in older["changed"]:
+        state[str(record[key])] = ("changed", record)
+    for record_id in older["deleted"]:
+        state[record_id] = ("deleted", None)
+    for record in newer["added"]:
+        record_id = str(record[key])
+        # 先删后增，对下游而言是一次变更
+        kind = "changed" if state.get(record_id, ("",))[0] == "deleted" else "added"
+        state[record_id] = (kind, record)
+    for record in newer["changed"]:
+        record_id = str(record[key])
+        kind = "added" if state.get(record_id, ("",))[0] == "added" else "changed"
+        state[record_id] = (kind, record)
+    for record_id in newer["deleted"]:
+        if state.get(record_id, ("",))[0] == "added":
+            # 新增后又被删除，下游从未见过，直接抵消
+            del state[record_id]
+        else:
+            state[record_id] = ("deleted", None)
+    merged = dict(newer, added=[], changed=[], deleted=[])
+    for record_id, (kind, record) in state.items():
+        if kind == "deleted":
+            merged["deleted"].append(record_id)
+        else:
+            merged[kind].append(record)
+    return merged
+
+
+def write_delta(name, delta, raw_dir=RAW_DIR):
+    """写入增量文件；若上次的增量尚未被处理，则与之合并"""
+    pending = load_delta(name, raw_dir)
+    if pending is not None:
+        delta = merge_deltas(pending, delta)
+    path = delta_path(name, raw_dir)
+    _write_json_atomic(path, delta)
+    return path
+
+
+def consume_delta(name, raw_dir=RAW_DIR):
+    """下游处理完成后删除增量文件"""
+    try:
+        os.remove(delta_path(name, raw_dir))
+    except FileNotFoundError:
+        pass
+
+
+def delta_summary(delta):
+    return {
+        "added": len(delta["added"]),
+        "changed": len(delta["changed"]),
+        "deleted": len(delta["deleted"]),
+    }
+
+
+def _write_json_atomic(path, data):
+    """先写临时文件再替换，避免读者看到写了一半的文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class JsonlSink:
+    """逐条追加写入JSONL；先写临时文件，close时原子替换，读者不会看到写了一半的快照"""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str))
+        self._file.write("\n")
+
+    def close(self):
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """放弃本次写入，保留原有快照"""
+        self._file.close()
+        os.remove(self.tmp_path)
+
+
+class ParquetSink:
+    """按行组写入Parquet：缓冲row_group_size条后写出一个行组，内存占用恒定"""
+
+    def __init__(self, path, name, row_group_size=10000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([
+            (field, pa.int64() if field in RAW_INT_FIELDS else pa.string())
+            for field in RAW_FIELDS[name]
+        ])
+        self._writer = pq.ParquetWriter(self.tmp_path, self.schema)
+        self._buffer = []
+
+    def write(self, record):
+        row = {}
+        for field in self.schema.names:
+            value = record.get(field)
+            if value is not None and field not in RAW_INT_FIELDS:
+                value = str(value)
+            row[field] = value
+        self._buffer.append(row)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            table = self._pa.Table.from_pylist(self._buffer, schema=self.schema)
+            self._writer.write_table(table, row_group_size=self.row_group_size)
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._writer.close()
+        os.remove(self.tmp_path)
+
+
+class RawSink:
+    """
+    单个数据集的流式写入入口：记录到达即写入 data/raw/<name>.jsonl（可选同时写Parquet），
+    同时在线统计条数，增量模式下在线比对哈希清单
+    """
+
+    def __init__(self, name, raw_dir=RAW_DIR, parquet=False, previous_hashes=None):
+        self.name = name
+        self.count = 0
+        self._sinks = [JsonlSink(os.path.join(raw_dir, f"{name}.jsonl"))]
+        if parquet:
+            self._sinks.append(ParquetSink(os.path.join(raw_dir, f"{name}.parquet"), name))
+        self.tracker = DeltaTracker(name, previous_hashes) if previous_hashes is not None else None
+
+    def write(self, record):
+        for sink in self._sinks:
+            sink.write(record)
+        if self.tracker:
+            self.tracker.observe(record)
+        self.count += 1
+
+    def write_all(self, records):
+        """消费一个记录迭代器，返回写入条数"""
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def close(self):
+        for sink in self._sinks:
+            sink.close()
+
+    def abort(self):
+        for sink in self._sinks:
+            sink.abort()
+
+
+# ===================== 处理后数据（列式存储） =====================
+PROCESSED_DIR = "data/processed"
+
+# 处理后数据的显式类型；不在表中的列保持pandas默认类型
+PROCESSED_SCHEMAS = {
+    "books": {"category": "category", "publisher": "category", "source": "category",
+              "type": "category", "year_clean": "int16"},
+    "courses": {"department": "category", "semester": "category", "source": "category",
+                "type": "category", "credit": "int16", "hours": "int16"},
+    "news": {"category": "category", "source": "category", "type": "category",
+             "date_clean": "datetime64[ns]"},
+    "notices": {"category": "category", "source": "category", "type": "category",
+                "date_clean": "datetime64[ns]"},
+}
+
+
+def processed_csv_path(name, processed_dir=PROCESSED_DIR):
+    return os.path.join(processed_dir, f"{name}_clean.csv")
+
+
+def processed_parquet_path(name, processed_dir=PROCESSED_DIR):
+    return os.path.join(processed_dir, f"{name}_clean.parquet")
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def apply_schema(name, df):
+    """按PROCESSED_SCHEMAS转换列类型（只处理存在的列）"""
+    import pandas as pd
+    for column, dtype in PROCESSED_SCHEMAS.get(name, {}).items():
+        if column not in df.columns or str(df[column].dtype) == dtype:
+            continue
+        if dtype.startswith("datetime"):
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+        elif dtype.startswith("int"):
+            df[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def save_processed_frame(name, df, processed_dir=PROCESSED_DIR):
+    """
+    保存处理后数据：Parquet（带类型，供程序读取）+ CSV（兼容导出）
+    均先写临时文件再原子替换；返回Parquet路径（未安装pyarrow时为None）
+    """
+    os.makedirs(processed_dir, exist_ok=True)
+    csv_path = processed_csv_path(name, processed_dir)
+    df.to_csv(f"{csv_path}.tmp", index=False, encoding='utf-8-sig')
+    os.replace(f"{csv_path}.tmp", csv_path)
+    if not parquet_available():
+        return None
+    parquet_path = processed_parquet_path(name, processed_dir)
+    typed = apply_schema(name, df.copy())
+    typed.to_parquet(f"{parquet_path}.tmp", index=False, engine='pyarrow')
+    os.replace(f"{parquet_path}.tmp", parquet_path)
+    return parquet_path
+
+
+class ProcessedWriter:
+    """
+    分块写出处理后数据（分块处理模式使用）：CSV逐块追加，Parquet逐块写为行组
+    列与类型以第一个数据块为准；close时原子替换，abort时丢弃临时文件
+    """
+
+    def __init__(self, name, processed_dir=PROCESSED_DIR):
+        os.makedirs(processed_dir, exist_ok=True)
+        self.name = name
+        self.count = 0
+        self.csv_path = processed_csv_path(name, processed_dir)
+        self.parquet_path = processed_parquet_path(name, processed_dir) if parquet_available() else None
+        self._columns = None
+        self._schema = None
+        self._writer = None
+
+    def write(self, df):
+        if df.empty:
+            return
+        if self._columns is None:
+            self._columns = list(df.columns)
+        df = df.reindex(columns=self._columns)
+        df.to_csv(f"{self.csv_path}.tmp", index=False, encoding='utf-8-sig',
+                  mode='w' if self.count == 0 else 'a', header=self.count == 0)
+        if self.parquet_path:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(apply_schema(self.name, df.copy()), preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema.remove_metadata()
+                self._writer = pq.ParquetWriter(f"{self.parquet_path}.tmp", self._schema)
+            self._writer.write_table(table.cast(self._schema))
+        self.count += len(df)
+
+    def close(self):
+        """写完所有数据块后替换正式文件；没有任何数据时不改动已有文件"""
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(f"{self.parquet_path}.tmp", self.parquet_path)
+        if self.count:
+            os.replace(f"{self.csv_path}.tmp", self.csv_path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        for path in (f"{self.csv_path}.tmp", f"{self.parquet_path}.tmp" if self.parquet_path else None):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def processed_source_path(name, processed_dir=PROCESSED_DIR):
+    """load_processed实际会读取的文件：优先Parquet，CSV更新时用CSV；都不存在时返回None"""
+    parquet_path = processed_parquet_path(name, processed_dir)
+    csv_path = processed_csv_path(name, processed_dir)
+    if os.path.exists(parquet_path) and parquet_available() and (
+            not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        return parquet_path
+    if os.path.exists(csv_path):
+        return csv_path
+    return None
+
+
+def load_processed(name, columns=None, nrows=None, processed_dir=PROCESSED_DIR):
+    """
+    读取处理后数据，只读取需要的列（columns）和行（nrows）
+    优先读取Parquet；没有Parquet或CSV更新时回退到CSV并补齐类型
+    文件不存在时返回None
+    """
+    import pandas as pd
+    path = processed_source_path(name, processed_dir)
+    if path is None:
+        return None
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        if columns is not None:
+            available = set(parquet_file.schema_arrow.names)
+            columns = [c for c in columns if c in available]
+        if nrows is None:
+            return pd.read_parquet(path, columns=columns, engine='pyarrow')
+        batches = []
+        remaining = nrows
+        for batch in parquet_file.iter_batches(batch_size=min(nrows, 65536), columns=columns):
+            batches.append(batch.slice(0, remaining))
+            remaining -= min(remaining, batch.num_rows)
+            if remaining <= 0:
+                break
+        if not batches:
+            return pd.read_parquet(path, columns=columns, engine='pyarrow').head(0)
+        import pyarrow as pa
+        return pa.Table.from_batches(batches).to_pandas()
+    usecols = (lambda c: c in columns) if columns is not None else None
+    df = pd.read_csv(path, encoding='utf-8-sig', usecols=usecols, nrows=nrows)
+    return apply_schema(name, df)
+
+
+def iter_processed_batches(name, columns, batch_size=100000, processed_dir=PROCESSED_DIR):
+    """按批读取处理后数据的指定列（不存在的列跳过），用于建立检索索引等全量扫描"""
+    import pandas as pd
+    path = processed_source_path(name, processed_dir)
+    if path is None:
+        return
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        available = set(parquet_file.schema_arrow.names)
+        for batch in parquet_file.iter_batches(batch_size=batch_size,
+                                               columns=[c for c in columns if c in available]):
+            yield batch.to_pandas()
+        return
+    with pd.read_csv(path, encoding='utf-8-sig', usecols=lambda c: c in columns,
+                     dtype=str, chunksize=batch_size) as reader:
+        yield from reader
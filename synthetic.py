@@ -0,0 +1,382 @@
+"""
+合成数据生成器 - 用NumPy向量化采样按列批量生成模拟记录，直接写入原始数据目录（data/raw/<name>.csv）
+字段与取值范围同爬虫的 generate_pku_* ，用于对 processor.py 与 app.py 做容量测试
+相同的种子、批大小与基准日期生成的数据完全相同
+
+用法:
+    python synthetic.py --rows 2500000 [--seed 42] [--datasets books,news,courses,notices]
+                        [--batch-size 1000000] [--parquet] [--today 2025-01-01]
+注意: 生成的是完整快照，不更新增量哈希清单，之后应全量处理（不要用incremental模式）
+"""
+import argparse
+import itertools
+import json
+import os
+import string
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import storage
+
+# ===================== 取值表（爬虫的逐条生成函数共用） =====================
+BOOK_TITLES = [
+    "北京大学校史", "燕园建筑", "北大风物", "京师大学堂纪事", "红楼忆往",
+    "蔡元培与北大", "胡适北大文集", "李大钊研究文集", "五四运动与北大",
+    "未名湖畔", "博雅塔影", "北大精神", "学术的北大", "北大人物志",
+    "北大讲座精选", "燕园史话", "北大学人", "北大传统", "北大记忆",
+    "燕园景观", "北大历史", "北大文化", "北大教育", "北大科研",
+    "北大与中国现代教育", "北大人物传", "燕园建筑艺术", "北大校史资料",
+    "北大名人录", "北大往事"
+]
+BOOK_AUTHORS = [
+    "北京大学校史馆", "陈平原", "钱理群", "温儒敏", "张颐武",
+    "王余光", "戴锦华", "韩毓海", "孔庆东", "李零",
+    "欧阳哲生", "夏晓虹", "陈来", "阎步克", "邓小南",
+    "北京大学档案馆", "北大校史研究室", "燕园文化遗产保护协会"
+]
+BOOK_PUBLISHERS = [
+    "北京大学出版社", "北京大学出版社", "北京大学出版社",  # 北大出版社占多数
+    "人民出版社", "中华书局", "商务印书馆", "清华大学出版社",
+    "高等教育出版社", "中国社会科学出版社"
+]
+BOOK_CATEGORIES = [
+    "校史研究", "人物传记", "建筑艺术", "文化教育", "学术研究",
+    "历史资料", "校园文化", "教育研究", "社会科学"
+]
+
+NEWS_TEMPLATES = [
+    "北京大学召开{subject}会议",
+    "北大{subject}研究成果在{journal}发表",
+    "{department}举办{activity}活动",
+    "北京大学{project}项目取得新进展",
+    "{expert}教授做客北大讲座",
+    "北大与{institution}签署合作协议",
+    "北京大学{achievement}获奖",
+    "北大{activity}活动圆满举行",
+    "北京大学{field}研究取得突破",
+    "{leader}视察北京大学"
+]
+# 新闻标题模板中各占位符的取值（project按序号循环，由调用方生成）
+NEWS_SLOTS = {
+    "subject": ["学术", "科研", "教学", "国际交流", "人才培养", "学科建设"],
+    "department": ["计算机学院", "数学科学学院", "物理学院", "化学学院", "生命科学学院",
+                   "经济学院", "法学院", "光华管理学院", "新闻与传播学院", "国际关系学院"],
+    "journal": ["《自然》", "《科学》", "《细胞》", "《美国科学院院刊》", "《中国社会科学》"],
+    "activity": ["学术讲座", "国际会议", "文化节", "创新大赛", "学术论坛"],
+    "expert": [name + "教授" for name in ["张", "李", "王", "刘", "陈"]],
+    "institution": ["哈佛大学", "牛津大学", "清华大学", "中国科学院"],
+    "achievement": ["自然科学奖", "科技进步奖", "教学成果奖"],
+    "field": ["人工智能", "量子计算", "生物医学", "环境保护"],
+    "leader": [name + "领导" for name in ["教育部", "科技部", "北京市"]],
+}
+NEWS_PROJECTS = 10
+# 标题关键词 -> 新闻分类（按顺序匹配第一个）
+NEWS_CATEGORY_KEYWORDS = {
+    "学术": "学术动态",
+    "科研": "科研成果",
+    "会议": "会议活动",
+    "讲座": "学术讲座",
+    "获奖": "荣誉表彰",
+    "合作": "国际交流",
+    "视察": "领导关怀"
+}
+
+COURSE_NAMES = [
+    "计算概论", "数据结构与算法", "人工智能导论", "机器学习", "深度学习",
+    "高等数学", "线性代数", "概率统计", "大学物理", "普通化学",
+    "中国通史", "世界文明史", "哲学导论", "经济学原理", "法学原理",
+    "文学概论", "艺术导论", "社会学概论", "心理学导论", "政治学原理",
+    "计算机组成", "操作系统", "计算机网络", "数据库系统", "软件工程",
+    "数字电路", "信号处理", "自动控制", "通信原理", "电子技术"
+]
+COURSE_DEPARTMENTS = [
+    "计算机科学与技术学院", "数学科学学院", "物理学院", "化学与分子工程学院",
+    "生命科学学院", "城市与环境学院", "心理与认知科学学院", "中国语言文学系",
+    "历史学系", "哲学系", "国际关系学院", "法学院", "经济学院",
+    "光华管理学院", "新闻与传播学院", "艺术学院", "社会学系"
+]
+COURSE_TEACHERS = [
+    "张明", "李华", "王强", "刘洋", "陈静", "赵宇", "周涛", "吴帆",
+    "郑洁", "孙磊", "钱勇", "冯军", "韩梅", "杨光", "朱红", "秦峰"
+]
+COURSE_CREDITS = [1, 2, 3, 4]
+COURSE_HOURS = [16, 32, 48, 64]
+COURSE_SEMESTERS = ["2024春季", "2024秋季", "2025春季"]
+
+NOTICE_TYPES = [
+    "学术讲座通知", "会议通知", "放假通知", "选课通知", "考试安排",
+    "成绩查询通知", "奖学金申请", "项目申报", "招聘信息", "活动通知",
+    "系统维护通知", "校园施工通知", "安全提示", "防疫通知", "缴费通知"
+]
+
+DATASETS = ["books", "news", "courses", "notices"]
+DEFAULT_BATCH_SIZE = 1000000
+
+
+def news_category(title):
+    """根据标题判断新闻分类"""
+    for key, category in NEWS_CATEGORY_KEYWORDS.items():
+        if key in title:
+            return category
+    return "校园动态"
+
+
+def news_title_table():
+    """
+    展开所有新闻标题（模板 x 各占位符取值的笛卡尔积，共几百条）
+    返回 (标题列表, 各模板在列表中的起始位置, 各模板的标题数)
+    """
+    slots = dict(NEWS_SLOTS, project=[f"重大科研项目{k + 1}" for k in range(NEWS_PROJECTS)])
+    titles, offsets, sizes = [], [], []
+    for template in NEWS_TEMPLATES:
+        fields = [field for _, field, _, _ in string.Formatter().parse(template) if field]
+        offsets.append(len(titles))
+        for values in itertools.product(*(slots[field] for field in fields)):
+            titles.append(template.format(**dict(zip(fields, values))))
+        sizes.append(len(titles) - offsets[-1])
+    return titles, np.array(offsets), np.array(sizes)
+
+
+# ===================== 列构造（pyarrow） =====================
+def _pick(indices, vocabulary):
+    """按下标从取值表取值：字典编码数组，不逐行生成字符串"""
+    import pyarrow as pa
+    return pa.DictionaryArray.from_arrays(pa.array(indices.astype(np.int32)), pa.array(vocabulary))
+
+
+def _choice(rng, vocabulary, n):
+    return _pick(rng.integers(0, len(vocabulary), n), vocabulary)
+
+
+def _constant(value, n):
+    return _pick(np.zeros(n, dtype=np.int32), [value])
+
+
+def _numbered(numbers, width=0):
+    """整数数组转为字符串（width>0时左侧补零）"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    text = pc.cast(pa.array(numbers), pa.string())
+    return pc.utf8_lpad(text, width, "0") if width else text
+
+
+def _concat(*parts):
+    """逐行拼接字符串数组与常量"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    parts = [part.cast(pa.string()) if isinstance(part, pa.DictionaryArray) else part for part in parts]
+    return pc.binary_join_element_wise(*parts, "")
+
+
+def _dates(today, offsets):
+    """相对基准日期的天数偏移 -> 日期字符串（取值表只有几十~几百个日期）"""
+    low = int(offsets.min())
+    days = [(today + timedelta(days=int(d))).strftime("%Y-%m-%d") for d in range(low, int(offsets.max()) + 1)]
+    return _pick(offsets - low, days)
+
+
+# ===================== 各数据集的批生成 =====================
+def books_batch(rng, start, n, context):
+    import pyarrow as pa
+    number = np.arange(start + 1, start + n + 1)
+    return pa.table({
+        "book_id": _concat("gen_book_", _numbered(number, 4)),
+        "title": _concat(_choice(rng, BOOK_TITLES, n), " (", _numbered(number), ")"),
+        "author": _choice(rng, BOOK_AUTHORS, n),
+        "publisher": _choice(rng, BOOK_PUBLISHERS, n),
+        "category": _choice(rng, BOOK_CATEGORIES, n),
+        "year": _pick((number - 1) % 6, [str(2018 + k) for k in range(6)]),
+        "isbn": _concat("978-7-301-", _numbered(number + 24999, 5)),
+        "description": _constant("北京大学相关研究著作", n),
+        "source": _constant("北京大学文献资料", n),
+        "type": _constant("book", n),
+        "crawl_time": _constant(context["crawl_time"], n),
+    })
+
+
+def news_batch(rng, start, n, context):
+    import pyarrow as pa
+    titles, offsets, sizes = context["news_titles"]
+    template = rng.integers(0, len(NEWS_TEMPLATES), n)
+    # 先均匀选模板，再在模板内均匀选取值组合，等价于各占位符独立均匀取值
+    picks = offsets[template] + (rng.random(n) * sizes[template]).astype(np.int64)
+    number = np.arange(start + 1, start + n + 1)
+    return pa.table({
+        "news_id": _concat("gen_news_", _numbered(number, 4)),
+        "title": _pick(picks, titles),
+        "summary": _pick(picks, [f"北京大学相关动态：{title}。这是基于真实校园活动的模拟新闻内容。" for title in titles]),
+        "content": _constant("详细内容：北京大学在相关领域取得了新的进展和成果。这条新闻反映了学校的学术活动和校园动态。", n),
+        "date": _dates(context["today"], -rng.integers(1, 366, n)),
+        "category": _pick(picks, [news_category(title) for title in titles]),
+        "source": _constant("北京大学新闻网（模拟）", n),
+        "type": _constant("news", n),
+        "crawl_time": _constant(context["crawl_time"], n),
+    })
+
+
+def courses_batch(rng, start, n, context):
+    import pyarrow as pa
+    index = np.arange(start, start + n)
+    # 每第10门课程（序号>0）名称加“高级”前缀：取值表后半部分
+    advanced = (index > 0) & (index % 10 == 0)
+    names = COURSE_NAMES + [f"高级{name}" for name in COURSE_NAMES]
+    picks = rng.integers(0, len(COURSE_NAMES), n) + advanced * len(COURSE_NAMES)
+    return pa.table({
+        "course_id": _concat("course_", _numbered(index + 1, 4)),
+        "name": _pick(picks, names),
+        "code": _concat("PKU", _numbered(index + 1000, 4)),
+        "teacher": _choice(rng, [name + "教授" for name in COURSE_TEACHERS], n),
+        "department": _choice(rng, COURSE_DEPARTMENTS, n),
+        "credit": pa.array(np.array(COURSE_CREDITS)[rng.integers(0, len(COURSE_CREDITS), n)]),
+        "hours": pa.array(np.array(COURSE_HOURS)[rng.integers(0, len(COURSE_HOURS), n)]),
+        "semester": _choice(rng, COURSE_SEMESTERS, n),
+        "type": _constant("course", n),
+        "description": _pick(picks, [f"北京大学{name}课程，旨在培养学生相关能力。" for name in names]),
+        "source": _constant("北京大学课程信息", n),
+        "crawl_time": _constant(context["crawl_time"], n),
+    })
+
+
+def notices_batch(rng, start, n, context):
+    import pyarrow as pa
+    number = np.arange(start + 1, start + n + 1)
+    picks = rng.integers(0, len(NOTICE_TYPES), n)
+    return pa.table({
+        "notice_id": _concat("notice_", _numbered(number, 4)),
+        "title": _concat(_pick(picks, [f"关于{t}的通知（" for t in NOTICE_TYPES]), _numbered(number), "）"),
+        "content": _pick(picks, [f"请各位师生注意：{t}的具体安排和要求。详细内容请查看相关链接或咨询负责部门。"
+                                 for t in NOTICE_TYPES]),
+        "date": _dates(context["today"], rng.integers(-30, 31, n)),
+        "type": _constant("notice", n),
+        "category": _pick(picks, NOTICE_TYPES),
+        "source": _constant("北京大学相关部门", n),
+        "crawl_time": _constant(context["crawl_time"], n),
+    })
+
+
+GENERATORS = {
+    "books": books_batch,
+    "news": news_batch,
+    "courses": courses_batch,
+    "notices": notices_batch,
+}
+
+
+def iter_batches(name, rows, seed=42, batch_size=DEFAULT_BATCH_SIZE, today=None):
+    """按列批量生成一个数据集，逐批产出pyarrow.Table"""
+    today = today or datetime.now()
+    context = {
+        "today": today,
+        # 整批共用一个抓取时间（逐条调用strftime是原实现的主要开销之一）
+        "crawl_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "news_titles": news_title_table() if name == "news" else None,
+    }
+    # 每个数据集独立的随机流：只生成部分数据集时结果不变
+    rng = np.random.default_rng([seed, DATASETS.index(name)])
+    for start in range(0, rows, batch_size):
+        yield GENERATORS[name](rng, start, min(batch_size, rows - start), context)
+
+
+def _raw_table(name, table):
+    """转为原始Parquet的固定schema（与storage.ParquetSink一致，缺失字段为null）"""
+    import pyarrow as pa
+    columns = []
+    for field in storage.RAW_FIELDS[name]:
+        target = pa.int64() if field in storage.RAW_INT_FIELDS else pa.string()
+        if field in table.column_names:
+            columns.append(table[field].cast(target))
+        else:
+            columns.append(pa.nulls(len(table), target))
+    return pa.table(columns, names=storage.RAW_FIELDS[name])
+
+
+def generate_dataset(name, rows, seed=42, batch_size=DEFAULT_BATCH_SIZE, today=None,
+                     raw_dir=storage.RAW_DIR, parquet=False):
+    """生成一个数据集并写入 <raw_dir>/<name>.csv（可选同时写Parquet），先写临时文件再原子替换"""
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    os.makedirs(raw_dir, exist_ok=True)
+    csv_path = os.path.join(raw_dir, f"{name}.csv")
+    parquet_path = os.path.join(raw_dir, f"{name}.parquet")
+    csv_writer = parquet_writer = None
+    try:
+        for table in iter_batches(name, rows, seed, batch_size, today):
+            if csv_writer is None:
+                csv_writer = pa_csv.CSVWriter(f"{csv_path}.tmp", table.schema)
+            csv_writer.write_table(table)
+            if parquet:
+                raw = _raw_table(name, table)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(f"{parquet_path}.tmp", raw.schema)
+                parquet_writer.write_table(raw)
+    except Exception:
+        for writer, path in ((csv_writer, csv_path), (parquet_writer, parquet_path)):
+            if writer is not None:
+                writer.close()
+                os.remove(f"{path}.tmp")
+        raise
+    for writer, path in ((csv_writer, csv_path), (parquet_writer, parquet_path)):
+        if writer is not None:
+            writer.close()
+            os.replace(f"{path}.tmp", path)
+    return rows
+
+
+def generate_raw_data(rows, seed=42, datasets=None, batch_size=DEFAULT_BATCH_SIZE, today=None,
+                      raw_dir=storage.RAW_DIR, parquet=False, stats_path="data/statistics.json"):
+    """
+    为每个数据集生成rows条记录并写入原始数据目录，更新统计文件（首页展示的条数）
+    返回 {数据集: 条数}
+    """
+    datasets = datasets or DATASETS
+    counts = {}
+    start_time = time.time()
+    for name in datasets:
+        start = time.perf_counter()
+        counts[name] = generate_dataset(name, rows, seed, batch_size, today, raw_dir, parquet)
+        elapsed = time.perf_counter() - start
+        print(f"💾 生成{name}: {rows}条 ({rows / max(elapsed, 1e-9) / 1e6:.2f}M条/秒) -> {raw_dir}/{name}.csv")
+    if stats_path:
+        try:
+            with open(stats_path, 'r', encoding='utf-8') as f:
+                stats = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            stats = {}
+        stats.update({f"{name}_count": count for name, count in counts.items()})
+        stats.update({
+            "crawl_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "execution_time": round(time.time() - start_time, 2),
+            "crawl_mode": "synthetic",
+            "total_records": sum(stats.get(f"{name}_count", 0) for name in DATASETS),
+            "note": f"合成数据（seed={seed}）",
+        })
+        with open(f"{stats_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+        os.replace(f"{stats_path}.tmp", stats_path)
+    print(f"✅ 合成数据生成完成: 共{sum(counts.values())}条, 耗时{time.time() - start_time:.2f}秒")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量化合成数据生成器（容量测试用）")
+    parser.add_argument("--rows", type=int, required=True, help="每个数据集的记录数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--datasets", default=",".join(DATASETS), help="逗号分隔的数据集")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--parquet", action="store_true", help="同时写出原始Parquet")
+    parser.add_argument("--today", help="日期字段的基准日期（默认今天，固定后结果可复现）")
+    parser.add_argument("--raw-dir", default=storage.RAW_DIR)
+    args = parser.parse_args()
+
+    datasets = [name for name in args.datasets.split(",") if name]
+    unknown = [name for name in datasets if name not in GENERATORS]
+    if unknown:
+        parser.error(f"未知的数据集: {', '.join(unknown)}")
+    today = datetime.strptime(args.today, "%Y-%m-%d") if args.today else None
+    generate_raw_data(args.rows, args.seed, datasets, args.batch_size, today, args.raw_dir, args.parquet)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+可累加统计：计数加减、持久化，以及增量应用与完整重新计算的一致性
+"""
+import json
+import random
+
+import pandas as pd
+import pytest
+
+import aggregates
+import processor
+import storage
+from aggregates import DatasetAggregate, build_analysis
+from crawler import RealPKUCrawler
+
+DATASETS = ["books", "courses", "news", "notices"]
+
+
+@pytest.fixture(scope="module")
+def raw_records():
+    crawler = RealPKUCrawler(use_cache=False)
+    try:
+        return {
+            "books": crawler.generate_pku_books(60),
+            "courses": crawler.generate_pku_courses(60),
+            "news": crawler.generate_pku_news(60),
+            "notices": crawler.generate_pku_notices(60),
+        }
+    finally:
+        crawler.transport.close()
+
+
+def test_add_then_remove_restores_counts():
+    frame = pd.DataFrame({"category": ["文学", "历史", "文学", "哲学"], "year_clean": [2001, 2002, 2001, 2003]})
+    aggregate = DatasetAggregate("books")
+    aggregate.add(frame)
+    before = aggregate.to_dict()
+    extra = pd.DataFrame({"category": ["历史", "新类"], "year_clean": [2010, 2002]})
+    aggregate.add(extra)
+    assert aggregate.rows == 6 and aggregate.counters["category"]["新类"] == 1
+    aggregate.remove(extra)
+    assert aggregate.to_dict() == before
+    # 计数减到0的取值被删除，不残留在统计中
+    assert "新类" not in aggregate.counters["category"]
+
+
+def test_top_breaks_ties_by_value():
+    aggregate = DatasetAggregate("books")
+    aggregate.add(pd.DataFrame({"category": ["丙", "乙", "甲", "乙", "丁"], "year_clean": [1] * 5}))
+    assert list(aggregate.top("category", 3)) == ["乙", "丁", "丙"]
+    shuffled = DatasetAggregate("books")
+    shuffled.add(pd.DataFrame({"category": ["丁", "甲", "乙", "丙", "乙"], "year_clean": [1] * 5}))
+    assert shuffled.top("category") == aggregate.top("category")
+
+
+def test_state_round_trip(tmp_path, raw_records):
+    cleaned = {name: processor.CLEANERS[name](pd.DataFrame(raw_records[name])) for name in DATASETS}
+    result = processor.build_aggregates(cleaned)
+    path = str(tmp_path / "analysis_state.json")
+    aggregates.save_state(result, path)
+    loaded = aggregates.load_state(path)
+    assert build_analysis(loaded, "t") == build_analysis(result, "t")
+    # 统计列改变后旧状态作废
+    with open(path, encoding='utf-8') as f:
+        state = json.load(f)
+    state["columns"]["books"] = ["category"]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    assert aggregates.load_state(path) is None
+
+
+def mutate(rng, name, records):
+    """删除、修改部分记录并加入新记录，模拟下一次爬取"""
+    key = storage.RECORD_KEYS[name]
+    field = {"books": "category", "courses": "department", "news": "category", "notices": "category"}[name]
+    result = []
+    for record in records:
+        roll = rng.random()
+        if roll < 0.15:
+            continue
+        if roll < 0.35:
+            record = dict(record, **{field: f"新{field}{rng.randint(0, 3)}"})
+            if "date" in record:
+                record["date"] = f"2020-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"
+        result.append(record)
+    for i in range(rng.randint(0, 10)):
+        extra = dict(rng.choice(records), **{key: f"new_{name}_{i}", field: f"新增{field}"})
+        result.append(extra)
+    return result
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_update_matches_full_recompute(tmp_path, monkeypatch, capsys, raw_records, seed):
+    monkeypatch.chdir(tmp_path)
+    rng = random.Random(seed)
+    cleaned = {name: processor.CLEANERS[name](pd.DataFrame(raw_records[name])) for name in DATASETS}
+    aggregates.save_state(processor.build_aggregates(cleaned))
+    updated, changes, expected = {}, {}, {}
+    for name in DATASETS:
+        _, hashes = storage.compute_delta(name, raw_records[name], {})
+        records = mutate(rng, name, raw_records[name])
+        delta, _ = storage.compute_delta(name, records, hashes)
+        updated[name], removed, fresh = processor.apply_delta(name, cleaned[name], delta)
+        changes[name] = (removed, fresh)
+        expected[name] = processor.CLEANERS[name](pd.DataFrame(records))
+        key = storage.RECORD_KEYS[name]
+        assert sorted(updated[name][key].astype(str)) == sorted(str(r[key]) for r in records)
+    capsys.readouterr()
+    incremental = processor.update_aggregates(updated, changes)
+    # 统计是在持久化状态上增量更新的，而不是回退为完整统计
+    assert "重新完整统计" not in capsys.readouterr().out
+    full = processor.build_aggregates(expected)
+    for name in DATASETS:
+        assert incremental[name].rows == full[name].rows
+        assert incremental[name].to_dict()["counters"].keys() == full[name].to_dict()["counters"].keys()
+        for column, counter in incremental[name].counters.items():
+            assert dict(counter) == dict(full[name].counters[column]), (name, column)
+    assert build_analysis(incremental, "t") == build_analysis(full, "t")
+    assert processor.verify_analysis(build_analysis(incremental, "t"), updated) == []
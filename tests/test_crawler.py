@@ -0,0 +1,81 @@
+"""
+分页爬取：提前停止与记录指纹
+"""
+import pytest
+
+from crawler import RealPKUCrawler, record_fingerprint
+
+BASE_URL = "http://www.lib.pku.edu.cn/portal/newbooks"
+
+
+def books_html(items, next_url=None):
+    """新书通报页面；items为每个条目的文本"""
+    rows = "".join(f'<li class="book"><span class="meta">{text}</span></li>' for text in items)
+    link = f'<a href="{next_url}">下一页</a>' if next_url else ""
+    return f'<html><body><ul class="book-list">{rows}</ul>{link}</body></html>'.encode('utf-8')
+
+
+@pytest.fixture
+def crawler():
+    crawler = RealPKUCrawler(concurrent=False, use_cache=False)
+    yield crawler
+    crawler.transport.close()
+
+
+def stub_pages(crawler, pages):
+    """用 {URL: [条目文本]} 代替网络请求，返回实际抓取的URL列表"""
+    urls = list(pages)
+    fetched = []
+
+    def fetch_page(url, parse):
+        fetched.append(url)
+        position = urls.index(url)
+        next_url = urls[position + 1] if position + 1 < len(urls) else None
+        doc = crawler.parser.parse(books_html(pages[url], next_url))
+        return {"records": parse(doc, url), "links": crawler.discover_page_links(doc, url)}
+
+    crawler._fetch_page = fetch_page
+    return fetched
+
+
+def page_url(number):
+    return BASE_URL if number == 1 else f"{BASE_URL}?page={number}"
+
+
+def test_pages_without_titles_are_not_treated_as_seen(crawler):
+    # 条目中没有《书名》时标题为“北京大学图书{序号}”，每页都相同
+    pages = {page_url(p): [f"第{p}页第{i}条 新书推荐" for i in range(8)] for p in range(1, 6)}
+    fetched = stub_pages(crawler, pages)
+    records = list(crawler.iter_pages(BASE_URL, crawler.parse_books_page, max_pages=10))
+    assert len(fetched) == 5
+    assert len(records) == 40
+    assert len({record_fingerprint(r) for r in records}) == 40
+
+
+def test_repeated_page_stops_crawling(crawler):
+    # 第2页与第1页内容相同（例如翻页参数被忽略），不再沿它的链接继续
+    items = [f"《书名{i}》 作者：张三{i}" for i in range(8)]
+    pages = {page_url(1): items, page_url(2): items, page_url(3): [f"《新书{i}》" for i in range(8)]}
+    fetched = stub_pages(crawler, pages)
+    records = list(crawler.iter_pages(BASE_URL, crawler.parse_books_page, max_pages=10))
+    assert fetched == [page_url(1), page_url(2)]
+    assert len(records) == 8
+
+
+def test_max_pages_limits_fetches(crawler):
+    pages = {page_url(p): [f"《第{p}页的书{i}》" for i in range(8)] for p in range(1, 6)}
+    fetched = stub_pages(crawler, pages)
+    records = list(crawler.iter_pages(BASE_URL, crawler.parse_books_page, max_pages=3))
+    assert len(fetched) == 3
+    assert len(records) == 24
+
+
+def test_book_ids_do_not_depend_on_position(crawler):
+    items = [f"《书名{i}》 作者：张三{i}" for i in range(8)]
+    stub_pages(crawler, {BASE_URL: items})
+    before = {r["title"]: r for r in crawler.iter_pages(BASE_URL, crawler.parse_books_page, 1)}
+    stub_pages(crawler, {BASE_URL: ["《新到的书》 作者：李四"] + items})
+    after = {r["title"]: r for r in crawler.iter_pages(BASE_URL, crawler.parse_books_page, 1)}
+    for title, record in before.items():
+        assert after[title]["book_id"] == record["book_id"]
+        assert after[title]["isbn"] == record["isbn"]
@@ -0,0 +1,81 @@
+"""
+流水线调度：按指纹跳过未变化的阶段，失败后从失败处继续
+阶段函数在子进程中按 "test_pipeline:函数名" 导入
+"""
+import os
+
+import pytest
+
+import pipeline
+from pipeline import Stage
+
+
+def upper(src, dst):
+    with open(src, encoding='utf-8') as f:
+        text = f.read()
+    if os.path.exists(f"{dst}.fail"):
+        raise RuntimeError("按要求失败")
+    with open(dst, 'w', encoding='utf-8') as f:
+        f.write(text.upper())
+
+
+def build():
+    return [
+        Stage("first", "test_pipeline:upper", args=("in.txt", "mid.txt"), inputs=["in.txt"], outputs=["mid.txt"]),
+        Stage("second", "test_pipeline:upper", args=("mid.txt", "out.txt"), deps=["first"],
+              inputs=["mid.txt"], outputs=["out.txt"]),
+    ]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "in.txt").write_text("abc", encoding='utf-8')
+    return tmp_path
+
+
+def run(workdir, **kwargs):
+    return pipeline.run(build(), workers=2, state_path=str(workdir / "state.json"), **kwargs)
+
+
+def test_unchanged_stages_are_skipped(workdir):
+    assert run(workdir) == {"first": "ok", "second": "ok"}
+    assert (workdir / "out.txt").read_text(encoding='utf-8') == "ABC"
+    assert run(workdir) == {"first": "skipped", "second": "skipped"}
+    assert run(workdir, force=["second"]) == {"first": "skipped", "second": "ok"}
+
+
+def test_changed_input_reruns_downstream(workdir):
+    run(workdir)
+    (workdir / "in.txt").write_text("xyz", encoding='utf-8')
+    assert run(workdir) == {"first": "ok", "second": "ok"}
+    assert (workdir / "out.txt").read_text(encoding='utf-8') == "XYZ"
+
+
+def test_modified_output_reruns_stage(workdir):
+    run(workdir)
+    (workdir / "out.txt").write_text("edited", encoding='utf-8')
+    assert run(workdir) == {"first": "skipped", "second": "ok"}
+    assert (workdir / "out.txt").read_text(encoding='utf-8') == "ABC"
+
+
+def test_failure_resumes_from_failed_stage(workdir):
+    run(workdir)
+    (workdir / "in.txt").write_text("new", encoding='utf-8')
+    (workdir / "out.txt.fail").write_text("", encoding='utf-8')
+    with pytest.raises(RuntimeError):
+        run(workdir)
+    state = pipeline.load_state(str(workdir / "state.json"))
+    assert state["stages"]["first"]["status"] == "ok"
+    assert state["stages"]["second"]["status"] == "failed"
+    os.remove(workdir / "out.txt.fail")
+    assert run(workdir) == {"first": "skipped", "second": "ok"}
+    assert (workdir / "out.txt").read_text(encoding='utf-8') == "NEW"
+    assert run(workdir) == {"first": "skipped", "second": "skipped"}
+
+
+def test_graph_errors():
+    with pytest.raises(ValueError):
+        pipeline.check_graph([Stage("a", "m:f", deps=["missing"])])
+    with pytest.raises(ValueError):
+        pipeline.check_graph([Stage("a", "m:f", deps=["b"]), Stage("b", "m:f", deps=["a"])])
@@ -0,0 +1,63 @@
+"""
+API查询：游标与查询条件绑定、字段投影校验
+"""
+import pandas as pd
+import pytest
+
+from query_index import DatasetIndex, QueryError, run_query
+
+
+@pytest.fixture
+def dataset():
+    frame = pd.DataFrame({
+        "book_id": [f"b{i}" for i in range(12)],
+        "title": [f"书{(i * 7) % 12:02d}" for i in range(12)],
+        "category": ["文学" if i % 2 else "历史" for i in range(12)],
+        "year_clean": [2000 + i % 4 for i in range(12)],
+    })
+    return DatasetIndex(frame, "v1"), frame.to_dict('records')
+
+
+def titles(page):
+    return [item["title"] for item in page["items"]]
+
+
+def test_cursor_walks_all_pages(dataset):
+    index, records = dataset
+    args = {"sort": "title", "limit": "5"}
+    seen = []
+    page = run_query(index, records, args)
+    while True:
+        seen += titles(page)
+        if page["next_cursor"] is None:
+            break
+        page = run_query(index, records, dict(args, cursor=page["next_cursor"]))
+    assert seen == sorted(r["title"] for r in records)
+
+
+def test_cursor_is_bound_to_sort_and_filters(dataset):
+    index, records = dataset
+    cursor = run_query(index, records, {"sort": "-year_clean", "limit": "5"})["next_cursor"]
+    with pytest.raises(QueryError):
+        run_query(index, records, {"sort": "title", "limit": "5", "cursor": cursor})
+    cursor = run_query(index, records, {"category": "文学,历史", "limit": "5"})["next_cursor"]
+    with pytest.raises(QueryError):
+        run_query(index, records, {"category": "文学", "limit": "5", "cursor": cursor})
+    # 取值顺序与limit不影响游标
+    page = run_query(index, records, {"category": "历史,文学", "limit": "3", "cursor": cursor})
+    assert page["offset"] == 5
+
+
+def test_cursor_is_bound_to_data_version(dataset):
+    index, records = dataset
+    cursor = run_query(index, records, {"limit": "5"})["next_cursor"]
+    with pytest.raises(QueryError):
+        run_query(DatasetIndex(index.frame, "v2"), records, {"limit": "5", "cursor": cursor})
+
+
+def test_unknown_projection_field_is_rejected(dataset):
+    index, records = dataset
+    with pytest.raises(QueryError):
+        run_query(index, records, {"fields": "title,isbn"})
+    page = run_query(index, records, {"fields": "title", "limit": "2"})
+    assert page["items"] == [{"title": records[0]["title"]}, {"title": records[1]["title"]}]
@@ -0,0 +1,45 @@
+"""
+全文检索：bigram切分与BM25排序
+"""
+import numpy as np
+import pandas as pd
+
+import storage
+from search_index import build_search_index, current_index, tokenize
+
+
+def test_tokens_belong_to_their_text():
+    # 'İ'转小写后变为两个字符，之后的词元不能归到前一条文本
+    terms, owners = tokenize(["İİ ab", "北大", "x", "图书馆"])
+    assert owners.tolist() == [0, 1, 3, 3]
+    assert terms[1] == (ord("北") << 21) | ord("大")
+
+
+def test_bm25_ranking_and_type_filter(tmp_path):
+    processed_dir, search_dir = str(tmp_path / "processed"), str(tmp_path / "search")
+    storage.save_processed_frame("books", pd.DataFrame({
+        "book_id": ["b0", "b1", "b2", "b3"],
+        "title": ["燕园风物", "燕园燕园：燕园的四季", "数学分析", "燕园建筑与燕园历史"],
+    }), processed_dir)
+    storage.save_processed_frame("news", pd.DataFrame({
+        "news_id": ["n0"], "title": ["燕园新闻"], "summary": ["校园"], "content": [""],
+    }), processed_dir)
+    build_search_index(search_dir=search_dir, processed_dir=processed_dir)
+    index = current_index(search_dir)
+
+    hits, total = index.search("燕园")
+    assert total == 4
+    assert hits[0][:2] == ("books", 1)
+    assert ("books", 2) not in [hit[:2] for hit in hits]
+    scores = [score for _, _, score in hits]
+    assert scores == sorted(scores, reverse=True)
+
+    hits, total = index.search("燕园", types=["news"])
+    assert total == 1 and hits[0][:2] == ("news", 0)
+
+    # 翻页结果与一次取出的顺序一致
+    everything, _ = index.search("燕园", limit=10)
+    paged = index.search("燕园", offset=0, limit=2)[0] + index.search("燕园", offset=2, limit=2)[0]
+    assert [hit[:2] for hit in paged] == [hit[:2] for hit in everything[:4]]
+    assert np.isclose(sum(s for _, _, s in paged), sum(s for _, _, s in everything[:4]))
+    assert index.search("不存在的词") == ([], 0)
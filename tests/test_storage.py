@@ -0,0 +1,122 @@
+"""
+原始数据增量：哈希清单对比、增量合并与流式写入
+"""
+import json
+import random
+
+import pytest
+
+import storage
+
+
+def book(i, title=None):
+    return {"book_id": f"b{i}", "title": title or f"书{i}", "crawl_time": f"2024-01-01 00:00:{i % 60:02d}"}
+
+
+def apply(snapshot, delta):
+    """把增量应用到 {主键: 记录} 快照（模拟下游）"""
+    result = dict(snapshot)
+    for record_id in delta["deleted"]:
+        result.pop(record_id, None)
+    for record in delta["added"] + delta["changed"]:
+        result[str(record[delta["key"]])] = record
+    return result
+
+
+def as_snapshot(records):
+    return {str(r["book_id"]): r for r in records}
+
+
+def test_compute_delta_ignores_volatile_fields():
+    records = [book(i) for i in range(5)]
+    _, hashes = storage.compute_delta("books", records, {})
+    again = [dict(r, crawl_time="2030-01-01 00:00:00") for r in records]
+    delta, _ = storage.compute_delta("books", again, hashes)
+    assert storage.delta_summary(delta) == {"added": 0, "changed": 0, "deleted": 0}
+
+
+def test_compute_delta_classifies_records():
+    _, hashes = storage.compute_delta("books", [book(i) for i in range(5)], {})
+    records = [book(0), book(1, "改名"), book(3), book(4), book(5)]
+    delta, _ = storage.compute_delta("books", records, hashes)
+    assert [r["book_id"] for r in delta["added"]] == ["b5"]
+    assert [r["book_id"] for r in delta["changed"]] == ["b1"]
+    assert delta["deleted"] == ["b2"]
+
+
+@pytest.mark.parametrize("older, newer, expected", [
+    # 新增后又删除：下游从未见过，互相抵消
+    ({"added": ["b9"]}, {"deleted": ["b9"]}, {}),
+    # 删除后又新增：对下游而言是变更
+    ({"deleted": ["b1"]}, {"added": ["b1"]}, {"changed": ["b1"]}),
+    # 新增后又变更：仍是新增（带最新内容）
+    ({"added": ["b9"]}, {"changed": ["b9"]}, {"added": ["b9"]}),
+    # 变更后又删除：删除
+    ({"changed": ["b1"]}, {"deleted": ["b1"]}, {"deleted": ["b1"]}),
+    ({"changed": ["b1"]}, {"changed": ["b2"]}, {"changed": ["b1", "b2"]}),
+])
+def test_merge_deltas_cases(older, newer, expected):
+    def delta(spec, title):
+        return {"dataset": "books", "key": "book_id",
+                "added": [book(int(i[1:]), title) for i in spec.get("added", [])],
+                "changed": [book(int(i[1:]), title) for i in spec.get("changed", [])],
+                "deleted": list(spec.get("deleted", []))}
+
+    merged = storage.merge_deltas(delta(older, "旧"), delta(newer, "新"))
+    for kind in ("added", "changed", "deleted"):
+        ids = merged[kind] if kind == "deleted" else [r["book_id"] for r in merged[kind]]
+        assert sorted(ids) == expected.get(kind, [])
+    # 两次都出现的记录取较新的内容
+    newer_ids = set(newer.get("added", []) + newer.get("changed", []))
+    assert all(r["title"] == "新" for r in merged["added"] + merged["changed"] if r["book_id"] in newer_ids)
+
+
+def random_snapshot(rng, ids):
+    return [book(i, rng.choice(["甲", "乙", "丙"])) for i in sorted(rng.sample(ids, rng.randint(0, len(ids))))]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_merged_delta_equals_applying_both(seed):
+    rng = random.Random(seed)
+    ids = list(range(12))
+    first, second, third = (random_snapshot(rng, ids) for _ in range(3))
+    _, hashes = storage.compute_delta("books", first, {})
+    older, hashes = storage.compute_delta("books", second, hashes)
+    newer, _ = storage.compute_delta("books", third, hashes)
+    merged = storage.merge_deltas(older, newer)
+    assert apply(as_snapshot(first), merged) == as_snapshot(third)
+    assert apply(apply(as_snapshot(first), older), newer) == as_snapshot(third)
+    # 合并结果中的新增都是下游没有的记录，删除的都是下游已有的记录
+    assert all(r["book_id"] not in as_snapshot(first) for r in merged["added"])
+    assert all(record_id in as_snapshot(first) for record_id in merged["deleted"])
+
+
+def test_write_delta_merges_pending_file(tmp_path):
+    _, hashes = storage.compute_delta("books", [book(i) for i in range(3)], {})
+    older, hashes = storage.compute_delta("books", [book(0), book(1, "改名"), book(3)], hashes)
+    newer, _ = storage.compute_delta("books", [book(0), book(3)], hashes)
+    storage.write_delta("books", older, raw_dir=str(tmp_path))
+    path = storage.write_delta("books", newer, raw_dir=str(tmp_path))
+    with open(path, encoding='utf-8') as f:
+        merged = json.load(f)
+    assert merged == json.loads(json.dumps(storage.merge_deltas(older, newer)))
+    assert sorted(merged["deleted"]) == ["b1", "b2"]
+    assert [r["book_id"] for r in merged["added"]] == ["b3"]
+    storage.consume_delta("books", raw_dir=str(tmp_path))
+    assert storage.load_delta("books", raw_dir=str(tmp_path)) is None
+
+
+def test_raw_sink_tracks_same_delta_as_snapshot_diff(tmp_path):
+    _, hashes = storage.compute_delta("books", [book(i) for i in range(4)], {})
+    records = [book(1), book(2, "改名"), book(7)]
+    sink = storage.RawSink("books", raw_dir=str(tmp_path), previous_hashes=hashes)
+    assert sink.write_all(iter(records)) == 3
+    sink.close()
+    expected, expected_hashes = storage.compute_delta("books", records, hashes)
+    delta = sink.tracker.delta()
+    for kind in ("added", "changed", "deleted"):
+        assert delta[kind] == expected[kind]
+    assert sink.tracker.hashes == expected_hashes
+    with open(tmp_path / "books.jsonl", encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == records
+    assert not (tmp_path / "books.jsonl.tmp").exists()
@@ -1,8 +1,17 @@
 # visualizer.py
-import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # 无界面后端，子进程中渲染
 import matplotlib.pyplot as plt
 import os
+import hashlib
+import json
+import shutil
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+import storage
+from chart_data import CHART_SOURCES, aggregate_chart
 
 # 忽略matplotlib字体/显示警告
 warnings.filterwarnings('ignore')
@@ -11,158 +20,278 @@ warnings.filterwarnings('ignore')
 plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'SimHei', 'WenQuanYi Micro Hei']
 plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
 
-def run_visualization():
+VISUALIZATION_DIR = 'data/visualizations'
+STATIC_IMAGE_DIR = 'static/images'  # 供Flask前端访问
+
+# 输出规格：format/dpi传给savefig；suffix为文件名后缀；static=True的输出会链接（或复制）到静态资源目录
+OUTPUT_PROFILES = {
+    "web": {"format": "png", "dpi": 100, "suffix": "", "static": True},
+    "webp": {"format": "webp", "dpi": 100, "suffix": "", "static": True},
+    "svg": {"format": "svg", "dpi": 100, "suffix": "", "static": True},
+    "print": {"format": "png", "dpi": 300, "suffix": "_print", "static": False},
+}
+# 记录每个输出文件对应的内容哈希，哈希不变时跳过渲染
+CHART_MANIFEST = os.path.join(VISUALIZATION_DIR, 'charts_manifest.json')
+# 默认只输出网页尺寸的PNG，可用环境变量 CHART_PROFILES=web,print 等调整
+DEFAULT_PROFILES = [p for p in os.environ.get('CHART_PROFILES', 'web').split(',') if p]
+
+# ===================== 数据汇总 =====================
+def aggregate(name):
+    """读取图表所需字段并汇总（汇总逻辑与Flask图表接口共用chart_data）"""
+    dataset, columns, _, _, _ = CHART_SOURCES[name]
+    return aggregate_chart(name, storage.load_processed(dataset, columns=columns))
+
+def aggregate_book_category():
+    """图书分类Top10"""
+    return aggregate('book_category')
+
+def aggregate_course_credit():
+    """课程学分分布"""
+    return aggregate('course_credit')
+
+def aggregate_news_trend():
+    """新闻按月发布数量"""
+    return aggregate('news_trend')
+
+def aggregate_notice_type():
+    """公告类型分布"""
+    return aggregate('notice_type')
+
+# ===================== 绘图 =====================
+def draw_book_category(cat_counts, ax):
+    cat_counts.plot(
+        kind='bar',
+        color='#1f77b4',
+        ax=ax,
+        edgecolor='black',
+        alpha=0.8
+    )
+    ax.set_title('图书分类分布（Top10）', fontsize=14, pad=20)
+    ax.set_xlabel('图书分类', fontsize=12)
+    ax.set_ylabel('数量', fontsize=12)
+    ax.tick_params(axis='x', rotation=45)
+    ax.grid(axis='y', alpha=0.3)
+
+def draw_course_credit(credit_counts, ax):
+    credit_counts.plot(
+        kind='pie',
+        autopct='%1.1f%%',
+        ax=ax,
+        colors=['#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b'],
+        explode=[0.05] * len(credit_counts)  # 轻微分离扇区
+    )
+    ax.set_title('课程学分分布', fontsize=14, pad=20)
+    ax.set_ylabel('')  # 隐藏y轴标签
+
+def draw_news_trend(month_counts, ax):
+    month_counts.plot(
+        kind='line',
+        marker='o',
+        color='#e377c2',
+        ax=ax,
+        linewidth=2,
+        markersize=6
+    )
+    ax.set_title('新闻发布月度趋势', fontsize=14, pad=20)
+    ax.set_xlabel('月份', fontsize=12)
+    ax.set_ylabel('发布数量', fontsize=12)
+    ax.tick_params(axis='x', rotation=45)
+    ax.grid(alpha=0.3)
+
+def draw_notice_type(type_counts, ax):
+    type_counts.plot(
+        kind='barh',
+        color='#7f7f7f',
+        ax=ax,
+        edgecolor='black',
+        alpha=0.8
+    )
+    ax.set_title('公告类型分布', fontsize=14, pad=20)
+    ax.set_xlabel('数量', fontsize=12)
+    ax.set_ylabel('公告类型', fontsize=12)
+    ax.grid(axis='x', alpha=0.3)
+
+# 图表定义：名称 -> (汇总函数, 绘图函数, 图尺寸, 中文名)
+CHARTS = {
+    "book_category": (aggregate_book_category, draw_book_category, (12, 6), "图书分类"),
+    "course_credit": (aggregate_course_credit, draw_course_credit, (8, 5), "课程学分"),
+    "news_trend": (aggregate_news_trend, draw_news_trend, (12, 6), "新闻趋势"),
+    "notice_type": (aggregate_notice_type, draw_notice_type, (10, 6), "公告类型"),
+}
+
+# ===================== 输出 =====================
+def chart_path(name, profile, directory=VISUALIZATION_DIR):
+    spec = OUTPUT_PROFILES[profile]
+    return os.path.join(directory, f"{name}{spec['suffix']}.{spec['format']}")
+
+def link_or_copy(src, dst):
+    """把已渲染的文件放到第二个位置：优先硬链接，跨文件系统时复制（均原子替换）"""
+    tmp = f"{dst}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+def chart_hash(name, series, profile):
+    """图表内容哈希：汇总后的数据 + 绘图代码与参数 + 输出规格 + matplotlib版本/字体设置"""
+    _, draw, figsize, _ = CHARTS[name]
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(k) for k in series.index], [float(v) for v in series.values]]).encode('utf-8'))
+    digest.update(draw.__code__.co_code)
+    digest.update(repr(draw.__code__.co_consts).encode('utf-8'))
+    digest.update(repr((name, figsize, OUTPUT_PROFILES[profile], matplotlib.__version__,
+                        plt.rcParams['font.sans-serif'])).encode('utf-8'))
+    return digest.hexdigest()
+
+def output_current(name, profile, digest, previous):
+    """输出文件存在且哈希与上次一致时无需重新渲染"""
+    if previous.get(profile) != digest or not os.path.exists(chart_path(name, profile)):
+        return False
+    return not OUTPUT_PROFILES[profile]['static'] or os.path.exists(chart_path(name, profile, STATIC_IMAGE_DIR))
+
+def load_chart_manifest():
+    try:
+        with open(CHART_MANIFEST, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_chart_manifest(manifest):
+    with open(f"{CHART_MANIFEST}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(f"{CHART_MANIFEST}.tmp", CHART_MANIFEST)
+
+def plan_chart(name, profiles, previous, force=False):
+    """
+    在主进程中汇总数据并计算内容哈希，找出需要重新渲染的输出规格
+    返回 (汇总数据, 各输出规格的内容哈希, 需要渲染的输出规格, 耗时字典)；数据为空时汇总数据为None
+    """
+    aggregate, _, _, label = CHARTS[name]
+    with metrics.span("aggregate", chart=name) as s:
+        series = aggregate()
+        s["rows"] = 0 if series is None else len(series)
+    timings = {'aggregate': s["duration"]}
+    if series is None or series.empty:
+        print(f"⚠️ {label}数据为空，跳过{label}图表生成")
+        return None, {}, [], timings
+    hashes = {profile: chart_hash(name, series, profile) for profile in profiles}
+    stale = [profile for profile in profiles
+             if force or not output_current(name, profile, hashes[profile], previous)]
+    if not stale:
+        print(f"✅ {label}图表未变化，跳过渲染")
+    return series, hashes, stale, timings
+
+def render_chart(name, series, profiles):
+    """
+    渲染单个图表（在子进程中执行）：只创建一次Figure，每种输出规格各栅格化一次
+    返回 (图表名, 是否成功, 耗时字典)
+    """
+    _, draw, figsize, label = CHARTS[name]
+    timings = {}
+    try:
+        with metrics.span("draw", chart=name) as s:
+            fig, ax = plt.subplots(figsize=figsize)
+            draw(series, ax)
+            s["rows"] = len(series)
+        timings['draw'] = s["duration"]
+        for profile in profiles:
+            spec = OUTPUT_PROFILES[profile]
+            with metrics.span("save", chart=name, profile=profile) as s:
+                path = chart_path(name, profile)
+                fig.savefig(f"{path}.tmp", format=spec['format'], dpi=spec['dpi'], bbox_inches='tight')
+                os.replace(f"{path}.tmp", path)
+                if spec['static']:
+                    link_or_copy(path, chart_path(name, profile, STATIC_IMAGE_DIR))
+                s["bytes"] = metrics.file_bytes(path)
+            timings[profile] = s["duration"]
+        plt.close(fig)
+        print(f"✅ {label}图表生成完成")
+        return name, True, timings
+    except Exception as e:
+        print(f"❌ {label}图表生成失败: {str(e)}")
+        return name, False, timings
+
+def print_chart_timings(results):
+    """打印每个图表各阶段耗时"""
+    print("\n⏱️  图表渲染耗时:")
+    for name, (status, timings) in results.items():
+        detail = "  ".join(f"{stage}={value * 1000:.0f}ms" for stage, value in timings.items())
+        print(f"   {name:<15}{status:<10}{detail}")
+
+def run_visualization(profiles=None, workers=None, force=False):
     """
     生成可视化图表（main.py调用的核心函数）
-    基于processed目录下的清洗后数据，生成各类统计图表
+    基于processed目录下的清洗后数据，在多个子进程中并行生成各类统计图表
+    profiles为OUTPUT_PROFILES中的输出规格列表（默认DEFAULT_PROFILES）；workers=1时在当前进程中依次生成
+    汇总数据与绘图参数的哈希未变化时跳过渲染，force=True时全部重新渲染
     """
     print("📈 开始生成校园数据可视化图表...")
-    
+    profiles = list(profiles or DEFAULT_PROFILES)
+    unknown = [p for p in profiles if p not in OUTPUT_PROFILES]
+    if unknown:
+        raise ValueError(f"未知的输出规格: {', '.join(unknown)}")
+
     # 确保可视化目录存在
-    os.makedirs('data/visualizations', exist_ok=True)
-    os.makedirs('static/images', exist_ok=True)  # 供Flask前端访问
-    
-    # 定义图表生成函数（模块化）
-    def plot_book_category():
-        """图书分类分布图表"""
-        try:
-            df = pd.read_csv('data/processed/books_clean.csv')
-            if df.empty:
-                print("⚠️ 图书数据为空，跳过图书分类图表生成")
-                return
-            
-            # 取Top10分类
-            cat_counts = df['category'].value_counts().head(10)
-            fig, ax = plt.subplots(figsize=(12, 6))
-            cat_counts.plot(
-                kind='bar', 
-                color='#1f77b4', 
-                ax=ax,
-                edgecolor='black',
-                alpha=0.8
-            )
-            ax.set_title('图书分类分布（Top10）', fontsize=14, pad=20)
-            ax.set_xlabel('图书分类', fontsize=12)
-            ax.set_ylabel('数量', fontsize=12)
-            ax.tick_params(axis='x', rotation=45)
-            ax.grid(axis='y', alpha=0.3)
-            
-            # 保存图表（双路径：可视化目录+静态资源目录）
-            fig.savefig('data/visualizations/book_category.png', dpi=300, bbox_inches='tight')
-            fig.savefig('static/images/book_category.png', dpi=300, bbox_inches='tight')
-            plt.close(fig)
-            print("✅ 图书分类图表生成完成")
-        except Exception as e:
-            print(f"❌ 图书分类图表生成失败: {str(e)}")
-
-    def plot_course_credit():
-        """课程学分分布图表"""
-        try:
-            df = pd.read_csv('data/processed/courses_clean.csv')
-            if df.empty:
-                print("⚠️ 课程数据为空，跳过课程学分图表生成")
-                return
-            
-            credit_counts = df['credit'].value_counts().sort_index()
-            fig, ax = plt.subplots(figsize=(8, 5))
-            credit_counts.plot(
-                kind='pie', 
-                autopct='%1.1f%%', 
-                ax=ax,
-                colors=['#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b'],
-                explode=[0.05] * len(credit_counts)  # 轻微分离扇区
-            )
-            ax.set_title('课程学分分布', fontsize=14, pad=20)
-            ax.set_ylabel('')  # 隐藏y轴标签
-            
-            fig.savefig('data/visualizations/course_credit.png', dpi=300, bbox_inches='tight')
-            fig.savefig('static/images/course_credit.png', dpi=300, bbox_inches='tight')
-            plt.close(fig)
-            print("✅ 课程学分图表生成完成")
-        except Exception as e:
-            print(f"❌ 课程学分图表生成失败: {str(e)}")
-
-    def plot_news_trend():
-        """新闻发布时间趋势图表"""
-        try:
-            df = pd.read_csv('data/processed/news_clean.csv')
-            if df.empty:
-                print("⚠️ 新闻数据为空，跳过新闻趋势图表生成")
-                return
-            
-            # 转换发布时间为日期格式
-            df['publish_date'] = pd.to_datetime(df['publish_date'], errors='coerce')
-            df = df.dropna(subset=['publish_date'])
-            
-            # 按月份统计
-            df['month'] = df['publish_date'].dt.to_period('M')
-            month_counts = df['month'].value_counts().sort_index()
-            
-            fig, ax = plt.subplots(figsize=(12, 6))
-            month_counts.plot(
-                kind='line', 
-                marker='o', 
-                color='#e377c2', 
-                ax=ax,
-                linewidth=2,
-                markersize=6
-            )
-            ax.set_title('新闻发布月度趋势', fontsize=14, pad=20)
-            ax.set_xlabel('月份', fontsize=12)
-            ax.set_ylabel('发布数量', fontsize=12)
-            ax.tick_params(axis='x', rotation=45)
-            ax.grid(alpha=0.3)
-            
-            fig.savefig('data/visualizations/news_trend.png', dpi=300, bbox_inches='tight')
-            fig.savefig('static/images/news_trend.png', dpi=300, bbox_inches='tight')
-            plt.close(fig)
-            print("✅ 新闻趋势图表生成完成")
-        except Exception as e:
-            print(f"❌ 新闻趋势图表生成失败: {str(e)}")
-
-    def plot_notice_type():
-        """公告类型分布图表"""
-        try:
-            df = pd.read_csv('data/processed/notices_clean.csv')
-            if df.empty:
-                print("⚠️ 公告数据为空，跳过公告类型图表生成")
-                return
-            
-            type_counts = df['type'].value_counts()
-            fig, ax = plt.subplots(figsize=(10, 6))
-            type_counts.plot(
-                kind='barh', 
-                color='#7f7f7f', 
-                ax=ax,
-                edgecolor='black',
-                alpha=0.8
-            )
-            ax.set_title('公告类型分布', fontsize=14, pad=20)
-            ax.set_xlabel('数量', fontsize=12)
-            ax.set_ylabel('公告类型', fontsize=12)
-            ax.grid(axis='x', alpha=0.3)
-            
-            fig.savefig('data/visualizations/notice_type.png', dpi=300, bbox_inches='tight')
-            fig.savefig('static/images/notice_type.png', dpi=300, bbox_inches='tight')
-            plt.close(fig)
-            print("✅ 公告类型图表生成完成")
-        except Exception as e:
-            print(f"❌ 公告类型图表生成失败: {str(e)}")
-
-    # 执行所有图表生成
-    plot_book_category()
-    plot_course_credit()
-    plot_news_trend()
-    plot_notice_type()
+    os.makedirs(VISUALIZATION_DIR, exist_ok=True)
+    os.makedirs(STATIC_IMAGE_DIR, exist_ok=True)
+    metrics.begin_run()
+
+    # 1. 主进程汇总数据并比对哈希，未变化的图表不进入matplotlib
+    manifest = load_chart_manifest()
+    results, plans = {}, {}
+    for name in CHARTS:
+        series, hashes, stale, timings = plan_chart(name, profiles, manifest.get(name, {}), force)
+        if series is None:
+            results[name] = ('empty', timings)
+        elif not stale:
+            results[name] = ('unchanged', timings)
+        else:
+            plans[name] = (series, stale)
+            results[name] = ('rendered', timings)
+        if hashes:
+            manifest.setdefault(name, {}).update(hashes)
+    # 2. 需要渲染的图表在子进程中并行渲染
+    names = list(plans)
+    if names and workers == 1:
+        rendered = [render_chart(name, *plans[name]) for name in names]
+    elif names:
+        with ProcessPoolExecutor(max_workers=min(workers or len(names), len(names))) as pool:
+            outputs = list(pool.map(metrics.isolated, [render_chart] * len(names), names, *zip(*plans.values())))
+        rendered = [result for result, _ in outputs]
+        for _, snapshot in outputs:
+            metrics.pipeline.merge(snapshot)
+    else:
+        rendered = []
+    for name, ok, timings in rendered:
+        results[name][1].update(timings)
+        if not ok:
+            # 失败时不保留哈希，下次重新渲染
+            results[name] = ('failed', results[name][1])
+            manifest.pop(name, None)
+    save_chart_manifest(manifest)
+    metrics.save_run("visualize")
+    print_chart_timings(results)
 
     print("\n🎉 所有可视化图表生成完成！")
     print("📁 图表保存路径：")
-    print("   - 数据目录：data/visualizations/")
-    print("   - 静态资源：static/images/（供前端访问）")
+    print(f"   - 数据目录：{VISUALIZATION_DIR}/（输出规格: {', '.join(profiles)}）")
+    print(f"   - 静态资源：{STATIC_IMAGE_DIR}/（供前端访问）")
+    return results
+
+def render_all_charts():
+    """流水线调度（pipeline.py）使用：生成全部图表，有图表失败时抛出异常，该阶段记为失败，下次重新运行"""
+    results = run_visualization()
+    failed = [name for name, (status, _) in results.items() if status == 'failed']
+    if failed:
+        raise RuntimeError(f"图表生成失败: {', '.join(failed)}")
+    return results
 
 # 测试代码（本地运行时可执行）
 if __name__ == "__main__":
     # 本地测试：创建测试数据目录
     os.makedirs('data/processed', exist_ok=True)
     # 调用可视化函数
-    run_visualization()
\ No newline at end of file
+    run_visualization()